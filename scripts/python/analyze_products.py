@@ -6,11 +6,17 @@ Script automático para analisar imagens de produtos com Claude
 
 import os
 import sys
-import base64
-from pathlib import Path
-from PIL import Image
-import io
-import anthropic
+from functools import partial
+from image_cache import IMAGE_CACHE
+from image_pool import PREPROCESSOR
+from claude_client import API_STATS, get_client
+from claude_executor import API_EXECUTOR
+from response_cache import RESPONSE_CACHE, request_fingerprint
+from usage_ledger import USAGE_LEDGER
+from foltz_imaging import (
+    FORMAT_AUTO, PAYLOAD_STATS, RESIZE_QUALITY, TASK_ANALYSIS,
+    encode_image_block, estimate_batch_tokens, list_images
+)
 
 # Configurar encoding UTF-8 no Windows
 if sys.platform == 'win32':
@@ -20,79 +26,37 @@ if sys.platform == 'win32':
 from dotenv import load_dotenv
 load_dotenv()
 
-MAX_DIMENSION = 2000
+RESIZE_MODE = RESIZE_QUALITY  # RESIZE_FAST troca qualidade por velocidade
+IMAGE_TASK = TASK_ANALYSIS  # orçamento de pixels/tokens por imagem (ver foltz_imaging)
+OUTPUT_FORMAT = FORMAT_AUTO  # menor entre JPEG/WebP; FORMAT_SOURCE mantém o formato original
 IMAGE_FOLDERS = ["seedream", "id_visual"]
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 
-def resize_and_encode_image(image_path, max_dimension=MAX_DIMENSION):
-    """Redimensiona se necessário e converte para base64"""
-    with Image.open(image_path) as img:
-        width, height = img.size
-
-        # Redimensiona se necessário
-        if width > max_dimension or height > max_dimension:
-            if width > height:
-                new_width = max_dimension
-                new_height = int((max_dimension / width) * height)
-            else:
-                new_height = max_dimension
-                new_width = int((max_dimension / height) * width)
-
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            print(f"  Redimensionada: {width}x{height} -> {new_width}x{new_height}")
-
-        # Converte para bytes
-        buffer = io.BytesIO()
-        img_format = img.format or 'JPEG'
-        img.save(buffer, format=img_format, quality=90)
-
-        return base64.b64encode(buffer.getvalue()).decode('utf-8')
-
-def get_media_type(file_path):
-    """Retorna media type da imagem"""
-    ext = file_path.suffix.lower()
-    return {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp'
-    }.get(ext, 'image/jpeg')
+# Função de codificação enviada aos workers do pool
+ENCODE_IMAGE = partial(encode_image_block, mode=RESIZE_MODE, task=IMAGE_TASK, output_format=OUTPUT_FORMAT)
 
 def collect_and_process_images(folders, limit=5):
-    """Coleta e processa imagens"""
-    images = []
-
-    for folder in folders:
-        folder_path = Path(folder)
-        if not folder_path.exists():
-            continue
-
-        print(f"\nProcessando: {folder}")
+    """Coleta e processa imagens (codificação em paralelo no pool de processos)"""
+    paths = list_images(folders, sort=False)
 
-        for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp']:
-            for img_path in folder_path.glob(ext):
-                if limit and len(images) >= limit:
-                    break
+    if limit:
+        paths = paths[:limit]
 
-                try:
-                    print(f"  {img_path.name}")
-                    image_base64 = resize_and_encode_image(img_path)
+    images = []
+    current_folder = None
 
-                    images.append({
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": get_media_type(img_path),
-                            "data": image_base64
-                        }
-                    })
+    for img_path, block, error in PREPROCESSOR.map(ENCODE_IMAGE, paths):
+        if img_path.parent != current_folder:
+            current_folder = img_path.parent
+            print(f"\nProcessando: {current_folder}")
 
-                except Exception as e:
-                    print(f"  ERRO: {e}")
+        if error:
+            print(f"  {img_path.name}")
+            print(f"  ERRO: {error}")
+            continue
 
-        if limit and len(images) >= limit:
-            break
+        print(f"  {PAYLOAD_STATS.add(img_path, block)}")
+        images.append(block)
 
     return images
 
@@ -102,40 +66,39 @@ def analyze_with_claude(images, prompt):
         print("\nERRO: ANTHROPIC_API_KEY não encontrada")
         return None
 
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    client = get_client(ANTHROPIC_API_KEY)
     content = [{"type": "text", "text": prompt}] + images
 
     print(f"\nEnviando {len(images)} imagens para Claude...")
+    print(f"  Tokens de imagem estimados: ~{estimate_batch_tokens(images)}")
+    print(f"  {PAYLOAD_STATS.end_batch()}")
+
+    # Tenta diferentes modelos disponíveis
+    models_to_try = [
+        "claude-3-sonnet-20240229",
+        "claude-3-opus-20240229",
+        "claude-3-haiku-20240307"
+    ]
+
+    # Resposta já obtida antes com o mesmo prompt e as mesmas imagens
+    fingerprint = request_fingerprint(prompt, images)
+    cached, model = RESPONSE_CACHE.get_any(models_to_try, fingerprint, 4096)
+    if cached is not None:
+        print(f"  ♻️  Resposta em cache ({model})")
+        return cached
 
     try:
-        # Tenta diferentes modelos disponíveis
-        models_to_try = [
-            "claude-3-sonnet-20240229",
-            "claude-3-opus-20240229",
-            "claude-3-haiku-20240307"
-        ]
-
-        last_error = None
-        for model in models_to_try:
-            try:
-                print(f"  Tentando modelo: {model}")
-                message = client.messages.create(
-                    model=model,
-                    max_tokens=4096,
-                    messages=[{"role": "user", "content": content}]
-                )
-                print(f"  ✓ Sucesso com: {model}")
-                return message.content[0].text
-            except Exception as e:
-                print(f"  X Falhou: {model}")
-                last_error = e
-                continue
-
-        # Se nenhum modelo funcionou
-        if last_error:
-            raise last_error
-
-        return None
+        # Só troca de modelo quando o erro é do modelo (não do payload)
+        message, model = API_EXECUTOR.create(
+            client, models_to_try, 4096,
+            messages=[{"role": "user", "content": content}]
+        )
+        print(f"  ✓ Sucesso com: {model}")
+        print(f"  {USAGE_LEDGER.last()}")
+        print(f"  {API_STATS.last()}")
+        text = message.content[0].text
+        RESPONSE_CACHE.put(model, fingerprint, 4096, text)
+        return text
 
     except Exception as e:
         print(f"\nERRO na API: {e}")
@@ -177,6 +140,9 @@ Organize as informações de forma clara para cada imagem."""
         return
 
     print(f"\n{len(images)} imagens processadas")
+    print(IMAGE_CACHE.report())
+    print(PAYLOAD_STATS.report())
+    print(PREPROCESSOR.report())
 
     # Analisa com Claude
     result = analyze_with_claude(images, prompt)
@@ -196,6 +162,10 @@ Organize as informações de forma clara para cada imagem."""
     else:
         print("\nFalha na analise")
 
+    print(RESPONSE_CACHE.report())
+    print(API_STATS.report())
+    print(API_EXECUTOR.report())
+    print(USAGE_LEDGER.report())
     print("\n" + "="*70)
 
 if __name__ == "__main__":
@@ -3,16 +3,58 @@
 """
 ANALISADOR COMPLETO DE PRODUTOS - FOLTZ FANWEAR
 Análise detalhada de jerseys com Claude API
+
+Uso: python analyze_products_complete.py [--batch-api] [--resume] [--json] [--stream] [--seo]
+  --batch-api: envia o catálogo inteiro como Message Batches (assíncrono,
+               metade do preço); rodar de novo retoma o job interrompido
+  --resume:    continua a última execução, reenviando só as imagens que
+               falharam ou não chegaram a ser analisadas (run_manifest)
+  --json:      resposta estruturada (tool use), um registro por imagem em
+               .produtos/analises.jsonl, indexado por arquivo e por pasta
+  --stream:    resposta em streaming, gravada no arquivo do lote à medida que
+               chega; cada imagem é concluída no manifesto quando a sua seção
+               termina (response_stream)
+  --seo:       passo único: cada imagem vai uma vez só e a resposta
+               estruturada traz análise e SEO; a análise vai para o
+               .produtos/analises.jsonl (como --json) e o SEO para o
+               conteudo_seo_lote_*.txt (substitui generate_seo_content)
+
+Codificação e chamadas à API rodam em paralelo (batch_pipeline):
+FOLTZ_API_CONCURRENCY lotes em voo, FOLTZ_PIPELINE_QUEUE lotes prontos.
+
+Imagens quase idênticas (hash perceptual) vão uma vez só; a resposta é
+copiada para as duplicatas (image_dedupe, desligada por padrão; FOLTZ_DEDUPE=1 liga).
 """
 
 import os
 import sys
-import base64
 import json
-from pathlib import Path
-from PIL import Image
-import io
-import anthropic
+import threading
+from functools import partial
+from image_cache import IMAGE_CACHE
+from image_dedupe import DEDUPER
+from image_pool import PREPROCESSOR
+from claude_client import API_STATS, get_client
+from claude_executor import API_EXECUTOR
+from response_cache import RESPONSE_CACHE, request_fingerprint
+from prompt_cache import PROMPT_CACHE_STATS, cached_system
+from response_stream import SECTION_HEADER, STREAM_STATS, SectionWriter, stream_sender
+from token_packer import OUTPUT_TOKENS_PER_IMAGE, SEO_OUTPUT_TOKENS_PER_IMAGE, TokenPacker
+from usage_ledger import USAGE_LEDGER, combined_savings, describe, message_usage
+from batch_pipeline import BatchPipeline
+from claude_dispatcher import estimate_request_tokens
+from product_store import (
+    ANALYSIS_TOOL, ANALYSIS_TOOL_CHOICE, COMBINED_TOOL, COMBINED_TOOL_CHOICE, ProductStore, split_seo,
+    tool_records
+)
+from generate_seo_content import render_seo, save_seo_content
+from payload_stream import PAYLOAD_BYTE_BUDGET, iter_payload_batches
+from message_batches import run_batch_job
+from run_manifest import RunManifest
+from foltz_imaging import (
+    FORMAT_AUTO, PAYLOAD_STATS, RESIZE_QUALITY, TASK_ANALYSIS,
+    encode_image_block, estimate_batch_tokens, list_images
+)
 from datetime import datetime
 
 # Configurar encoding UTF-8 no Windows
@@ -23,110 +65,123 @@ if sys.platform == 'win32':
 from dotenv import load_dotenv
 load_dotenv()
 
-MAX_DIMENSION = 2000
+RESIZE_MODE = RESIZE_QUALITY  # RESIZE_FAST troca qualidade por velocidade
+IMAGE_TASK = TASK_ANALYSIS  # orçamento de pixels/tokens por imagem (ver foltz_imaging)
+OUTPUT_FORMAT = FORMAT_AUTO  # menor entre JPEG/WebP; FORMAT_SOURCE mantém o formato original
 IMAGE_FOLDERS = ["seedream", "id_visual"]
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 
 # Configuração: altere aqui
-IMAGES_PER_BATCH = 10  # Processar 10 imagens por vez (recomendado para API)
+IMAGES_PER_BATCH = 10  # Teto por lote; o empacotador fecha antes se a resposta não couber em max_tokens
 TOTAL_IMAGES = 50      # Total de imagens a processar (None = todas)
 
+# Modelos tentados em ordem
+ANALYSIS_MODELS = [
+    "claude-3-opus-20240229",     # Melhor qualidade
+    "claude-3-sonnet-20240229",   # Bom equilíbrio
+    "claude-3-haiku-20240307"     # Mais rápido
+]
+
+# Modo --batch-api: catálogo inteiro, um modelo só (sem fallback)
+BATCH_API_JOB = "analise_completa"
+BATCH_API_MODEL = "claude-3-haiku-20240307"
+BATCH_API_MAX_TOKENS = 4000
+
+RUN_NAME = "analise_produtos"  # manifesto da execução: .execucoes/analise_produtos.json
+
+# --seo: análise + SEO numa chamada só (implica --json)
+COMBINED_SEO = "--seo" in sys.argv
+# --json: registros estruturados em vez do markdown consolidado
+STRUCTURED_OUTPUT = "--json" in sys.argv or COMBINED_SEO
+# --stream: texto gravado incrementalmente, TTFT e tokens/s por lote
+STREAMING = "--stream" in sys.argv
+
+# Função de codificação enviada aos workers do pool
+ENCODE_IMAGE = partial(encode_image_block, mode=RESIZE_MODE, task=IMAGE_TASK, output_format=OUTPUT_FORMAT)
+
 def log(message):
     """Log com timestamp"""
     timestamp = datetime.now().strftime("%H:%M:%S")
     print(f"[{timestamp}] {message}")
 
-def resize_and_encode_image(image_path, max_dimension=MAX_DIMENSION):
-    """Redimensiona se necessário e converte para base64"""
-    with Image.open(image_path) as img:
-        width, height = img.size
+def _folder_logger(on_error=None):
+    """Loga o nome da pasta quando muda e cada imagem processada"""
+    current_folder = None
+
+    def log_result(img_path, block, error):
+        nonlocal current_folder
+        if img_path.parent != current_folder:
+            current_folder = img_path.parent
+            log(f"\n📁 Processando pasta: {current_folder}")
+
+        if error:
+            log(f"  ├─ {img_path.name}")
+            log(f"  └─ ERRO: {error}")
+            if on_error:
+                on_error(img_path, error)
+        else:
+            log(f"  ├─ {PAYLOAD_STATS.add(img_path, block)}")
 
-        # Redimensiona se necessário
-        if width > max_dimension or height > max_dimension:
-            if width > height:
-                new_width = max_dimension
-                new_height = int((max_dimension / width) * height)
-            else:
-                new_height = max_dimension
-                new_width = int((max_dimension / height) * width)
-
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            log(f"  └─ Redimensionada: {width}x{height} -> {new_width}x{new_height}")
-
-        # Converte para bytes
-        buffer = io.BytesIO()
-        img_format = img.format or 'JPEG'
-        img.save(buffer, format=img_format, quality=90)
-
-        return base64.b64encode(buffer.getvalue()).decode('utf-8')
-
-def get_media_type(file_path):
-    """Retorna media type da imagem"""
-    ext = file_path.suffix.lower()
-    return {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp'
-    }.get(ext, 'image/jpeg')
+    return log_result
 
-def collect_and_process_images(folders, limit=None):
-    """Coleta e processa imagens"""
+def process_image_paths(paths):
+    """Codifica as imagens no pool de processos e monta os blocos da API, na ordem"""
     images = []
     image_names = []
+    log_result = _folder_logger()
 
-    for folder in folders:
-        folder_path = Path(folder)
-        if not folder_path.exists():
+    for img_path, block, error in PREPROCESSOR.map(ENCODE_IMAGE, paths):
+        log_result(img_path, block, error)
+        if error:
             continue
 
-        log(f"\n📁 Processando pasta: {folder}")
-
-        for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp']:
-            for img_path in sorted(folder_path.glob(ext)):
-                if limit and len(images) >= limit:
-                    break
-
-                try:
-                    log(f"  ├─ {img_path.name}")
-                    image_base64 = resize_and_encode_image(img_path)
-
-                    images.append({
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": get_media_type(img_path),
-                            "data": image_base64
-                        }
-                    })
-                    image_names.append(img_path.name)
-
-                except Exception as e:
-                    log(f"  └─ ERRO: {e}")
-
-        if limit and len(images) >= limit:
-            break
+        images.append(block)
+        image_names.append(img_path.name)
 
     return images, image_names
 
-def analyze_with_claude(images, image_names, batch_number):
-    """Envia para Claude e retorna análise detalhada"""
-    if not ANTHROPIC_API_KEY:
-        log("\n❌ ERRO: ANTHROPIC_API_KEY não encontrada")
-        return None
+def iter_image_batches(folders, batch_size, limit=None, byte_budget=PAYLOAD_BYTE_BUDGET,
+                       paths=None, on_error=None, packer=None):
+    """
+    Percorre as pastas uma única vez e gera os lotes já codificados
+    (imagens, nomes, caminhos). Cada imagem é processada exatamente uma vez,
+    sob demanda; o lote fecha em batch_size imagens, em byte_budget bytes
+    de base64 ou no orçamento de tokens do packer (TokenPacker).
+    paths substitui a listagem das pastas (ex.: só as pendentes)
+    """
+    if paths is None:
+        paths = list_images(folders)
+        if limit:
+            paths = paths[:limit]
+
+    batches = iter_payload_batches(
+        paths, ENCODE_IMAGE, batch_size, byte_budget,
+        on_result=_folder_logger(on_error), packer=packer
+    )
+    for batch in batches:
+        images = [block for _, block in batch]
+        image_names = [img_path.name for img_path, _ in batch]
+        image_paths = [img_path for img_path, _ in batch]
+        del batch
+        yield images, image_names, image_paths
+
+def collect_and_process_images(folders, limit=None):
+    """Coleta e processa imagens"""
+    paths = list_images(folders)
+    if limit:
+        paths = paths[:limit]
 
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    return process_image_paths(paths)
 
-    # Prompt detalhado e estruturado
-    prompt = f"""Você é um especialista em jerseys de futebol para e-commerce.
+# Instruções fixas: vão no system com cache_control (prompt_cache)
+ANALYSIS_SYSTEM_PROMPT = """Você é um especialista em jerseys de futebol para e-commerce.
 
-Analise estas {len(images)} imagens de jerseys e forneça uma análise DETALHADA para cada uma.
+Analise as imagens de jerseys enviadas e forneça uma análise DETALHADA para cada uma.
 
 Para CADA IMAGEM, forneça no seguinte formato:
 
 ---
-**IMAGEM {batch_number}-[número] ({image_names[0] if image_names else 'imagem'})**
+**IMAGEM [lote]-[número] ([nome do arquivo])**
 
 ### 1. IDENTIFICAÇÃO
 - Time/Seleção: [Nome completo]
@@ -184,56 +239,205 @@ Para CADA IMAGEM, forneça no seguinte formato:
 Seja extremamente detalhado e específico. Use linguagem que vende - emotiva, aspiracional e informativa.
 """
 
+# Modo --json: o formato vem do input_schema de ANALYSIS_TOOL
+STRUCTURED_SYSTEM_PROMPT = """Você é um especialista em jerseys de futebol para e-commerce.
+
+Analise as imagens de jerseys enviadas e registre, com a ferramenta registrar_analises, um
+item por imagem, na ordem em que foram enviadas. No campo filename use exatamente o nome do
+arquivo informado para a imagem.
+
+Seja extremamente detalhado e específico: identifique time, liga, tipo de uniforme e temporada
+pelo escudo, patrocínios e design. Na descrição, use linguagem que vende - emotiva,
+aspiracional e informativa. O preço é em pesos argentinos (ARS), baseado em raridade e demanda.
+"""
+
+# Modo --seo: uma chamada no lugar de generate_seo_content + esta análise
+COMBINED_SYSTEM_PROMPT = STRUCTURED_SYSTEM_PROMPT + """
+No mesmo item, preencha o campo seo com o conteúdo SEO da página do produto: title tag
+(máx 60 caracteres) e meta description (máx 155) com a palavra-chave principal, slug de URL,
+H1 e 3-5 H2, palavras-chave secundárias e long-tail (5-10 cada), texto SEO de 300-500 palavras
+com densidade de palavra-chave de 2-3% terminando num call-to-action, e alt text com 3
+variações. Use palavras-chave naturalmente. Foque em intenção de busca comercial.
+"""
+# Etapas que o passo único substitui, para comparar no registro de uso
+SEPARATE_STAGES = ("generate_seo_content", "analyze_products_complete")
+COMBINED_STAGE = "analise_seo_combinada"
+if COMBINED_SEO and not os.environ.get("FOLTZ_USAGE_STAGE"):
+    USAGE_LEDGER.stage = COMBINED_STAGE
+
+def build_prompt(images_count, image_names, batch_number):
+    """Parte variável do prompt de um lote (vai depois do system em cache)"""
+    return (f"Lote {batch_number}: {images_count} imagens, nesta ordem: {', '.join(image_names)}.\n"
+            f"Use o cabeçalho **IMAGEM {batch_number}-[número] ([nome do arquivo])** para cada uma.")
+
+def model_max_tokens(model):
+    """Define max_tokens baseado no modelo"""
+    return 4000 if "haiku" in model else 8000
+
+# Lotes pelo max_tokens do primeiro modelo; se um fallback menor truncar, o lote é dividido
+PACKER = TokenPacker(model_max_tokens(ANALYSIS_MODELS[0]), max_images=IMAGES_PER_BATCH,
+                     output_per_image=OUTPUT_TOKENS_PER_IMAGE + (SEO_OUTPUT_TOKENS_PER_IMAGE if COMBINED_SEO else 0))
+BATCH_API_IMAGES_PER_REQUEST = TokenPacker(BATCH_API_MAX_TOKENS, max_images=IMAGES_PER_BATCH).capacity
+
+# Lotes codificados enquanto os anteriores estão na rede (FOLTZ_API_CONCURRENCY em voo)
+PIPELINE = BatchPipeline()
+
+def split_truncated(result, structured=False):
+    """
+    (parte aproveitável, nomes dos arquivos respondidos por inteiro) de uma
+    resposta cortada em max_tokens: a última seção/registro está incompleta
+    """
+    if structured:
+        records = json.loads(result)[:-1]
+        return json.dumps(records, ensure_ascii=False), [record.get("filename") for record in records]
+    headers = list(SECTION_HEADER.finditer(result))
+    if not headers:
+        return "", []
+    return result[:headers[-1].start()], [m.group("name") for m in headers[:-1]]
+
+def fan_out(result, done_paths, duplicates, structured=False):
+    """
+    Copia a resposta de cada representante respondido para as suas
+    duplicatas; devolve (resultado com as cópias no fim, caminhos copiados)
+    """
+    members = {path.name: duplicates[path] for path in done_paths if path in duplicates}
+    if not members:
+        return result, []
+
+    copied = []
+    if structured:
+        records = json.loads(result)
+        for record in list(records):
+            for member in members.get(record.get("filename"), []):
+                records.append({**record, "filename": member.name, "duplicate_of": record["filename"]})
+                copied.append(member)
+        return json.dumps(records, ensure_ascii=False), copied
+
+    headers = list(SECTION_HEADER.finditer(result))
+    copies = []
+    for i, header in enumerate(headers):
+        name = header.group("name")
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(result)
+        body = result[header.end():end].rstrip()
+        number = header.group(0).split()[1]  # lote-n do representante
+        for member in members.get(name, []):
+            copies.append(f"**IMAGEM {number} ({member.name})**\n"
+                          f"_Mesma análise de {name} (imagem quase idêntica)_{body}\n\n")
+            copied.append(member)
+    if not copies:
+        return result, []
+    return result.rstrip() + "\n\n" + "".join(copies), copied
+
+def analyze_with_claude(images, image_names, batch_number, structured=False, streaming=False, writer=None,
+                        payload_summary=None, throttle=None):
+    """
+    Envia para Claude e retorna (análise detalhada, truncada em max_tokens)
+    structured: devolve a lista de registros em JSON (texto) em vez de markdown
+    streaming: recebe a resposta em streaming; o texto vai para writer
+    (SectionWriter) à medida que chega
+    payload_summary: linha do payload do lote, fechada quando o lote foi
+    codificado (no pipeline, o próximo lote já está sendo codificado)
+    throttle(tokens): espera os limites da conta antes de chamar a API
+    (não é chamado quando a resposta vem do cache)
+    """
+    if not ANTHROPIC_API_KEY:
+        log("\n❌ ERRO: ANTHROPIC_API_KEY não encontrada")
+        return None, False
+
+    client = get_client(ANTHROPIC_API_KEY)
+
+    prompt = build_prompt(len(images), image_names, batch_number)
     content = [{"type": "text", "text": prompt}] + images
+    if COMBINED_SEO:
+        system_prompt = COMBINED_SYSTEM_PROMPT
+        output_params = {"tools": [COMBINED_TOOL], "tool_choice": COMBINED_TOOL_CHOICE}
+    elif structured:
+        system_prompt = STRUCTURED_SYSTEM_PROMPT
+        output_params = {"tools": [ANALYSIS_TOOL], "tool_choice": ANALYSIS_TOOL_CHOICE}
+    else:
+        system_prompt = ANALYSIS_SYSTEM_PROMPT
+        output_params = {}
 
     log(f"\n🤖 Enviando lote {batch_number} ({len(images)} imagens) para Claude...")
-
+    log(f"  ├─ Tokens de imagem estimados: ~{estimate_batch_tokens(images)}")
+    log(f"  ├─ {payload_summary or PAYLOAD_STATS.end_batch()}")
+
+    # Tenta diferentes modelos
+    models_to_try = ANALYSIS_MODELS
+
+    # Mesmo prompt + mesmas imagens já respondidos em outra execução
+    fingerprint = request_fingerprint(prompt, images, system=system_prompt)
+    cached, model = RESPONSE_CACHE.get_any(models_to_try, fingerprint, model_max_tokens)
+    if cached is not None:
+        log(f"  └─ ♻️  Resposta em cache ({model})")
+        return cached, False
+
+    if throttle:
+        throttle(estimate_request_tokens(content))
+    send = stream_sender(writer) if streaming else None
     try:
-        # Tenta diferentes modelos
-        models_to_try = [
-            "claude-3-opus-20240229",     # Melhor qualidade
-            "claude-3-sonnet-20240229",   # Bom equilíbrio
-            "claude-3-haiku-20240307"     # Mais rápido
-        ]
-
-        last_error = None
-        for model in models_to_try:
-            try:
-                log(f"  ├─ Tentando modelo: {model}")
-                # Define max_tokens baseado no modelo
-                max_tokens = 4000 if "haiku" in model else 8000
-                message = client.messages.create(
-                    model=model,
-                    max_tokens=max_tokens,  # Ajustado por modelo
-                    messages=[{"role": "user", "content": content}]
-                )
-                log(f"  └─ ✓ Sucesso com: {model}")
-                return message.content[0].text
-            except Exception as e:
-                log(f"  └─ ✗ Falhou: {str(e)[:100]}")
-                last_error = e
-                continue
+        # Retentáveis esperam, erros do modelo trocam de modelo, fatais desistem
+        message, model = API_EXECUTOR.create(
+            client, models_to_try, model_max_tokens,  # Ajustado por modelo
+            log=log,
+            send=send,
+            system=cached_system(system_prompt, output_params.get("tools"), models_to_try[0], log=log),
+            messages=[{"role": "user", "content": content}],
+            **output_params
+        )
+        PROMPT_CACHE_STATS.add(message.usage)
+        log(f"  ├─ ✓ Sucesso com: {model}")
+        log(f"  ├─ {describe(message_usage(message))}")  # desta chamada (lotes em paralelo)
+        if send:
+            STREAM_STATS.add(batch_number, model, send.timer)
+            log(f"  ├─ Streaming: {send.timer.describe()}")
+        log(f"  └─ {API_STATS.last()}")
+        truncated = message.stop_reason == "max_tokens"
+        if structured:
+            records = tool_records(message)
+            if not records and not truncated:
+                log("  ✗ Resposta sem registros estruturados")
+                return None, False
+            text = json.dumps(records, ensure_ascii=False)
+        else:
+            text = message.content[0].text if message.content else ""
 
-        if last_error:
-            raise last_error
+        if truncated:
+            _, completed = split_truncated(text, structured)
+            PACKER.observe(len(images), message.usage.output_tokens, completed=len(completed))
+            log(f"  ⚠️  Resposta cortada em max_tokens: {len(completed)}/{len(images)} imagens completas")
+            return text, True  # não vai para o cache de respostas
 
-        return None
+        PACKER.observe(len(images), message.usage.output_tokens)
+        RESPONSE_CACHE.put(model, fingerprint, model_max_tokens(model), text)
+        return text, False
 
     except Exception as e:
         log(f"\n❌ ERRO na API: {e}")
-        return None
+        return None, False
 
-def save_results(results, batch_number):
-    """Salva resultados em arquivos"""
+def batch_file_name(batch_number):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    # Arquivo individual do lote
-    batch_file = f"analise_lote_{batch_number}_{timestamp}.txt"
-    with open(batch_file, "w", encoding="utf-8") as f:
-        f.write(f"ANÁLISE DE PRODUTOS - LOTE {batch_number}\n")
-        f.write(f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
-        f.write("="*80 + "\n\n")
-        f.write(results)
+    return f"analise_lote_{batch_number}_{timestamp}.txt"
+
+def batch_file_header(batch_number):
+    return (f"ANÁLISE DE PRODUTOS - LOTE {batch_number}\n"
+            f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n"
+            + "="*80 + "\n\n")
+
+def save_results(results, batch_number, batch_file=None, rewrite=False):
+    """
+    Salva resultados em arquivos
+    batch_file: arquivo do lote já gravado (streaming); só acrescenta ao
+    consolidado, a não ser que rewrite=True (resposta cortada: o arquivo é
+    regravado no lugar só com as seções completas)
+    """
+    if batch_file is None or rewrite:
+        # Arquivo individual do lote
+        batch_file = batch_file or batch_file_name(batch_number)
+        with open(batch_file, "w", encoding="utf-8") as f:
+            f.write(batch_file_header(batch_number))
+            f.write(results)
 
     log(f"  └─ Salvo: {batch_file}")
 
@@ -250,24 +454,85 @@ def save_results(results, batch_number):
 
     return batch_file, consolidated_file
 
+def save_records(store, result, image_paths, batch_number):
+    """
+    Grava os registros estruturados no store; no modo --seo, o bloco seo
+    vai para o arquivo de conteúdo SEO do lote. Devolve os caminhos gravados
+    """
+    records = json.loads(result)
+    if COMBINED_SEO:
+        records, seo_records = split_seo(records)
+        if seo_records:
+            log(f"  └─ SEO salvo: {save_seo_content(render_seo(seo_records), batch_number)}")
+    return store.add(records, image_paths, batch_number, log=log)
+
+def run_batch_api():
+    """Catálogo inteiro via Message Batches; grava nos mesmos arquivos por lote"""
+    if not ANTHROPIC_API_KEY:
+        log("\n❌ ERRO: ANTHROPIC_API_KEY não encontrada")
+        return
+
+    paths = list_images(IMAGE_FOLDERS)
+    size = BATCH_API_IMAGES_PER_REQUEST
+    chunks = [paths[i:i + size] for i in range(0, len(paths), size)]
+    log(f"  └─ {len(paths)} imagens em {len(chunks)} lotes de até {size} (max_tokens {BATCH_API_MAX_TOKENS})")
+
+    def requests_for(job):
+        # custom_id fixo por lote: é o que permite retomar sem reenviar
+        for batch_number, chunk in enumerate(chunks, 1):
+            custom_id = f"lote-{batch_number}"
+            if job.is_submitted(custom_id):
+                continue
+            images, image_names = process_image_paths(chunk)
+            if not images:
+                continue
+            prompt = build_prompt(len(images), image_names, batch_number)
+            content = [{"type": "text", "text": prompt}] + images
+            yield custom_id, {
+                "model": BATCH_API_MODEL,
+                "max_tokens": BATCH_API_MAX_TOKENS,
+                "system": cached_system(ANALYSIS_SYSTEM_PROMPT, model=BATCH_API_MODEL, log=log),
+                "messages": [{"role": "user", "content": content}],
+            }
+
+    def on_result(custom_id, text, error):
+        batch_number = int(custom_id.split("-")[1])
+        if text:
+            save_results(text, batch_number)
+        else:
+            log(f"  ✗ Lote {batch_number} falhou: {error}")
+
+    client = get_client(ANTHROPIC_API_KEY)
+    job = run_batch_job(client, BATCH_API_JOB, requests_for, on_result, log=log)
+    log(f"\n{job.report()}")
+    log(IMAGE_CACHE.report())
+    log(PAYLOAD_STATS.report())
+    log(API_STATS.report())
+    log(USAGE_LEDGER.report())
+
 def main():
+    if "--batch-api" in sys.argv:
+        print("="*80)
+        print(" ANÁLISE DO CATÁLOGO - MESSAGE BATCHES API ".center(80, "="))
+        print("="*80)
+        run_batch_api()
+        return
+
     print("="*80)
     print(" ANALISADOR COMPLETO DE PRODUTOS - FOLTZ FANWEAR ".center(80, "="))
     print("="*80)
 
     log(f"Configuração:")
-    log(f"  ├─ Imagens por lote: {IMAGES_PER_BATCH}")
+    log(f"  ├─ Imagens por lote: até {PACKER.capacity} (orçamento de tokens; teto {IMAGES_PER_BATCH})")
     log(f"  ├─ Total de imagens: {TOTAL_IMAGES if TOTAL_IMAGES else 'TODAS'}")
+    log(f"  ├─ Orçamento por lote: {PIPELINE.batch_byte_budget / 1024 / 1024:.1f} MB (base64; "
+        f"{PIPELINE.memory_budget / 1024 / 1024:.0f} MB divididos entre {PIPELINE.slots} vagas do pipeline)")
+    log(f"  ├─ Pipeline: {PIPELINE.network_workers} lotes em voo, até {PIPELINE.queue_size} prontos na fila")
     log(f"  └─ Pastas: {', '.join(IMAGE_FOLDERS)}")
 
     # Coleta todas as imagens disponíveis
     log("\n🔍 Coletando imagens disponíveis...")
-    all_images = []
-    for folder in IMAGE_FOLDERS:
-        folder_path = Path(folder)
-        if folder_path.exists():
-            for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp']:
-                all_images.extend(list(folder_path.glob(ext)))
+    all_images = list_images(IMAGE_FOLDERS)
 
     total_available = len(all_images)
     log(f"  └─ {total_available} imagens encontradas")
@@ -278,61 +543,174 @@ def main():
 
     # Define quantas processar
     images_to_process = min(TOTAL_IMAGES, total_available) if TOTAL_IMAGES else total_available
+
+    # Só o que ainda não foi concluído (tudo, numa execução nova)
+    manifest = RunManifest(RUN_NAME)
+    todo = manifest.pending(all_images[:images_to_process])
+    if manifest.resumed:
+        log(f"  └─ ♻️  Retomando: {images_to_process - len(todo)} já concluídas")
+    # Quase idênticas: só o representante de cada grupo vai para a API
+    todo, duplicates = DEDUPER.group(todo)
+    if duplicates:
+        log(f"  └─ 🧬 {sum(len(m) for m in duplicates.values())} duplicatas em {len(duplicates)} grupos "
+            f"(respondidas pelo representante)")
+    images_to_process = len(todo)
     log(f"  └─ Processando: {images_to_process} imagens")
 
     # Processa em lotes
-    total_batches = (images_to_process + IMAGES_PER_BATCH - 1) // IMAGES_PER_BATCH
-    log(f"  └─ Total de lotes: {total_batches}")
+    total_batches = (images_to_process + PACKER.capacity - 1) // PACKER.capacity
+    log(f"  └─ Total de lotes: {total_batches} (mais, se o orçamento de bytes dividir algum)")
 
     processed_count = 0
-
-    for batch_num in range(1, total_batches + 1):
+    batch_count = 0
+    image_tokens = 0  # tokens de imagem enviados (o passo único não reenvia)
+    # prepare roda na thread de codificação e, para as sobras, na de tratamento
+    counters_lock = threading.Lock()
+    store = ProductStore() if STRUCTURED_OUTPUT else None
+
+    def prepare(images, image_names, image_paths, payload):
+        """Lote codificado -> job: número no manifesto e, no streaming, o arquivo do lote"""
+        nonlocal batch_count, image_tokens
+        batch_num = manifest.next_batch()
+        manifest.assign(batch_num, image_paths)
+        with counters_lock:
+            batch_count += 1
+            image_tokens += estimate_batch_tokens(images)
+            count = batch_count
         log(f"\n{'='*80}")
-        log(f"🎯 LOTE {batch_num}/{total_batches}")
+        log(f"🎯 LOTE {batch_num} ({count}/{max(count, total_batches)})")
         log(f"{'='*80}")
-
-        # Calcula quantas imagens pegar neste lote
-        remaining = images_to_process - processed_count
-        batch_size = min(IMAGES_PER_BATCH, remaining)
-
-        # Processa imagens
-        images, image_names = collect_and_process_images(
-            IMAGE_FOLDERS,
-            limit=processed_count + batch_size
-        )
-
-        # Pega apenas as novas imagens deste lote
-        images = images[processed_count:]
-        image_names = image_names[processed_count:]
-
-        if not images:
-            log("  └─ Sem imagens neste lote")
-            break
-
         log(f"\n📊 {len(images)} imagens processadas neste lote")
 
-        # Analisa com Claude
-        result = analyze_with_claude(images, image_names, batch_num)
-
-        if result:
-            log(f"\n✓ Análise concluída!")
-            log(f"  ├─ Tokens na resposta: ~{len(result)} caracteres")
-
-            # Salva resultados
-            log(f"\n💾 Salvando resultados...")
-            batch_file, consolidated_file = save_results(result, batch_num)
+        # Streaming: cada seção completa já conclui a sua imagem no manifesto
+        writer = None
+        if STREAMING and not store:
+            paths_by_name = dict(zip(image_names, image_paths))
+            batch_file = batch_file_name(batch_num)
+
+            def commit_section(name):
+                if name in paths_by_name:
+                    manifest.complete_image(batch_num, paths_by_name[name], batch_file)
+
+            writer = SectionWriter(batch_file, batch_file_header(batch_num), on_section=commit_section)
+        return {"batch_num": batch_num, "images": images, "image_names": image_names,
+                "image_paths": image_paths, "writer": writer, "payload": payload}
+
+    def prepared_batches():
+        """Estágio de codificação: cada lote é codificado uma única vez, quando há vaga no pipeline"""
+        batches = iter_image_batches(IMAGE_FOLDERS, IMAGES_PER_BATCH, paths=todo, on_error=manifest.fail_image,
+                                     packer=PACKER, byte_budget=PIPELINE.batch_byte_budget)
+        for images, image_names, image_paths in batches:
+            yield prepare(images, image_names, image_paths, PAYLOAD_STATS.end_batch())
+
+    def send(job):
+        """
+        Estágio de rede. Lote montado antes de um corte subir a estimativa
+        de saída é aparado à capacidade atual; o resto volta para a fila
+        """
+        capacity = PACKER.capacity
+        if len(job["images"]) > capacity:
+            columns = ("images", "image_names", "image_paths")
+            job["overflow"] = [job[column][capacity:] for column in columns]
+            for column in columns:
+                job[column] = job[column][:capacity]
+            manifest.assign(job["batch_num"], job["image_paths"])
+            log(f"\n✂️  Lote {job['batch_num']}: {len(job['overflow'][0])} imagens voltam para a fila "
+                f"(lotes de até {capacity} depois do último corte)")
+        return analyze_with_claude(job["images"], job["image_names"], job["batch_num"],
+                                   structured=STRUCTURED_OUTPUT, streaming=STREAMING, writer=job["writer"],
+                                   payload_summary=job["payload"], throttle=PIPELINE.throttle)
+
+    def handle(job, outcome):
+        """Grava o lote (na ordem dos lotes); devolve as sobras de uma resposta cortada"""
+        nonlocal processed_count
+        batch_num, writer = job["batch_num"], job["writer"]
+        images, image_names, image_paths = job["images"], job["image_names"], job["image_paths"]
+        result, truncated = outcome or (None, False)
+        requeued = []
+
+        if result is not None and truncated:
+            # Guarda as imagens respondidas por inteiro e divide o resto
+            kept, done_names = split_truncated(result, STRUCTURED_OUTPUT)
+            done_names = set(done_names)
+            done_paths = [path for name, path in zip(image_names, image_paths) if name in done_names]
+            if done_paths:
+                log(f"\n💾 Lote {batch_num}: salvando {len(done_paths)} imagens completas...")
+                kept, copied = fan_out(kept, done_paths, duplicates, STRUCTURED_OUTPUT)
+                if store:
+                    saved = set(save_records(store, kept, done_paths + copied, batch_num))
+                    output = str(store.path)
+                else:
+                    saved = set(done_paths + copied)
+                    # No streaming o SectionWriter já abriu o arquivo do lote: regrava o mesmo
+                    streamed_file = str(writer.path) if writer and writer.path.exists() else None
+                    output, _ = save_results(kept, batch_num, batch_file=streamed_file, rewrite=True)
+                for path in done_paths + copied:
+                    if path in saved:
+                        manifest.complete_image(batch_num, path, output)
+                    else:
+                        manifest.fail_image(path, "sem registro na resposta")
+
+            remaining = [(image, name, path) for image, name, path in zip(images, image_names, image_paths)
+                         if path not in done_paths]
+            if len(images) == 1:
+                manifest.fail(batch_num, "resposta cortada em max_tokens com uma imagem só")
+                log(f"\n❌ Lote {batch_num}: resposta cortada mesmo com uma imagem")
+            elif remaining:
+                manifest.fail(batch_num, "resposta cortada em max_tokens; reenviada em lotes menores")
+                chunks = PACKER.split(remaining)
+                summary = f"Payload do lote: reenvio de imagens já codificadas (lote {batch_num})"
+                requeued = [prepare(*[list(column) for column in zip(*chunk)], summary) for chunk in chunks]
+                log(f"\n✂️  Lote {batch_num} cortado: {len(remaining)} imagens reenviadas em {len(chunks)} lotes "
+                    f"de até {PACKER.capacity}")
+            processed_count += len(images) - sum(len(extra["images"]) for extra in requeued)
+
+        elif result:
+            log(f"\n✓ Análise do lote {batch_num} concluída!")
+
+            # Salva resultados (com as cópias para as duplicatas)
+            log(f"\n💾 Salvando resultados do lote {batch_num}...")
+            answered, copied = fan_out(result, image_paths, duplicates, STRUCTURED_OUTPUT)
+            if store:
+                saved = save_records(store, answered, image_paths + copied, batch_num)
+                log(f"  └─ {len(saved)} registros em {store.path}")
+                output = str(store.path)
+                missing = [path for path in image_paths + copied if path not in saved]
+            else:
+                missing = []
+                # Resposta do cache de respostas não passa pelo stream: grava o arquivo aqui
+                streamed_file = str(writer.path) if writer and writer.path.exists() else None
+                if streamed_file and copied:
+                    with open(streamed_file, "a", encoding="utf-8") as f:
+                        f.write(answered[len(result.rstrip()):])
+                output, consolidated_file = save_results(answered, batch_num, batch_file=streamed_file)
+            manifest.complete(batch_num, output)
+            for path in copied:
+                manifest.complete_image(batch_num, path, output)
+            # Sem registro na resposta: fica para a próxima execução com --resume
+            for path in missing:
+                manifest.fail_image(path, "sem registro na resposta")
+            if copied:
+                log(f"  └─ 🧬 Resposta copiada para {len(copied)} duplicatas")
 
             log(f"\n✓ Lote {batch_num} concluído!")
+            processed_count += len(images)
         else:
+            manifest.fail(batch_num, "sem resposta da API")
             log(f"\n❌ Falha na análise do lote {batch_num}")
+            if writer and writer.committed:
+                log(f"  └─ {len(writer.committed)} imagens recebidas antes da falha, salvas em {writer.path}")
+            processed_count += len(images)
+
+        if job.get("overflow"):
+            requeued.append(prepare(*job["overflow"], f"Payload do lote: aparado do lote {batch_num}"))
 
-        processed_count += len(images)
+        # Libera o lote (as sobras já têm as suas referências)
+        job.clear()
+        return requeued
 
-        # Pequena pausa entre lotes para não sobrecarregar a API
-        if batch_num < total_batches:
-            import time
-            log("\n⏸️  Aguardando 2 segundos antes do próximo lote...")
-            time.sleep(2)
+    # Codificação, rede e gravação em paralelo; a fila limitada segura a codificação
+    PIPELINE.run(prepared_batches(), send, handle)
 
     # Resumo final
     print("\n" + "="*80)
@@ -340,9 +718,28 @@ def main():
     print("="*80)
     log(f"\n📊 RESUMO:")
     log(f"  ├─ Total processado: {processed_count} imagens")
-    log(f"  ├─ Lotes completados: {batch_num}")
-    log(f"  ├─ Arquivo consolidado: analise_produtos_completa.txt")
-    log(f"  └─ Arquivos individuais: analise_lote_*.txt")
+    log(f"  ├─ Lotes completados: {batch_count}")
+    log(f"  ├─ {manifest.report()}")
+    if store:
+        log(f"  ├─ {store.report()}")
+    else:
+        log(f"  ├─ Arquivo consolidado: analise_produtos_completa.txt")
+        log(f"  ├─ Arquivos individuais: analise_lote_*.txt")
+    log(f"  ├─ {DEDUPER.report()}")
+    log(f"  ├─ {IMAGE_CACHE.report()}")
+    log(f"  ├─ {PAYLOAD_STATS.report()}")
+    log(f"  ├─ {PREPROCESSOR.report()}")
+    log(f"  ├─ {RESPONSE_CACHE.report()}")
+    log(f"  ├─ {API_STATS.report()}")
+    log(f"  ├─ {API_EXECUTOR.report()}")
+    log(f"  ├─ {USAGE_LEDGER.report()}")
+    if COMBINED_SEO:
+        log(f"  ├─ {combined_savings(USAGE_LEDGER.records, SEPARATE_STAGES, image_tokens)}")
+    log(f"  ├─ {PACKER.report()}")
+    log(f"  ├─ {PIPELINE.report()}")
+    log(f"  {'├' if STREAMING else '└'}─ {PROMPT_CACHE_STATS.report()}")
+    if STREAMING:
+        log(f"  └─ {STREAM_STATS.report()}")
 
     print("\n" + "="*80)
     log("✨ Processo finalizado com sucesso!")
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PIPELINE PRODUTOR/CONSUMIDOR ENTRE CODIFICAÇÃO E API
+Em vez de alternar (codifica um lote, espera a rede, codifica o próximo),
+três estágios rodam ao mesmo tempo:
+
+  codificação (thread + pool de processos) -> [fila de lotes prontos]
+    -> workers de rede (network_workers requisições em voo)
+    -> tratamento (thread que chamou run, na ordem dos lotes)
+
+- Backpressure: um lote só começa a ser codificado quando há vaga; no
+  máximo queue_size + network_workers lotes codificados existem ao mesmo
+  tempo (prontos, em voo ou aguardando a vez de serem tratados)
+- Memória: o orçamento de memória (FOLTZ_PIPELINE_MEMORY_BUDGET, padrão
+  PAYLOAD_BYTE_BUDGET) é dividido entre as vagas; batch_byte_budget é o
+  orçamento de bytes de cada lote, então o pico de payloads vivos continua
+  limitado pelo orçamento (uma imagem maior que a fatia vai sozinha no lote)
+- handle() pode devolver lotes novos (ex.: sobras de uma resposta cortada),
+  que entram na fila sem esperar vaga: ocupam a vaga do lote de onde
+  vieram (são parte das imagens dele), liberada quando a última sobra é
+  tratada
+- Limites da conta: send chama throttle() antes de cada requisição de
+  verdade (respostas em cache não passam); é o RateLimiter do
+  claude_dispatcher (RPM + tokens de entrada por minuto), o mesmo do
+  despacho assíncrono, em vez de só reagir aos 429
+- Métricas: ocupação de cada estágio, tempo da codificação bloqueada pela
+  fila cheia, tempo dos workers de rede sem trabalho e profundidade média
+  e máxima das filas; report() aponta o gargalo. As métricas somam todas
+  as chamadas a run()
+"""
+
+import os
+import time
+import queue
+import itertools
+import threading
+
+from claude_dispatcher import API_CONCURRENCY, RateLimiter
+from payload_stream import PAYLOAD_BYTE_BUDGET
+
+PIPELINE_QUEUE_SIZE = int(os.environ.get("FOLTZ_PIPELINE_QUEUE", "2"))
+# Total de base64 vivo no pipeline (todas as vagas somadas)
+PIPELINE_MEMORY_BUDGET = int(os.environ.get("FOLTZ_PIPELINE_MEMORY_BUDGET", PAYLOAD_BYTE_BUDGET))
+
+_STOP = object()
+_PRODUCER_DONE = object()
+
+
+class StageStats:
+    """Tempo ocupado e tempo esperando de um estágio com workers threads"""
+
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy, waiting=0.0, items=1):
+        with self._lock:
+            self.items += items
+            self.busy += busy
+            self.waiting += waiting
+
+    def utilisation(self, seconds):
+        return self.busy / (seconds * self.workers) if seconds else 0.0
+
+
+class QueueStats:
+    """Profundidade de uma fila, amostrada a cada entrada e saída"""
+
+    def __init__(self, name, capacity=None):
+        self.name = name
+        self.capacity = capacity
+        self.samples = 0
+        self.total = 0
+        self.maximum = 0
+        self._lock = threading.Lock()
+
+    def sample(self, depth):
+        with self._lock:
+            self.samples += 1
+            self.total += depth
+            self.maximum = max(self.maximum, depth)
+
+    def describe(self):
+        average = self.total / self.samples if self.samples else 0.0
+        capacity = f"/{self.capacity}" if self.capacity else ""
+        return f"{self.name} média {average:.1f}{capacity} (máx {self.maximum})"
+
+
+class _Slot:
+    """Vaga de um lote codificado, compartilhada com as sobras dele (só a thread de run mexe)"""
+
+    def __init__(self):
+        self.refs = 1
+
+
+class BatchPipeline:
+    """
+    run(jobs, send, handle):
+      jobs: iterável (gerador) de lotes, consumido na thread de codificação
+      send(lote) -> resultado, nos workers de rede; exceção vira None
+      handle(lote, resultado) -> lotes extras ou None, na thread de run,
+      na ordem em que os lotes entraram
+    throttle(tokens_de_entrada): chamado por send antes de cada requisição
+    batch_byte_budget: orçamento de bytes para montar cada lote de jobs
+    """
+
+    def __init__(self, network_workers=API_CONCURRENCY, queue_size=PIPELINE_QUEUE_SIZE, limiter=None,
+                 memory_budget=PIPELINE_MEMORY_BUDGET):
+        self.network_workers = max(1, network_workers)
+        self.queue_size = max(1, queue_size)
+        self.memory_budget = memory_budget
+        self.limiter = limiter or RateLimiter()
+        self.encode = StageStats("codificação")
+        self.network = StageStats("rede", self.network_workers)
+        self.handling = StageStats("tratamento")
+        self.ready_depth = QueueStats("lotes prontos", self.queue_size)
+        self.done_depth = QueueStats("respostas esperando a vez")
+        self.errors = []
+        self.resubmitted = 0
+        self.seconds = 0.0
+
+    @property
+    def slots(self):
+        return self.queue_size + self.network_workers
+
+    @property
+    def batch_byte_budget(self):
+        """Fatia do orçamento de memória por vaga (nunca acima do limite por requisição)"""
+        return min(PAYLOAD_BYTE_BUDGET, self.memory_budget // self.slots)
+
+    def throttle(self, input_tokens):
+        """Espera os limites de RPM e tokens de entrada da conta (workers de rede)"""
+        self.limiter.acquire_sync(input_tokens)
+
+    def run(self, jobs, send, handle):
+        start = time.perf_counter()
+        ready = queue.Queue()
+        done = queue.Queue()
+        slots = threading.Semaphore(self.slots)
+        sequence = itertools.count()
+        sequence_lock = threading.Lock()
+        failure = []
+        encoded = 0           # lotes desta chamada (as métricas são acumuladas)
+
+        def next_sequence():
+            with sequence_lock:
+                return next(sequence)
+
+        def produce():
+            nonlocal encoded
+            try:
+                jobs_iter = iter(jobs)
+                while True:
+                    waited = time.perf_counter()
+                    slots.acquire()  # backpressure: sem vaga, não codifica
+                    began = time.perf_counter()
+                    job = next(jobs_iter, _STOP)
+                    finished = time.perf_counter()
+                    if job is _STOP:
+                        slots.release()
+                        break
+                    self.encode.add(finished - began, began - waited)
+                    encoded += 1
+                    ready.put((next_sequence(), job, _Slot()))
+                    self.ready_depth.sample(ready.qsize())
+            except BaseException as e:
+                failure.append(e)
+            finally:
+                done.put(_PRODUCER_DONE)
+
+        def network_worker():
+            while True:
+                waited = time.perf_counter()
+                item = ready.get()
+                if item is _STOP:
+                    return
+                self.ready_depth.sample(ready.qsize())
+                began = time.perf_counter()
+                number, job, slot = item
+                try:
+                    result = send(job)
+                except Exception as e:
+                    self.errors.append(str(e))
+                    result = None
+                self.network.add(time.perf_counter() - began, began - waited)
+                done.put((number, job, result, slot))
+
+        threads = [threading.Thread(target=produce, daemon=True)]
+        threads += [threading.Thread(target=network_worker, daemon=True) for _ in range(self.network_workers)]
+        for thread in threads:
+            thread.start()
+
+        pending = {}          # sequência -> (lote, resultado, vaga)
+        next_emit = 0
+        submitted_extra = 0
+        handled = 0
+        producer_done = False
+        try:
+            while True:
+                item = done.get()
+                if item is _PRODUCER_DONE:
+                    producer_done = True
+                    if failure:
+                        raise failure[0]
+                else:
+                    number, job, result, slot = item
+                    pending[number] = (job, result, slot)
+
+                # Trata em ordem o que já estiver contíguo
+                while next_emit in pending:
+                    job, result, slot = pending.pop(next_emit)
+                    began = time.perf_counter()
+                    extras = list(handle(job, result) or ())
+                    self.handling.add(time.perf_counter() - began)
+                    # As sobras herdam a vaga; ela volta quando a última for tratada
+                    slot.refs += len(extras) - 1
+                    if slot.refs == 0:
+                        slots.release()
+                    for extra in extras:
+                        ready.put((next_sequence(), extra, slot))
+                        submitted_extra += 1
+                        self.resubmitted += 1
+                    next_emit += 1
+                    handled += 1
+                if item is not _PRODUCER_DONE:
+                    self.done_depth.sample(len(pending))  # prontas, esperando um lote anterior
+
+                # encoded é final depois de _PRODUCER_DONE (a fila ordena as escritas)
+                if producer_done and handled == encoded + submitted_extra:
+                    break
+        finally:
+            for _ in range(self.network_workers):
+                ready.put(_STOP)
+            self.seconds += time.perf_counter() - start
+
+    def bottleneck(self):
+        """Estágio mais ocupado (o que limita a vazão)"""
+        stages = (self.encode, self.network, self.handling)
+        return max(stages, key=lambda stage: stage.utilisation(self.seconds))
+
+    def report(self):
+        if not self.seconds:
+            return "Pipeline: nenhum lote"
+        seconds = self.seconds
+        encode_idle = self.encode.waiting / seconds
+        network_idle = self.network.waiting / (seconds * self.network_workers)
+        return (f"Pipeline: {self.encode.items} lotes (+{self.resubmitted} reenviados) em {seconds:.1f}s; "
+                f"codificação {self.encode.utilisation(seconds):.0%} ocupada "
+                f"({encode_idle:.0%} bloqueada pela fila cheia), "
+                f"rede {self.network.utilisation(seconds):.0%} ocupada em {self.network_workers} workers "
+                f"({network_idle:.0%} sem lote pronto), "
+                f"tratamento {self.handling.utilisation(seconds):.0%}, "
+                f"{self.limiter.waited:.1f}s aguardando limites da conta; "
+                f"{self.ready_depth.describe()}, {self.done_depth.describe()}; "
+                f"gargalo: {self.bottleneck().name}")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - LOTES INCREMENTAIS vs RECODIFICAÇÃO A CADA LOTE
+Compara o método antigo (collect_and_process_images com limit crescente)
+com iter_image_batches em catálogos sintéticos de tamanhos diferentes
+"""
+
+import io
+import sys
+import time
+import tempfile
+import contextlib
+from pathlib import Path
+from PIL import Image
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+import analyze_products_complete as apc
+
+SIZES = [20, 40, 80]
+BATCH_SIZE = 10
+IMAGE_SIZE = (2400, 1600)
+
+
+def create_catalog(folder, count):
+    """Gera imagens JPEG sintéticas maiores que MAX_DIMENSION"""
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        img = Image.new('RGB', IMAGE_SIZE, ((i * 37) % 256, (i * 91) % 256, (i * 53) % 256))
+        img.save(folder / f"img_{i:05d}.jpg", quality=90)
+
+
+def run_quadratic(folders, total):
+    """Reproduz o laço antigo do main: recodifica todos os lotes anteriores"""
+    processed = 0
+    while processed < total:
+        batch_size = min(BATCH_SIZE, total - processed)
+        images, _ = apc.collect_and_process_images(folders, limit=processed + batch_size)
+        images = images[processed:]
+        if not images:
+            break
+        processed += len(images)
+    return processed
+
+
+def run_incremental(folders, total):
+    processed = 0
+    for images, _, _ in apc.iter_image_batches(folders, BATCH_SIZE, limit=total):
+        processed += len(images)
+    return processed
+
+
+def timed(func, *args):
+    # Silencia o log dos scripts durante a medição
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+
+
+def main():
+    print("=" * 70)
+    print("BENCHMARK DE LOTES".center(70))
+    print("=" * 70)
+
+    # Mede decodificação real, sem o cache em disco
+    apc.IMAGE_CACHE.enabled = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "catalogo"
+        create_catalog(folder, max(SIZES))
+        folders = [str(folder)]
+
+        print(f"\n{'Imagens':>8} {'Antigo (s)':>12} {'Incremental (s)':>16} {'s/imagem':>10}")
+        print("-" * 70)
+
+        for total in SIZES:
+            old = timed(run_quadratic, folders, total)
+            new = timed(run_incremental, folders, total)
+            print(f"{total:>8} {old:>12.2f} {new:>16.2f} {new / total:>10.3f}")
+
+    print("\nO tempo por imagem do modo incremental deve ficar constante (linear),")
+    print("enquanto o antigo cresce com o número de lotes (quadrático).")
+
+
+if __name__ == "__main__":
+    main()
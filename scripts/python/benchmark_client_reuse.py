@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - CLIENTE NOVO POR LOTE vs CLIENTE COMPARTILHADO
+Faz N requisições em sequência (como os lotes dos scripts de análise):
+- novo: anthropic.Anthropic(...) a cada lote (comportamento antigo)
+- compartilhado: get_client(), reaproveitando as conexões keep-alive
+
+Por padrão usa a API simulada local (só TCP, sem TLS: a diferença é
+pequena). Com --api usa a API real com requisições mínimas (max_tokens=1),
+onde entra o custo do handshake TLS.
+
+Uso: python benchmark_client_reuse.py [requisicoes] [--api]
+"""
+
+import os
+import sys
+import time
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+import anthropic
+from dotenv import load_dotenv
+from claude_client import API_STATS, RequestStats, get_client
+from mock_anthropic_server import MockAnthropicServer
+
+load_dotenv()
+
+DEFAULT_REQUESTS = 10
+MODEL = "claude-3-haiku-20240307"
+MOCK_LATENCY = 0.05
+
+
+def send(client):
+    client.messages.create(model=MODEL, max_tokens=1, messages=[{"role": "user", "content": "Oi"}])
+
+
+def run_fresh(count, stats, **client_args):
+    start = time.perf_counter()
+    for _ in range(count):
+        http_client = anthropic.DefaultHttpxClient(
+            event_hooks={"request": [stats.on_request], "response": [stats.on_response]})
+        with anthropic.Anthropic(http_client=http_client, **client_args) as client:
+            send(client)
+    return time.perf_counter() - start
+
+
+def run_shared(count):
+    client = get_client()
+    start = time.perf_counter()
+    for _ in range(count):
+        send(client)
+    return time.perf_counter() - start
+
+
+def print_row(name, seconds, stats, count):
+    setup = sum(setup for _, setup in stats.requests) * 1000
+    print(f"{name:>14} {seconds:>10.2f} {seconds / count * 1000:>13.0f} {setup:>13.1f}")
+
+
+def main():
+    use_api = "--api" in sys.argv
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    count = int(args[0]) if args else DEFAULT_REQUESTS
+
+    print("=" * 70)
+    print(" BENCHMARK DO CLIENTE HTTP COMPARTILHADO ".center(70))
+    print("=" * 70)
+
+    server = None
+    if use_api:
+        if not os.environ.get("ANTHROPIC_API_KEY"):
+            print("ANTHROPIC_API_KEY não encontrada")
+            return
+        client_args = {}
+        print(f"API real, {count} requisições em sequência\n")
+    else:
+        server = MockAnthropicServer(latency=MOCK_LATENCY).start()
+        os.environ["ANTHROPIC_BASE_URL"] = server.url
+        os.environ.setdefault("ANTHROPIC_API_KEY", "mock")
+        client_args = {"base_url": server.url}
+        print(f"API simulada em {server.url} (latência {MOCK_LATENCY}s), {count} requisições\n")
+
+    print(f"{'Cliente':>14} {'Total (s)':>10} {'ms/requisição':>13} {'Setup (ms)':>13}")
+    print("-" * 70)
+
+    fresh_stats = RequestStats()
+    fresh_seconds = run_fresh(count, fresh_stats, **client_args)
+    print_row("novo por lote", fresh_seconds, fresh_stats, count)
+
+    shared_seconds = run_shared(count)
+    print_row("compartilhado", shared_seconds, API_STATS, count)
+
+    print()
+    print(f"Novo por lote: {fresh_stats.report()}")
+    print(f"Compartilhado: {API_STATS.report()}")
+
+    if server:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - DESPACHO SERIAL vs CONCORRENTE (API simulada local)
+Mede o tempo total para 50/500/5000 imagens em lotes de 10:
+- serial: um lote por vez + pausa de 2s (run_complete_analysis antigo)
+- concorrente: BatchDispatcher com AsyncAnthropic
+
+O serial é medido de verdade só para 50 imagens; para os tamanhos maiores
+é extrapolado pela média por lote (seriam dezenas de minutos).
+
+Uso: python benchmark_dispatcher.py [latencia_s] [concorrencia]
+"""
+
+import io
+import sys
+import time
+import base64
+import asyncio
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+import anthropic
+from PIL import Image
+from foltz_imaging import image_block
+from claude_dispatcher import BatchDispatcher, RateLimiter, estimate_request_tokens
+from mock_anthropic_server import MockAnthropicServer
+
+IMAGE_COUNTS = [50, 500, 5000]
+IMAGES_PER_BATCH = 10
+SERIAL_PAUSE = 2.0
+SERIAL_MEASURED_UP_TO = 50
+DEFAULT_LATENCY = 0.5
+DEFAULT_CONCURRENCY = 16
+MODEL = "claude-3-haiku-20240307"
+# A API simulada não tem limites; valores altos para medir só a concorrência
+BENCH_RPM = 100_000
+BENCH_ITPM = 100_000_000
+
+
+def sample_block():
+    """Imagem pequena (800x800): o benchmark mede o despacho, não a codificação"""
+    buffer = io.BytesIO()
+    Image.effect_noise((800, 800), 30).convert('RGB').save(buffer, format='JPEG', quality=80)
+    return image_block('image/jpeg', base64.b64encode(buffer.getvalue()).decode('ascii'))
+
+
+def iter_jobs(num_images, block):
+    for batch_num, start in enumerate(range(0, num_images, IMAGES_PER_BATCH), 1):
+        count = min(IMAGES_PER_BATCH, num_images - start)
+        yield batch_num, [{"type": "text", "text": "Analise estas imagens."}] + [block] * count
+
+
+def run_serial(base_url, num_images, block):
+    client = anthropic.Anthropic(api_key="mock", base_url=base_url)
+    start = time.perf_counter()
+    jobs = list(iter_jobs(num_images, block))
+    for i, (_, content) in enumerate(jobs):
+        client.messages.create(model=MODEL, max_tokens=100, messages=[{"role": "user", "content": content}])
+        if i < len(jobs) - 1:
+            time.sleep(SERIAL_PAUSE)
+    client.close()
+    return time.perf_counter() - start, len(jobs)
+
+
+async def run_concurrent(base_url, num_images, block, concurrency):
+    dispatcher = BatchDispatcher(concurrency, RateLimiter(BENCH_RPM, BENCH_ITPM), estimate_request_tokens)
+    order = []
+    async with anthropic.AsyncAnthropic(api_key="mock", base_url=base_url) as client:
+        async def send(content):
+            message = await client.messages.create(model=MODEL, max_tokens=100,
+                                                   messages=[{"role": "user", "content": content}])
+            return message.content[0].text
+
+        await dispatcher.run(send, iter_jobs(num_images, block), lambda key, _: order.append(key))
+    in_order = order == sorted(order)
+    return dispatcher.seconds, dispatcher.requests, len(dispatcher.errors), in_order
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LATENCY
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CONCURRENCY
+
+    print("=" * 70)
+    print("BENCHMARK DO DESPACHO DE LOTES".center(70))
+    print("=" * 70)
+
+    server = MockAnthropicServer(latency=latency).start()
+    block = sample_block()
+    print(f"API simulada em {server.url}, latência {latency}s, lotes de {IMAGES_PER_BATCH}\n")
+
+    serial_time, serial_batches = run_serial(server.url, SERIAL_MEASURED_UP_TO, block)
+    per_batch = serial_time / serial_batches
+
+    print(f"{'Imagens':>8} {'Lotes':>6} {'Serial (s)':>14} {f'Concorrente x{concurrency} (s)':>22} "
+          f"{'Ganho':>7} {'Ordem':>6}")
+    print("-" * 70)
+    for num_images in IMAGE_COUNTS:
+        batches = -(-num_images // IMAGES_PER_BATCH)
+        if num_images <= SERIAL_MEASURED_UP_TO:
+            serial = f"{serial_time:.1f}"
+            serial_value = serial_time
+        else:
+            serial_value = per_batch * batches
+            serial = f"~{serial_value:.0f} (est.)"
+
+        seconds, requests, errors, in_order = asyncio.run(
+            run_concurrent(server.url, num_images, block, concurrency))
+        print(f"{num_images:>8} {batches:>6} {serial:>14} {seconds:>22.1f} "
+              f"{serial_value / seconds:>6.0f}x {'ok' if in_order else 'ERRO':>6}")
+        if errors:
+            print(f"  ⚠️  {errors} requisições com erro")
+
+    server.stop()
+    print(f"\nRequisições atendidas pela API simulada: {server.requests}")
+
+
+if __name__ == "__main__":
+    main()
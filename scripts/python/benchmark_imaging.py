@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MICRO-BENCHMARKS DO foltz_imaging
+Tempo por chamada das funções compartilhadas de imagem
+
+Uso: python benchmark_imaging.py [repetições]
+"""
+
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from PIL import Image
+import foltz_imaging as fi
+from image_cache import ImageCache
+
+DEFAULT_REPEAT = 5
+
+
+def create_samples(folder):
+    """Uma imagem de cada caso: grande (redimensiona), pequena (passa direto), PNG grande"""
+    folder.mkdir(parents=True, exist_ok=True)
+    samples = {
+        'jpeg_grande': folder / "grande.jpg",
+        'jpeg_pequena': folder / "pequena.jpg",
+        'png_grande': folder / "grande.png",
+        'png_alpha': folder / "alpha.png",
+    }
+    Image.effect_noise((4000, 3000), 30).convert('RGB').save(samples['jpeg_grande'], quality=90)
+    Image.effect_noise((1200, 1200), 30).convert('RGB').save(samples['jpeg_pequena'], quality=90)
+    Image.linear_gradient('L').resize((2500, 2500)).convert('RGB').save(samples['png_grande'])
+    Image.linear_gradient('L').resize((1500, 1500)).convert('RGBA').save(samples['png_alpha'])
+    return samples
+
+
+def bench(name, func, repeat):
+    func()  # aquecimento
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    per_call = (time.perf_counter() - start) / repeat
+    unit, value = ("ms", per_call * 1000) if per_call >= 0.001 else ("µs", per_call * 1e6)
+    print(f"  {name:<44} {value:>10.2f} {unit}")
+
+
+def main():
+    print("=" * 70)
+    print("MICRO-BENCHMARKS - foltz_imaging".center(70))
+    print("=" * 70)
+
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REPEAT
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        samples = create_samples(tmp / "amostras")
+        header = samples['jpeg_grande'].read_bytes()[:16]
+
+        print("\nFunções puras")
+        bench("get_media_type", lambda: fi.get_media_type(samples['jpeg_grande']), repeat * 1000)
+        bench("sniff_media_type", lambda: fi.sniff_media_type(header), repeat * 1000)
+        bench("fit_within", lambda: fi.fit_within(4000, 3000, fi.MAX_DIMENSION), repeat * 1000)
+        bench("list_images (4 arquivos)", lambda: fi.list_images([tmp / "amostras"]), repeat * 100)
+
+        # Sem cache: mede o trabalho real de cada caminho
+        fi.IMAGE_CACHE.enabled = False
+        print("\nCodificação sem cache")
+        for label, path in samples.items():
+            for mode in fi.RESIZE_MODES:
+                bench(f"encode_image_bytes {label} [{mode}]",
+                      lambda p=path, m=mode: fi._encode_image_bytes(p, fi.MAX_DIMENSION, fi.JPEG_QUALITY,
+                                                                   m, fi.MAX_IMAGE_BASE64_BYTES),
+                      repeat)
+
+        # Com cache quente: só hash + leitura
+        cache = ImageCache(cache_dir=tmp / "cache")
+        fi.IMAGE_CACHE = cache
+        print("\nCodificação com cache quente")
+        for label, path in samples.items():
+            fi.encode_image_bytes(path)
+            bench(f"encode_image_bytes {label} [cache]", lambda p=path: fi.encode_image_bytes(p), repeat)
+        bench("encode_image_block jpeg_grande [cache]",
+              lambda: fi.encode_image_block(samples['jpeg_grande']), repeat)
+
+        print(f"\n  {cache.report()}")
+        print(f"\nTamanhos de saída (base64, limite {fi.MAX_IMAGE_BASE64_BYTES / 1024 / 1024:.0f} MB):")
+        for label, path in samples.items():
+            data = fi.encode_image_bytes(path)
+            print(f"  {label:<14} {os.path.getsize(path) / 1024:>8.0f} KB -> "
+                  f"{fi.base64_size(len(data)) / 1024:>8.0f} KB ({fi.sniff_media_type(data)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - LEITURA DE DIMENSÕES
+Compara, sobre a mesma árvore de imagens:
+- Image.open + img.size uma a uma (método antigo)
+- manifesto frio: só cabeçalho, em paralelo
+- manifesto quente: só stat, nada é relido
+
+Sem a pasta informada (padrão Leagues/), gera um catálogo sintético com
+JPEG (EXIF, progressivo), PNG, GIF e WebP e confere as dimensões com o Pillow.
+
+Uso: python benchmark_manifest.py [pasta] [quantidade_sintética]
+"""
+
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from PIL import Image
+from image_manifest import ImageManifest, find_images
+
+DEFAULT_FOLDER = "Leagues"
+DEFAULT_SYNTHETIC = 400
+
+
+def create_catalog(folder, count):
+    """Catálogo sintético em subpastas, com todos os formatos aceitos"""
+    exif = Image.Exif()
+    exif[0x010F] = "Foltz" * 2000  # EXIF grande antes do SOF
+    for i in range(count):
+        team = folder / f"liga_{i % 4}" / f"time_{i % 20}"
+        team.mkdir(parents=True, exist_ok=True)
+        size = (800 + i % 7 * 211, 600 + i % 5 * 173)
+        img = Image.effect_noise(size, 30).convert('RGB')
+        kind = i % 6
+        if kind == 0:
+            img.save(team / f"{i:05d}.jpg", quality=85, exif=exif)
+        elif kind == 1:
+            img.save(team / f"{i:05d}.jpg", quality=85, progressive=True)
+        elif kind == 2:
+            img.reduce(4).save(team / f"{i:05d}.png", compress_level=1)
+        elif kind == 3:
+            img.convert('P').save(team / f"{i:05d}.gif")
+        elif kind == 4:
+            img.save(team / f"{i:05d}.webp", quality=80, method=0)
+        else:
+            # Lossless é lento de gerar; a imagem menor basta para testar o cabeçalho
+            img.reduce(4).convert('RGBA').save(team / f"{i:05d}.webp", lossless=True, method=0)
+
+
+def pil_sizes(paths):
+    sizes = {}
+    for path in paths:
+        with Image.open(path) as img:
+            sizes[str(path)] = (img.width, img.height, img.format)
+    return sizes
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(folder, tmp):
+    paths = find_images([folder])
+    print(f"{len(paths)} imagens em {folder}\n")
+
+    expected, t_pil = timed(pil_sizes, paths)
+
+    manifest_path = Path(tmp) / "manifesto.json"
+    cold = ImageManifest(manifest_path)
+    entries, t_cold = timed(cold.scan, paths)
+    cold.save()
+
+    warm = ImageManifest(manifest_path)
+    _, t_warm = timed(warm.scan, paths)
+
+    mismatches = [str(p) for p, e in entries
+                  if (e["width"], e["height"], e["format"]) != expected[str(p)]]
+
+    print(f"{'Método':>28} {'Tempo (s)':>10} {'Imagens/s':>12}")
+    print("-" * 70)
+    for name, seconds in [("Image.open sequencial", t_pil),
+                          (f"manifesto frio ({cold.workers} threads)", t_cold),
+                          ("manifesto quente", t_warm)]:
+        print(f"{name:>28} {seconds:>10.3f} {len(paths) / seconds:>12.0f}")
+
+    print(f"\n{cold.report()}")
+    print(warm.report())
+    if mismatches:
+        print(f"\n⚠️  {len(mismatches)} dimensões diferentes do Pillow, ex.: {mismatches[:3]}")
+    else:
+        print("\n✓ Dimensões e formatos iguais aos do Pillow em todas as imagens")
+
+
+def main():
+    print("=" * 70)
+    print("BENCHMARK DO MANIFESTO DE DIMENSÕES".center(70))
+    print("=" * 70)
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FOLDER
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SYNTHETIC
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not Path(folder).exists():
+            print(f"Pasta {folder} não encontrada; gerando {count} imagens sintéticas...")
+            folder = Path(tmp) / "catalogo"
+            create_catalog(folder, count)
+        run(folder, tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - MEMÓRIA DOS PAYLOADS (tracemalloc)
+Compara o pico de memória Python de:
+- acumular todas as imagens em base64 antes de enviar (método antigo)
+- montar os lotes sob demanda com orçamento de bytes (iter_image_batches),
+  um lote por vez
+- o caminho real do analyze_products_complete: batch_pipeline com vários
+  lotes vivos (fila + em voo), com o orçamento inteiro em cada lote (como
+  era) e dividido entre as vagas (batch_byte_budget)
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import contextlib
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Tudo no processo principal e sem cache, para o tracemalloc ver cada string
+os.environ["FOLTZ_IMAGE_CACHE"] = "0"
+os.environ["FOLTZ_IMAGE_WORKERS"] = "1"
+
+from PIL import Image
+import analyze_products_complete as apc
+from batch_pipeline import BatchPipeline
+from claude_dispatcher import RateLimiter
+
+TOTAL_IMAGES = 40
+BATCH_SIZE = 10
+BYTE_BUDGETS = [4 * 1024 * 1024, 8 * 1024 * 1024, 16 * 1024 * 1024]
+IMAGE_SIZE = (1600, 1600)
+NETWORK_WORKERS = 4
+QUEUE_SIZE = 2
+NETWORK_DELAY = 0.5  # segundos por requisição simulada: a fila enche enquanto a rede trabalha
+
+
+def create_catalog(folder, count):
+    """Imagens com ruído, para o JPEG não ficar artificialmente pequeno"""
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        noise = Image.effect_noise(IMAGE_SIZE, 40 + i % 20).convert('RGB')
+        noise.save(folder / f"img_{i:05d}.jpg", quality=90)
+
+
+def fake_send(images):
+    """Simula o envio: monta o content como analyze_with_claude e mede o tamanho"""
+    content = [{"type": "text", "text": "prompt"}] + images
+    return sum(len(block["source"]["data"]) for block in content[1:])
+
+
+def run_accumulate(folders):
+    images, _ = apc.collect_and_process_images(folders)
+    sent = 0
+    for start in range(0, len(images), BATCH_SIZE):
+        sent += fake_send(images[start:start + BATCH_SIZE])
+    return sent
+
+
+def run_streaming(folders, byte_budget):
+    sent = 0
+    for images, _, _ in apc.iter_image_batches(folders, BATCH_SIZE, byte_budget=byte_budget):
+        sent += fake_send(images)
+        del images
+    return sent
+
+
+def run_pipeline(folders, memory_budget, split):
+    """Pipeline com rede simulada; split=False dá o orçamento inteiro a cada lote"""
+    slots = QUEUE_SIZE + NETWORK_WORKERS
+    pipeline = BatchPipeline(NETWORK_WORKERS, QUEUE_SIZE, limiter=RateLimiter(10 ** 6, 10 ** 12),
+                             memory_budget=memory_budget if split else memory_budget * slots)
+    sent = 0
+
+    def send(job):
+        time.sleep(NETWORK_DELAY)
+        return fake_send(job[0])
+
+    def handle(job, result):
+        nonlocal sent
+        sent += result or 0
+
+    batches = apc.iter_image_batches(folders, BATCH_SIZE, byte_budget=pipeline.batch_byte_budget)
+    pipeline.run(batches, send, handle)
+    return sent
+
+
+def measure(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        sent = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return sent, peak
+
+
+def main():
+    print("=" * 70)
+    print("BENCHMARK DE MEMÓRIA DOS PAYLOADS".center(70))
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "catalogo"
+        create_catalog(folder, TOTAL_IMAGES)
+        folders = [str(folder)]
+
+        sent_old, peak_old = measure(run_accumulate, folders)
+        streaming = [(budget, *measure(run_streaming, folders, budget)) for budget in BYTE_BUDGETS]
+        pipelined = [(budget, split, *measure(run_pipeline, folders, budget, split))
+                     for budget in BYTE_BUDGETS for split in (False, True)]
+
+    mb = 1024 * 1024
+    print(f"\n{TOTAL_IMAGES} imagens, lotes de até {BATCH_SIZE}")
+    print(f"Base64 total enviado: {sent_old / mb:.1f} MB\n")
+    print(f"{'Modo':>22} {'Orçamento (MB)':>15} {'Pico Python (MB)':>18}")
+    print("-" * 70)
+    print(f"{'acumulado':>22} {'-':>15} {peak_old / mb:>18.1f}")
+    for budget, sent, peak in streaming:
+        print(f"{'streaming':>22} {budget / mb:>15.0f} {peak / mb:>18.1f}")
+        if sent != sent_old:
+            print("  ⚠️  Enviou uma quantidade diferente de dados!")
+    for budget, split, sent, peak in pipelined:
+        mode = "pipeline dividido" if split else "pipeline por lote"
+        print(f"{mode:>22} {budget / mb:>15.0f} {peak / mb:>18.1f}")
+        if sent != sent_old:
+            print("  ⚠️  Enviou uma quantidade diferente de dados!")
+
+    print("\nNo streaming o pico acompanha o orçamento: lote atual + cópias")
+    print("transitórias da imagem sendo codificada (bytes, base64, str).")
+    print(f"No pipeline ficam até {QUEUE_SIZE + NETWORK_WORKERS} lotes vivos: com o orçamento inteiro por lote")
+    print("o pico passa dele; dividido entre as vagas, volta a acompanhá-lo (uma")
+    print("imagem maior que a fatia ainda vai sozinha no lote).")
+
+
+if __name__ == "__main__":
+    main()
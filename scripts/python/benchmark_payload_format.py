@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - FORMATO DO PAYLOAD ("source" vs "auto")
+Compara, para as mesmas imagens, o formato de origem com o otimizador
+(menor entre JPEG/WebP, WebP se houver transparência):
+- bytes de base64 por imagem e no total
+- tempo de codificação (sem cache)
+- com --api: latência de uma requisição por imagem (max_tokens=1)
+
+Uso: python benchmark_payload_format.py [limite] [--api]
+"""
+
+import os
+import sys
+import time
+import statistics
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Sem cache, para medir a codificação de verdade
+os.environ["FOLTZ_IMAGE_CACHE"] = "0"
+
+import foltz_imaging as fi
+
+DEFAULT_LIMIT = 30
+FOLDERS = ["id_visual", "seedream"]
+MODEL = "claude-3-haiku-20240307"
+
+
+def encode_all(paths, output_format):
+    start = time.perf_counter()
+    blocks = [fi.encode_image_block(p, task=fi.TASK_ANALYSIS, output_format=output_format) for p in paths]
+    return blocks, time.perf_counter() - start
+
+
+def api_latencies(client, blocks):
+    latencies = []
+    for block in blocks:
+        start = time.perf_counter()
+        client.messages.create(
+            model=MODEL,
+            max_tokens=1,
+            messages=[{"role": "user", "content": [{"type": "text", "text": "ok"}, block]}]
+        )
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    limit = int(args[0]) if args else DEFAULT_LIMIT
+    use_api = "--api" in sys.argv
+
+    print("=" * 70)
+    print("BENCHMARK DO FORMATO DO PAYLOAD".center(70))
+    print("=" * 70)
+
+    # Metade de cada pasta: id_visual tem os PNGs, seedream os JPEGs
+    paths = []
+    for folder in FOLDERS:
+        paths.extend(fi.list_images([folder])[:limit // len(FOLDERS)])
+    if not paths:
+        print("Nenhuma imagem encontrada")
+        return
+
+    results = {}
+    for output_format in fi.OUTPUT_FORMATS:
+        results[output_format] = encode_all(paths, output_format)
+
+    (source_blocks, t_source), (auto_blocks, t_auto) = results[fi.FORMAT_SOURCE], results[fi.FORMAT_AUTO]
+
+    print(f"\n{'Imagem':<40} {'source (KB)':>12} {'auto (KB)':>10} {'formato':>8}")
+    print("-" * 70)
+    for path, src, auto in zip(paths, source_blocks, auto_blocks):
+        print(f"{path.name[:40]:<40} {fi.block_size(src) / 1024:>12.0f} {fi.block_size(auto) / 1024:>10.0f} "
+              f"{auto['source']['media_type'].split('/')[1]:>8}")
+
+    mb = 1024 * 1024
+    total_source = sum(fi.block_size(b) for b in source_blocks)
+    total_auto = sum(fi.block_size(b) for b in auto_blocks)
+    print("-" * 70)
+    print(f"{'Total':<40} {total_source / mb:>9.1f} MB {total_auto / mb:>7.1f} MB "
+          f"({(1 - total_auto / total_source) * 100:.0f}% menor)")
+    print(f"Codificação: source {t_source:.1f}s, auto {t_auto:.1f}s ({len(paths)} imagens)")
+
+    if use_api:
+        import anthropic
+        client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+        print("\nLatência da API (mediana por imagem):")
+        for name, blocks in [("source", source_blocks), ("auto", auto_blocks)]:
+            latencies = api_latencies(client, blocks)
+            print(f"  {name:>8}: {statistics.median(latencies) * 1000:.0f} ms")
+    else:
+        print("\nUse --api para medir a latência real das requisições (gasta tokens).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - VAZÃO DE PONTA A PONTA (API simulada local)
+Roda os scripts de verdade (subprocessos) contra mock_anthropic_server num
+catálogo sintético, sem gastar com a API:
+- analyze_products_complete (texto, com um lote em voo só, --stream,
+  --seo e com o cache de respostas já quente)
+- run_complete_analysis (despacho concorrente)
+- generate_seo_content
+
+Por cenário: imagens/s (imagens enviadas à API / tempo total do script),
+latência p50/p95 das chamadas (do registro de uso, usage_ledger), erros
+429/529 sorteados pela API simulada e pico de memória (RSS máximo do
+subprocesso; indisponível no Windows).
+
+Cada cenário tem os próprios caches e manifestos; só o "cache quente"
+reaproveita os do cenário anterior.
+
+Uso: python benchmark_pipeline.py [imagens] [latencia_s] [distribuicao] [taxa_falhas]
+  distribuicao: fixed, uniform, exponential ou lognormal (padrão)
+  taxa_falhas:  fração das requisições respondidas com 429/529 (metade cada)
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from PIL import Image
+from mock_anthropic_server import MockAnthropicServer
+
+DEFAULT_IMAGES = 50
+DEFAULT_LATENCY = 0.5
+DEFAULT_DISTRIBUTION = "lognormal"
+DEFAULT_FAULT_RATE = 0.0
+SEED = 42
+
+# (nome, script, argumentos, variáveis de ambiente, reaproveita os caches do cenário anterior)
+SCENARIOS = [
+    ("analyze_products_complete", "analyze_products_complete.py", [], {}, False),
+    ("  └─ cache quente", "analyze_products_complete.py", [], {}, True),
+    ("  └─ 1 lote em voo", "analyze_products_complete.py", [], {"FOLTZ_API_CONCURRENCY": "1"}, False),
+    ("analyze_products_complete --stream", "analyze_products_complete.py", ["--stream"], {}, False),
+    ("analyze_products_complete --seo", "analyze_products_complete.py", ["--seo"], {}, False),
+    ("run_complete_analysis", "run_complete_analysis.py", [], {}, False),
+    ("generate_seo_content", "generate_seo_content.py", [], {}, False),
+]
+
+
+def create_catalog(folder, count):
+    """Fotos sintéticas de tamanho realista (ruído não comprime nem deduplica)"""
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        Image.effect_noise((1200, 1200), 20 + i % 50).convert('RGB').rotate(i).save(
+            folder / f"jersey_{i:04d}.jpg", quality=85)
+
+
+def percentile(values, fraction):
+    """Percentil pelo posto mais próximo (None sem valores)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def run_script(script, args, env, cwd):
+    """(segundos, código de saída, pico de RSS em MB ou None, stdout+stderr)"""
+    log_path = cwd / "saida.log"
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log_file:
+        process = subprocess.Popen([sys.executable, str(Path(__file__).resolve().parent / script), *args],
+                                   env=env, cwd=cwd, stdout=log_file, stderr=subprocess.STDOUT)
+        if resource is not None and hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss: KB no Linux, bytes no macOS
+            peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        else:
+            process.wait()
+            peak = None
+    seconds = time.perf_counter() - start
+    return seconds, process.returncode, peak, log_path.read_text(encoding="utf-8", errors="replace")
+
+
+def ledger_calls(path):
+    calls = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                calls.append(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return calls
+
+
+def main():
+    images = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_IMAGES
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LATENCY
+    distribution = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DISTRIBUTION
+    fault_rate = float(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_FAULT_RATE
+
+    print("=" * 100)
+    print("BENCHMARK DE VAZÃO DE PONTA A PONTA".center(100))
+    print("=" * 100)
+
+    server = MockAnthropicServer(latency=latency, latency_distribution=distribution, seed=SEED).start()
+    server.fault_rates = {429: fault_rate / 2, 529: fault_rate / 2} if fault_rate else {}
+    print(f"API simulada em {server.url}: latência média {latency}s ({distribution}), "
+          f"{fault_rate:.0%} de 429/529; catálogo de {images} imagens\n")
+
+    print(f"{'Cenário':<38} {'Imagens':>8} {'Tempo (s)':>10} {'Img/s':>7} {'p50 (s)':>8} {'p95 (s)':>8} "
+          f"{'429/529':>8} {'Pico MB':>8}")
+    print("-" * 100)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        create_catalog(tmp / "catalogo" / "seedream", images)
+        workdir = None
+        handled = 0
+        failures = 0
+        for number, (name, script, args, overrides, warm) in enumerate(SCENARIOS, 1):
+            if not warm:
+                workdir = tmp / f"cenario_{number}"
+                shutil.copytree(tmp / "catalogo", workdir)
+            ledger = workdir / f"uso_{number}.jsonl"
+            env = dict(os.environ,
+                       ANTHROPIC_API_KEY="mock", ANTHROPIC_BASE_URL=server.url,
+                       FOLTZ_RUN_MANIFEST_DIR=str(workdir / "execucoes"),
+                       FOLTZ_IMAGE_CACHE_DIR=str(workdir / "cache_imagens"),
+                       FOLTZ_RESPONSE_CACHE_DIR=str(workdir / "cache_respostas"),
+                       FOLTZ_HASH_CACHE=str(workdir / "hashes.json"),
+                       FOLTZ_PRODUCT_STORE=str(workdir / "produtos" / "analises.jsonl"),
+                       FOLTZ_USAGE_LEDGER=str(ledger), **overrides)
+
+            faults_before = sum(server.faults_injected.values())
+            seconds, code, peak, output = run_script(script, args, env, workdir)
+            calls = ledger_calls(ledger)
+            # Cache quente: nada vai para a API; vale o mesmo trabalho do cenário anterior
+            sent = sum(call.get("images") or 0 for call in calls) or (handled if warm else 0)
+            handled = sent
+            latencies = [call["latency_s"] for call in calls if call.get("latency_s") is not None]
+            p50, p95 = percentile(latencies, 0.50), percentile(latencies, 0.95)
+            faults = sum(server.faults_injected.values()) - faults_before
+            print(f"{name:<38} {sent:>8} {seconds:>10.1f} {sent / seconds:>7.2f} "
+                  f"{f'{p50:.2f}' if p50 is not None else '-':>8} {f'{p95:.2f}' if p95 is not None else '-':>8} "
+                  f"{faults:>8} {f'{peak:.0f}' if peak is not None else 'n/d':>8}")
+            if code != 0:
+                failures += 1
+                print(f"  ⚠️  saiu com código {code}:\n" + "\n".join(output.splitlines()[-10:]))
+
+    server.stop()
+    print(f"\nRequisições atendidas pela API simulada: {server.requests}")
+    print("Imagens = imagens enviadas à API (no cache quente, as do cenário anterior, respondidas pelo cache)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - ESCALABILIDADE DO PRÉ-PROCESSAMENTO PARALELO
+Mede imagens/s com 1..N workers sobre a árvore Leagues/ (~2000 imagens)
+
+Uso: python benchmark_pool.py [pasta] [limite]
+Sem a pasta, gera um catálogo sintético temporário.
+"""
+
+import os
+import sys
+import time
+import contextlib
+import tempfile
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Mede decodificação real: o cache precisa estar desligado também nos workers
+os.environ["FOLTZ_IMAGE_CACHE"] = "0"
+
+from PIL import Image
+from image_pool import ImagePreprocessor
+from foltz_imaging import resize_and_encode_image
+
+DEFAULT_FOLDER = "Leagues"
+SYNTHETIC_COUNT = 64
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+
+def find_images(folder, limit=None):
+    paths = sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+    return paths[:limit] if limit else paths
+
+
+def create_catalog(folder, count):
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        img = Image.new('RGB', (2400, 1600), ((i * 37) % 256, (i * 91) % 256, (i * 53) % 256))
+        img.save(folder / f"img_{i:05d}.jpg", quality=90)
+
+
+def worker_counts():
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silencia o log dos scripts, inclusive nos processos filhos"""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+
+
+def run(paths):
+    print(f"{len(paths)} imagens\n")
+    print(f"{'Workers':>8} {'Tempo (s)':>10} {'Imagens/s':>10} {'Speedup':>8}")
+    print("-" * 70)
+
+    baseline = None
+    for workers in worker_counts():
+        pool = ImagePreprocessor(workers=workers)
+        with quiet():
+            start = time.perf_counter()
+            results = pool.map(resize_and_encode_image, paths)
+            elapsed = time.perf_counter() - start
+            pool.close()
+
+        errors = sum(1 for _, _, error in results if error)
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>10.2f} {len(paths) / elapsed:>10.1f} {baseline / elapsed:>7.2f}x"
+              + (f"  ({errors} erros)" if errors else ""))
+
+
+def main():
+    print("=" * 70)
+    print("BENCHMARK DO POOL DE PRÉ-PROCESSAMENTO".center(70))
+    print("=" * 70)
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FOLDER
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    if Path(folder).exists():
+        print(f"Pasta: {folder}")
+        run(find_images(folder, limit))
+    else:
+        print(f"Pasta {folder} não encontrada, usando catálogo sintético")
+        with tempfile.TemporaryDirectory() as tmp:
+            create_catalog(Path(tmp), limit or SYNTHETIC_COUNT)
+            run(find_images(tmp))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - REDIMENSIONAMENTO "quality" vs "fast"
+Compara tempo, pico de memória (RSS) e SSIM da saída dos dois modos nos
+tamanhos que os scripts usam de verdade:
+- miniatura de 150px do extract_colors
+- orçamento de pixels de cada tarefa (TASK_PIXEL_BUDGETS) dentro de
+  MAX_DIMENSION
+
+O modo rápido só muda algo quando a imagem é reduzida 2x ou mais (escala
+do draft do JPEG e reducing_gap); a coluna "redução" mostra o fator médio
+de cada cenário.
+
+Uso: python benchmark_resize.py [pasta] [limite] [dimensao_maxima]
+(dimensao_maxima roda só esse cenário, sem orçamento de pixels)
+"""
+
+import sys
+import time
+import tempfile
+import multiprocessing
+from pathlib import Path
+from PIL import Image
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from foltz_imaging import (
+    MAX_DIMENSION, RESIZE_MODES, RESIZE_QUALITY, TASK_PIXEL_BUDGETS, fit_image, fit_within,
+)
+from extract_colors import THUMBNAIL_SIZE
+
+DEFAULT_FOLDER = "seedream"
+DEFAULT_LIMIT = 20
+SSIM_WINDOW = 8
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def scenarios(max_dimension=None):
+    """[(nome, dimensão máxima, orçamento de pixels ou None)]"""
+    if max_dimension is not None:
+        return [(f"{max_dimension}px", max_dimension, None)]
+    return ([(f"miniatura {max(THUMBNAIL_SIZE)}px", max(THUMBNAIL_SIZE), None)] +
+            [(f"tarefa {task}", MAX_DIMENSION, budget) for task, budget in TASK_PIXEL_BUDGETS.items()])
+
+
+def reduction_factor(path, max_dimension, max_pixels):
+    """Quantas vezes o lado maior encolhe (1.0 se a imagem já cabe); só lê o cabeçalho"""
+    with Image.open(path) as img:
+        width, height = img.size
+    new_size = fit_within(width, height, max_dimension, max_pixels)
+    return max(width, height) / max(new_size) if new_size else 1.0
+
+
+def resize_all(paths, mode, max_dimension, max_pixels, out_dir, queue):
+    """Executa num processo novo para que o pico de RSS seja só deste modo"""
+    start = time.perf_counter()
+    for i, path in enumerate(paths):
+        with Image.open(path) as img:
+            img, _, _ = fit_image(img, max_dimension, mode, max_pixels)
+            img.convert('L').save(Path(out_dir) / f"{i:05d}.png")
+    # O tempo inclui salvar o PNG de comparação, igual nos dois modos
+    queue.put((time.perf_counter() - start, peak_rss_mb()))
+
+
+def ssim(img_a, img_b):
+    """SSIM em tons de cinza, média sobre janelas 8x8 sem sobreposição"""
+    if img_a.size != img_b.size:
+        img_b = img_b.resize(img_a.size)
+
+    width, height = img_a.size
+    a = img_a.tobytes()
+    b = img_b.tobytes()
+    n = SSIM_WINDOW * SSIM_WINDOW
+    total = 0.0
+    windows = 0
+
+    for y0 in range(0, height - SSIM_WINDOW + 1, SSIM_WINDOW):
+        for x0 in range(0, width - SSIM_WINDOW + 1, SSIM_WINDOW):
+            sa = sb = saa = sbb = sab = 0
+            for y in range(y0, y0 + SSIM_WINDOW):
+                row = y * width
+                for pa, pb in zip(a[row + x0:row + x0 + SSIM_WINDOW], b[row + x0:row + x0 + SSIM_WINDOW]):
+                    sa += pa
+                    sb += pb
+                    saa += pa * pa
+                    sbb += pb * pb
+                    sab += pa * pb
+            mu_a, mu_b = sa / n, sb / n
+            var_a = saa / n - mu_a * mu_a
+            var_b = sbb / n - mu_b * mu_b
+            cov = sab / n - mu_a * mu_b
+            total += ((2 * mu_a * mu_b + SSIM_C1) * (2 * cov + SSIM_C2)) / \
+                     ((mu_a ** 2 + mu_b ** 2 + SSIM_C1) * (var_a + var_b + SSIM_C2))
+            windows += 1
+
+    return total / windows if windows else 1.0
+
+
+def run_scenario(paths, max_dimension, max_pixels, ctx):
+    """({modo: (tempo, pico RSS)}, [SSIM fast vs quality por imagem])"""
+    results = {}
+    scores = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in RESIZE_MODES:
+            out_dir = Path(tmp) / mode
+            out_dir.mkdir()
+            queue = ctx.Queue()
+            proc = ctx.Process(target=resize_all,
+                               args=(paths, mode, max_dimension, max_pixels, str(out_dir), queue))
+            proc.start()
+            results[mode] = queue.get()
+            proc.join()
+
+        for i in range(len(paths)):
+            with Image.open(Path(tmp) / RESIZE_QUALITY / f"{i:05d}.png") as ref:
+                for mode in RESIZE_MODES:
+                    if mode == RESIZE_QUALITY:
+                        continue
+                    with Image.open(Path(tmp) / mode / f"{i:05d}.png") as out:
+                        scores.append(ssim(ref, out))
+    return results, scores
+
+
+def main():
+    print("=" * 70)
+    print("BENCHMARK DE REDIMENSIONAMENTO".center(70))
+    print("=" * 70)
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FOLDER
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LIMIT
+    max_dimension = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    paths = sorted(p for p in Path(folder).glob("*") if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.webp'))[:limit]
+    if not paths:
+        print(f"Nenhuma imagem em {folder}")
+        return
+
+    print(f"{len(paths)} imagens de {folder}\n")
+
+    ctx = multiprocessing.get_context('spawn')
+
+    print(f"{'Cenário':<24} {'Redução':>8} {'Modo':>8} {'ms/imagem':>10} {'Pico RSS (MB)':>14} {'SSIM':>7}")
+    print("-" * 76)
+    for name, dimension, max_pixels in scenarios(max_dimension):
+        factors = [reduction_factor(path, dimension, max_pixels) for path in paths]
+        factor = sum(factors) / len(factors)
+        results, scores = run_scenario(paths, dimension, max_pixels, ctx)
+        for mode, (elapsed, rss) in results.items():
+            rss_text = f"{rss:.0f}" if rss is not None else "n/d"
+            ssim_text = f"{sum(scores) / len(scores):.4f}" if mode != RESIZE_QUALITY and scores else ""
+            label = name if mode == RESIZE_MODES[0] else ""
+            factor_text = f"{factor:.1f}x" if mode == RESIZE_MODES[0] else ""
+            print(f"{label:<24} {factor_text:>8} {mode:>8} {elapsed / len(paths) * 1000:>10.1f} "
+                  f"{rss_text:>14} {ssim_text:>7}")
+        if factor < 2:
+            print(f"{'':<24} (redução abaixo de 2x: o modo rápido não muda nada aqui)")
+
+
+if __name__ == "__main__":
+    main()
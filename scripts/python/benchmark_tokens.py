@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - TOKENS POR IMAGEM vs QUALIDADE DA RESPOSTA
+Compara as políticas de tamanho (TASK_PIXEL_BUDGETS) num conjunto fixo de
+imagens de referência
+
+Sem --api: só estima tokens e bytes de cada política (não gasta nada).
+Com --api: pede a identificação de cada imagem em cada política e mede a
+similaridade da resposta com a da política "original" (só MAX_DIMENSION).
+
+Uso: python benchmark_tokens.py [pasta] [limite] [--api]
+"""
+
+import os
+import sys
+import difflib
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import foltz_imaging as fi
+
+DEFAULT_FOLDER = "seedream"
+DEFAULT_LIMIT = 10
+MODEL = "claude-3-haiku-20240307"
+IDENTIFICATION_PROMPT = """Identifique este jersey de futebol. Responda em uma linha, no formato:
+Time | Tipo (Home/Away/Third/Especial) | Temporada | Patrocinador principal"""
+
+# None = comportamento antigo (só o limite de MAX_DIMENSION)
+POLICIES = [("original", None)] + [(task, task) for task in fi.TASK_PIXEL_BUDGETS]
+
+
+def identify(client, block):
+    message = client.messages.create(
+        model=MODEL,
+        max_tokens=100,
+        messages=[{"role": "user", "content": [{"type": "text", "text": IDENTIFICATION_PROMPT}, block]}]
+    )
+    return message.content[0].text.strip()
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    use_api = "--api" in sys.argv
+    folder = args[0] if args else DEFAULT_FOLDER
+    limit = int(args[1]) if len(args) > 1 else DEFAULT_LIMIT
+
+    print("=" * 70)
+    print("BENCHMARK DE TOKENS POR POLÍTICA DE TAMANHO".center(70))
+    print("=" * 70)
+
+    paths = fi.list_images([folder])[:limit]
+    if not paths:
+        print(f"Nenhuma imagem em {folder}")
+        return
+    print(f"{len(paths)} imagens de referência em {folder}\n")
+
+    client = None
+    if use_api:
+        import anthropic
+        client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+
+    answers = {}
+    print(f"{'Política':>16} {'Tokens':>8} {'Tokens/img':>11} {'KB base64':>10} {'Economia':>9} {'Similaridade':>13}")
+    print("-" * 70)
+
+    baseline_tokens = None
+    for name, task in POLICIES:
+        blocks = [fi.encode_image_block(path, task=task) for path in paths]
+        tokens = fi.estimate_batch_tokens(blocks)
+        size_kb = sum(fi.block_size(b) for b in blocks) / 1024
+        baseline_tokens = baseline_tokens or tokens
+
+        similarity = "-"
+        if client:
+            answers[name] = [identify(client, block) for block in blocks]
+            ratios = [difflib.SequenceMatcher(None, a.lower(), b.lower()).ratio()
+                      for a, b in zip(answers["original"], answers[name])]
+            similarity = f"{sum(ratios) / len(ratios):.2f}"
+
+        saved = (1 - tokens / baseline_tokens) * 100
+        print(f"{name:>16} {tokens:>8} {tokens / len(paths):>11.0f} {size_kb:>10.0f} {saved:>8.0f}% {similarity:>13}")
+
+    if client:
+        print("\nRespostas por imagem:")
+        for i, path in enumerate(paths):
+            print(f"\n  {Path(path).name}")
+            for name, _ in POLICIES:
+                print(f"    {name:>16}: {answers[name][i]}")
+    else:
+        print("\nUse --api para medir a qualidade das respostas (gasta tokens).")
+
+
+if __name__ == "__main__":
+    main()
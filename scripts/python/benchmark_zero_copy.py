@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - LEITURA ZERO-CÓPIA DAS IMAGENS QUE PASSAM DIRETO
+Pico de memória Python (tracemalloc) por imagem para:
+- método antigo: f.read() + b64encode(...).decode()
+- file_base64: base64 direto do mmap para a str do bloco da API (caminho
+  usado nas requisições pelo SDK; limite 2x o base64: bytes ASCII + str)
+- write_message_body: mmap -> pedaços de base64 -> arquivo da requisição
+  (só para corpos gravados/enviados crus, fora do SDK)
+
+O mmap usa o cache de páginas do sistema e não entra na conta do
+tracemalloc; é exatamente a memória que deixa de ser copiada.
+
+Uso: python benchmark_zero_copy.py [imagem]
+"""
+
+import sys
+import json
+import base64
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from PIL import Image
+import foltz_imaging as fi
+from payload_stream import write_message_body
+
+# PNG grande, mas ainda dentro dos limites da API (passa direto)
+SAMPLE_SIZE = (1900, 1900)
+
+
+def create_sample(path):
+    gradient = Image.linear_gradient('L').resize(SAMPLE_SIZE)
+    noise = Image.effect_noise(SAMPLE_SIZE, 8)
+    Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.ROTATE_90))).save(path)
+
+
+def old_method(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return base64.b64encode(data).decode('utf-8')
+
+
+def new_method(path):
+    return fi.file_base64(path)
+
+
+def streamed(path, out_path):
+    with open(out_path, 'wb') as out:
+        return write_message_body(out, "modelo", 100, "prompt", [path])
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    result = func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak
+
+
+def main():
+    print("=" * 70)
+    print("BENCHMARK DE LEITURA ZERO-CÓPIA".center(70))
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(tmp) / "grande.png"
+        if not path.exists():
+            create_sample(path)
+
+        media_type = fi.is_pass_through(path)
+        if not media_type:
+            print(f"{path.name} precisa ser processada (não passa direto); escolha outra imagem")
+            return
+
+        size = path.stat().st_size
+        old_b64, peak_old = measure(old_method, path)
+        new_b64, peak_new = measure(new_method, path)
+        body_path = Path(tmp) / "request.json"
+        _, peak_stream = measure(streamed, path, body_path)
+
+        body = json.loads(body_path.read_text(encoding='ascii'))
+        streamed_b64 = body["messages"][0]["content"][1]["source"]["data"]
+        del body
+
+    mb = 1024 * 1024
+    print(f"\n{path.name}: {size / mb:.1f} MB ({media_type}), base64 {fi.base64_size(size) / mb:.1f} MB\n")
+    print(f"{'Método':>24} {'Pico Python (MB)':>18} {'x arquivo':>10}")
+    print("-" * 70)
+    for name, peak in [("f.read + b64encode", peak_old),
+                       ("file_base64 (mmap)", peak_new),
+                       ("write_message_body", peak_stream)]:
+        print(f"{name:>24} {peak / mb:>18.1f} {peak / size:>10.2f}")
+
+    same = old_b64 == new_b64 == streamed_b64
+    print(f"\n{'✓' if same else '⚠️ '} Base64 idêntico nos três métodos")
+    print(f"Limite esperado de file_base64: 2x o base64 = {2 * fi.base64_size(size) / size:.2f}x o arquivo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CLIENTE DA API DO CLAUDE COMPARTILHADO
+Um único cliente (sync e async) por processo, reaproveitando as conexões
+HTTP keep-alive entre lotes em vez de abrir TCP + TLS a cada requisição
+
+- Limites do pool e timeouts ajustados para lotes grandes de imagens
+- keep-alive longo: entre um lote e outro passam vários segundos
+  codificando imagens, mais que os 5s padrão do httpx
+- API_STATS mede cada requisição (latência até os cabeçalhos da resposta
+  e quanto dela foi abertura de conexão)
+"""
+
+import os
+import time
+import atexit
+import threading
+import contextvars
+
+import anthropic
+
+API_TIMEOUT = float(os.environ.get("FOLTZ_API_TIMEOUT", "600"))
+API_CONNECT_TIMEOUT = float(os.environ.get("FOLTZ_API_CONNECT_TIMEOUT", "10"))
+API_MAX_CONNECTIONS = int(os.environ.get("FOLTZ_API_MAX_CONNECTIONS", "20"))
+API_KEEPALIVE_CONNECTIONS = int(os.environ.get("FOLTZ_API_KEEPALIVE_CONNECTIONS", "10"))
+API_KEEPALIVE_EXPIRY = float(os.environ.get("FOLTZ_API_KEEPALIVE_EXPIRY", "120"))
+
+# httpx.Limits da versão de httpx usada pelo SDK instalado
+_Limits = type(anthropic.DEFAULT_CONNECTION_LIMITS)
+
+
+class RequestStats:
+    """
+    Latência de cada requisição HTTP feita pelos clientes compartilhados
+
+    latência = envio da requisição até os cabeçalhos da resposta;
+    setup = parte dela gasta abrindo TCP/TLS (0 se a conexão foi reaproveitada)
+    """
+
+    def __init__(self):
+        self.requests = []   # (latência, setup)
+        self._lock = threading.Lock()
+        # Última requisição de cada thread/tarefa: com lotes em paralelo,
+        # requests[-1] pode ser de outro lote
+        self._last = contextvars.ContextVar("foltz_last_request", default=None)
+
+    def _record(self, request, now):
+        timing = request.extensions.get("foltz_timing")
+        if timing is None:
+            return
+        setup = timing.get("connect_end", timing["start"]) - timing.get("connect_start", timing["start"])
+        record = (now - timing["start"], setup)
+        self._last.set(record)
+        with self._lock:
+            self.requests.append(record)
+
+    @staticmethod
+    def _on_trace(timing, name):
+        if name == "connection.connect_tcp.started":
+            timing["connect_start"] = time.perf_counter()
+        elif name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            timing["connect_end"] = time.perf_counter()
+
+    # Hooks do httpx: o trace do httpcore marca abertura de conexão/TLS
+    def on_request(self, request):
+        timing = {"start": time.perf_counter()}
+        request.extensions["foltz_timing"] = timing
+        request.extensions["trace"] = lambda name, info: self._on_trace(timing, name)
+
+    def on_response(self, response):
+        self._record(response.request, time.perf_counter())
+
+    async def on_request_async(self, request):
+        timing = {"start": time.perf_counter()}
+
+        async def trace(name, info):
+            self._on_trace(timing, name)
+
+        request.extensions["foltz_timing"] = timing
+        request.extensions["trace"] = trace
+
+    async def on_response_async(self, response):
+        self._record(response.request, time.perf_counter())
+
+    def last(self):
+        """Resumo da última requisição desta thread (ou tarefa asyncio), para o log de cada lote"""
+        record = self._last.get()
+        if record is None:
+            return "sem requisições HTTP"
+        latency, setup = record
+        connection = f"conexão nova, {setup * 1000:.0f} ms de TCP/TLS" if setup else "conexão reaproveitada"
+        return f"Latência: {latency:.2f}s ({connection})"
+
+    def report(self):
+        if not self.requests:
+            return "Cliente HTTP: nenhuma requisição"
+        latencies = [latency for latency, _ in self.requests]
+        setups = [setup for _, setup in self.requests if setup]
+        first = latencies[0]
+        rest = latencies[1:]
+        rest_text = f", demais {sum(rest) / len(rest):.2f}s em média" if rest else ""
+        setup_text = f" ({sum(setups) / len(setups) * 1000:.0f} ms de setup em média)" if setups else ""
+        return (f"Cliente HTTP: {len(latencies)} requisições, {len(setups)} conexões abertas{setup_text}; "
+                f"latência: primeira {first:.2f}s{rest_text}")
+
+
+API_STATS = RequestStats()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _timeout():
+    return anthropic.Timeout(API_TIMEOUT, connect=API_CONNECT_TIMEOUT)
+
+
+def _limits():
+    return _Limits(max_connections=API_MAX_CONNECTIONS,
+                   max_keepalive_connections=API_KEEPALIVE_CONNECTIONS,
+                   keepalive_expiry=API_KEEPALIVE_EXPIRY)
+
+
+def get_client(api_key=None):
+    """Cliente síncrono do processo (criado na primeira chamada)"""
+    with _clients_lock:
+        client = _clients.get("sync")
+        if client is None:
+            http_client = anthropic.DefaultHttpxClient(
+                limits=_limits(), timeout=_timeout(),
+                event_hooks={"request": [API_STATS.on_request], "response": [API_STATS.on_response]},
+            )
+            client = anthropic.Anthropic(api_key=api_key, timeout=_timeout(), http_client=http_client)
+            atexit.register(client.close)
+            _clients["sync"] = client
+        return client
+
+
+def get_async_client(api_key=None):
+    """
+    Cliente assíncrono do processo; use dentro de um único asyncio.run
+    (as conexões pertencem ao event loop que as abriu)
+    """
+    with _clients_lock:
+        client = _clients.get("async")
+        if client is None:
+            http_client = anthropic.DefaultAsyncHttpxClient(
+                limits=_limits(), timeout=_timeout(),
+                event_hooks={"request": [API_STATS.on_request_async],
+                             "response": [API_STATS.on_response_async]},
+            )
+            client = anthropic.AsyncAnthropic(api_key=api_key, timeout=_timeout(), http_client=http_client)
+            _clients["async"] = client
+        return client
+
+
+async def close_async_client():
+    """
+    Fecha o cliente assíncrono no fim do asyncio.run e o tira do cache: o
+    próximo get_async_client cria outro (em vez de devolver um fechado)
+    """
+    with _clients_lock:
+        client = _clients.pop("async", None)
+    if client is not None:
+        await client.close()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DESPACHO CONCORRENTE DE LOTES PARA A API DO CLAUDE
+Envia vários lotes ao mesmo tempo com AsyncAnthropic, respeitando os
+limites da conta (requisições e tokens de entrada por minuto) com dois
+token buckets, e entrega os resultados na ordem dos lotes
+
+- concurrency limita quantos lotes ficam em voo ao mesmo tempo
+- Os lotes são montados sob demanda (numa thread, sem travar o loop), então
+  só ~concurrency lotes codificados existem na memória
+- on_result(chave, resultado) é chamado na ordem de entrada, mesmo que as
+  respostas cheguem fora de ordem
+
+O RateLimiter também atende threads (acquire_sync): é o mesmo limitador
+que o batch_pipeline usa antes de cada requisição.
+"""
+
+import os
+import time
+import asyncio
+import threading
+
+from foltz_imaging import estimate_batch_tokens
+
+API_CONCURRENCY = int(os.environ.get("FOLTZ_API_CONCURRENCY", "4"))
+# Limites do tier da conta (ver console da Anthropic)
+API_REQUESTS_PER_MINUTE = int(os.environ.get("FOLTZ_API_RPM", "50"))
+API_INPUT_TOKENS_PER_MINUTE = int(os.environ.get("FOLTZ_API_ITPM", "50000"))
+
+CHARS_PER_TOKEN = 4  # estimativa para o texto do prompt
+
+
+def estimate_request_tokens(content):
+    """Tokens de entrada estimados de um content (texto + imagens)"""
+    text_chars = sum(len(block["text"]) for block in content if block["type"] == "text")
+    images = [block for block in content if block["type"] == "image"]
+    return text_chars // CHARS_PER_TOKEN + estimate_batch_tokens(images)
+
+
+class TokenBucket:
+    """
+    Balde que enche rate_per_minute unidades por minuto, até capacity
+    acquire(n) espera até haver n unidades; pedidos maiores que o balde
+    esperam o balde cheio (senão nunca seriam atendidos)
+
+    Cada pedido reserva as unidades na hora (o saldo pode ficar negativo) e
+    espera fora do lock o tempo de o saldo voltar a zero: a ordem de chegada
+    é respeitada e o mesmo balde serve corrotinas e threads.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount):
+        """Reserva amount unidades; devolve quantos segundos esperar"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            delay = max(0.0, -self.tokens / self.rate)
+            self.waited += delay
+            return delay
+
+    async def acquire(self, amount=1):
+        delay = self._reserve(amount)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, amount=1):
+        delay = self._reserve(amount)
+        if delay:
+            time.sleep(delay)
+
+
+class RateLimiter:
+    """Requisições por minuto + tokens de entrada por minuto"""
+
+    def __init__(self, requests_per_minute=API_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=API_INPUT_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, input_tokens):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(input_tokens)
+
+    def acquire_sync(self, input_tokens):
+        """acquire para threads (bloqueia a thread que chamou)"""
+        self.requests.acquire_sync(1)
+        self.tokens.acquire_sync(input_tokens)
+
+    @property
+    def waited(self):
+        return self.requests.waited + self.tokens.waited
+
+
+class BatchDispatcher:
+    """
+    Executa send(payload) para cada (chave, payload) de jobs com até
+    concurrency requisições em voo
+
+    send é uma corrotina que recebe o payload e devolve o resultado;
+    exceções viram resultado None (e ficam em self.errors).
+    tokens_fn(payload) estima os tokens de entrada para o limitador.
+    lookup(payload), se dado, devolve um resultado já conhecido (cache) ou
+    None; resultados conhecidos não passam pelo limitador nem por send.
+    """
+
+    def __init__(self, concurrency=API_CONCURRENCY, limiter=None, tokens_fn=None):
+        self.concurrency = max(1, concurrency)
+        self.limiter = limiter or RateLimiter()
+        self.tokens_fn = tokens_fn or (lambda payload: 0)
+        self.requests = 0
+        self.cached = 0
+        self.errors = {}
+        self.seconds = 0.0
+
+    async def _run_one(self, send, key, payload, lookup=None):
+        if lookup:
+            result = lookup(payload)
+            if result is not None:
+                self.cached += 1
+                return result
+        await self.limiter.acquire(self.tokens_fn(payload))
+        self.requests += 1
+        try:
+            return await send(payload)
+        except Exception as e:
+            self.errors[key] = str(e)
+            return None
+
+    async def run(self, send, jobs, on_result=None, lookup=None):
+        """
+        jobs: iterável (pode ser gerador) de (chave, payload), consumido sob demanda
+        Devolve {chave: resultado}; on_result é chamado na ordem de jobs
+        """
+        start = time.perf_counter()
+        jobs = iter(jobs)
+        pending = {}      # task -> índice
+        done = {}         # índice -> resultado
+        keys = {}
+        next_index = 0    # próximo job a montar
+        next_emit = 0     # próximo resultado a entregar
+        results = {}
+        exhausted = False
+
+        while True:
+            # Completa as vagas com os próximos jobs (montados fora do loop)
+            while not exhausted and len(pending) < self.concurrency:
+                job = await asyncio.to_thread(next, jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                key, payload = job
+                task = asyncio.create_task(self._run_one(send, key, payload, lookup))
+                pending[task] = next_index
+                keys[next_index] = key
+                next_index += 1
+
+            if not pending:
+                break
+
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                index = pending.pop(task)
+                done[index] = task.result()
+
+            # Entrega em ordem o que já estiver contíguo
+            while next_emit in done:
+                result = done.pop(next_emit)
+                key = keys.pop(next_emit)
+                results[key] = result
+                if on_result:
+                    on_result(key, result)
+                next_emit += 1
+
+        self.seconds += time.perf_counter() - start
+        return results
+
+    def report(self):
+        return (f"Despacho: {self.requests} requisições ({self.cached} do cache) em {self.seconds:.1f}s "
+                f"({self.concurrency} em paralelo, {self.limiter.waited:.1f}s aguardando limites, "
+                f"{len(self.errors)} erros)")
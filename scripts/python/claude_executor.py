@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EXECUTOR DE REQUISIÇÕES COM CLASSIFICAÇÃO DE ERROS
+Substitui os loops "tenta o próximo modelo em qualquer erro": cada erro é
+classificado antes de decidir o que fazer
+
+- retentável (429, 5xx, 529 overloaded, conexão/timeout): espera e tenta
+  de novo o mesmo modelo, respeitando retry-after, com backoff exponencial
+  com jitter
+- troca de modelo (404/403 modelo indisponível, max_tokens acima do limite
+  do modelo, ou retentáveis esgotados): passa para o próximo modelo
+- fatal (413 payload grande demais, 401, 400 inválido): nenhum modelo vai
+  aceitar o mesmo payload; desiste na hora
+
+O circuit breaker lembra os modelos que falharam: indisponíveis ficam
+desligados até o fim da execução, sobrecarregados por BREAKER_COOLDOWN
+segundos depois de BREAKER_THRESHOLD falhas seguidas.
+
+Pode ser usado por várias threads ao mesmo tempo (workers de rede do
+batch_pipeline): contadores e circuit breaker ficam atrás de locks.
+"""
+
+import os
+import time
+import random
+import threading
+
+import anthropic
+
+from usage_ledger import USAGE_LEDGER
+
+EXECUTOR_MAX_RETRIES = int(os.environ.get("FOLTZ_API_MAX_RETRIES", "4"))
+BACKOFF_BASE_DELAY = float(os.environ.get("FOLTZ_API_BACKOFF_BASE", "2"))
+BACKOFF_MAX_DELAY = float(os.environ.get("FOLTZ_API_BACKOFF_MAX", "60"))
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 300
+
+RETRYABLE = "retentável"
+FALLBACK = "troca de modelo"
+FATAL = "fatal"
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+UNAVAILABLE_STATUS = {403, 404}
+
+
+def classify_error(error):
+    """RETRYABLE, FALLBACK ou FATAL para uma exceção do SDK"""
+    if isinstance(error, anthropic.APIConnectionError):  # inclui APITimeoutError
+        return RETRYABLE
+    if not isinstance(error, anthropic.APIStatusError):
+        return FATAL
+    if error.status_code in RETRYABLE_STATUS:
+        return RETRYABLE
+    if error.status_code in UNAVAILABLE_STATUS:
+        return FALLBACK
+    # "max_tokens: 8000 > 4096, which is the maximum allowed..." depende do modelo
+    if error.status_code == 400 and "max_tokens" in str(error):
+        return FALLBACK
+    return FATAL
+
+
+def retry_after(error):
+    """Segundos pedidos pela API no cabeçalho retry-after, ou None"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # formato de data HTTP: usa o backoff
+    return None
+
+
+def describe_error(error):
+    status = getattr(error, "status_code", None)
+    name = type(error).__name__
+    return f"{status} {name}" if status else name
+
+
+class RequestFailed(Exception):
+    """Nenhum modelo respondeu; category diz o motivo do último erro"""
+
+    def __init__(self, message, category, last_error=None):
+        super().__init__(message)
+        self.category = category
+        self.last_error = last_error
+
+
+class CircuitBreaker:
+    """Desliga modelos que falham: para sempre (indisponíveis) ou por cooldown"""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = {}     # modelo -> falhas seguidas
+        self.open_until = {}   # modelo -> monotonic (inf = até o fim da execução)
+        self._lock = threading.Lock()
+
+    def allows(self, model):
+        with self._lock:
+            until = self.open_until.get(model)
+            if until is None:
+                return True
+            if time.monotonic() >= until:
+                # meio-aberto: deixa uma tentativa passar
+                del self.open_until[model]
+                self.failures[model] = self.threshold - 1
+                return True
+            return False
+
+    def success(self, model):
+        with self._lock:
+            self.failures.pop(model, None)
+
+    def failure(self, model, permanent=False):
+        with self._lock:
+            if permanent:
+                self.open_until[model] = float("inf")
+                return
+            self.failures[model] = self.failures.get(model, 0) + 1
+            if self.failures[model] >= self.threshold:
+                self.open_until[model] = time.monotonic() + self.cooldown
+
+    def disabled(self):
+        with self._lock:
+            return sorted(self.open_until)
+
+
+class RequestExecutor:
+    """
+    create(client, models, max_tokens, **params) tenta os modelos em ordem e
+    devolve (message, modelo); levanta RequestFailed se nenhum responder
+
+    max_tokens pode ser um número ou uma função modelo -> número.
+    send(client, **params) troca a chamada (padrão: client.messages.create),
+    ex.: response_stream.stream_sender() para streaming.
+    ledger (UsageLedger): registra tokens, latência e novas tentativas de
+    cada chamada bem-sucedida.
+    As retentativas ficam todas aqui (o SDK é chamado com max_retries=0).
+    """
+
+    def __init__(self, max_retries=EXECUTOR_MAX_RETRIES, base_delay=BACKOFF_BASE_DELAY,
+                 max_delay=BACKOFF_MAX_DELAY, breaker=None, sleep=time.sleep, ledger=None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.ledger = ledger
+        self.calls = 0
+        self.retries = 0
+        self.fallbacks = 0
+        self.fatal = 0
+        self.retry_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def backoff(self, attempt, error):
+        """retry-after da API se houver; senão exponencial com jitter"""
+        requested = retry_after(error)
+        if requested is not None:
+            return requested + random.uniform(0, 0.5)
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def create(self, client, models, max_tokens, log=print, send=None, **params):
+        client = client.with_options(max_retries=0)
+        send = send or (lambda client, **params: client.messages.create(**params))
+        last_error = None
+        last_category = FALLBACK
+        failed_attempts = 0
+
+        for model in models:
+            if not self.breaker.allows(model):
+                log(f"  ├─ {model} desligado nesta execução (circuit breaker)")
+                continue
+
+            tokens = max_tokens(model) if callable(max_tokens) else max_tokens
+            log(f"  ├─ Tentando modelo: {model}")
+
+            for attempt in range(self.max_retries + 1):
+                self._count("calls")
+                started = time.perf_counter()
+                try:
+                    message = send(client, model=model, max_tokens=tokens, **params)
+                except Exception as e:
+                    failed_attempts += 1
+                    category = classify_error(e)
+                    last_error, last_category = e, category
+                    if category == FATAL:
+                        self._count("fatal")
+                        self._count("retry_seconds", time.perf_counter() - started)
+                        raise RequestFailed(f"{describe_error(e)} (fatal): {str(e)[:200]}", category, e) from e
+                    if category == RETRYABLE and attempt < self.max_retries:
+                        delay = self.backoff(attempt, e)
+                        log(f"  ├─ ⏳ {describe_error(e)}; nova tentativa em {delay:.1f}s "
+                            f"({attempt + 1}/{self.max_retries})")
+                        self._count("retries")
+                        self.sleep(delay)
+                        self._count("retry_seconds", time.perf_counter() - started)
+                        continue
+
+                    self._count("retry_seconds", time.perf_counter() - started)
+                    self.breaker.failure(model, permanent=(category == FALLBACK))
+                    self._count("fallbacks")
+                    log(f"  ├─ ✗ {model}: {describe_error(e)}; próximo modelo")
+                    break
+                else:
+                    self.breaker.success(model)
+                    if self.ledger:
+                        self.ledger.record(message, params=params, latency=time.perf_counter() - started,
+                                           retries=failed_attempts)
+                    return message, model
+
+        if last_error is None:
+            raise RequestFailed("nenhum modelo disponível (todos desligados pelo circuit breaker)", FALLBACK)
+        raise RequestFailed(f"todos os modelos falharam; último erro: {describe_error(last_error)}: "
+                            f"{str(last_error)[:200]}", last_category, last_error)
+
+    def report(self):
+        disabled = self.breaker.disabled()
+        disabled_text = f"; desligados: {', '.join(disabled)}" if disabled else ""
+        return (f"Executor: {self.calls} chamadas, {self.retries} novas tentativas, "
+                f"{self.fallbacks} trocas de modelo, {self.fatal} erros fatais, "
+                f"{self.retry_seconds:.1f}s perdidos com falhas{disabled_text}")
+
+
+# Instância compartilhada: o circuit breaker vale para a execução inteira
+API_EXECUTOR = RequestExecutor(ledger=USAGE_LEDGER)
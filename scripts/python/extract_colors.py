@@ -11,11 +11,14 @@ from pathlib import Path
 from PIL import Image
 from collections import Counter
 import json
+from foltz_imaging import RESIZE_FAST, apply_draft, downscale
 
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
 IMAGE_FOLDERS = ["seedream", "id_visual"]
+THUMBNAIL_SIZE = (150, 150)
+RESIZE_MODE = RESIZE_FAST  # só conta cores; não precisa da redução de alta qualidade
 
 def rgb_to_hex(rgb):
     """Converte RGB para HEX"""
@@ -53,8 +56,9 @@ def extract_dominant_colors(image_path, num_colors=5):
     """Extrai cores dominantes da imagem"""
     try:
         with Image.open(image_path) as img:
-            # Redimensiona para processar mais rápido
-            img = img.resize((150, 150))
+            # Redimensiona para processar mais rápido (decodificação reduzida no JPEG)
+            apply_draft(img, THUMBNAIL_SIZE, RESIZE_MODE)
+            img = downscale(img, THUMBNAIL_SIZE, RESIZE_MODE)
             img = img.convert('RGB')
 
             # Pega todos os pixels
@@ -2,16 +2,27 @@
 # -*- coding: utf-8 -*-
 """
 CORRIGIR E REPROCESSAR LOTES FALHADOS
-Processa apenas os lotes 4 e 5 que falharam
+Reenvia, lote a lote, só as imagens que o manifesto da última análise
+completa (run_complete_analysis) registra como falhas ou pendentes
+
+As imagens são identificadas pelo hash do conteúdo, então adicionar ou
+renomear imagens no catálogo não muda o que é reprocessado.
 """
 
 import os
 import sys
-import base64
-from pathlib import Path
-from PIL import Image
-import io
-import anthropic
+import time
+from functools import partial
+from image_cache import IMAGE_CACHE
+from image_pool import PREPROCESSOR
+from claude_client import API_STATS, get_client
+from response_cache import RESPONSE_CACHE, request_fingerprint
+from run_manifest import RunManifest
+from usage_ledger import USAGE_LEDGER
+from foltz_imaging import (
+    FORMAT_AUTO, PAYLOAD_STATS, RESIZE_QUALITY, TASK_ANALYSIS,
+    encode_image_block, estimate_batch_tokens
+)
 from datetime import datetime
 
 if sys.platform == 'win32':
@@ -20,68 +31,40 @@ if sys.platform == 'win32':
 from dotenv import load_dotenv
 load_dotenv()
 
-MAX_DIMENSION = 2000
-IMAGE_FOLDERS = ["seedream", "id_visual"]
+RESIZE_MODE = RESIZE_QUALITY  # RESIZE_FAST troca qualidade por velocidade
+IMAGE_TASK = TASK_ANALYSIS  # orçamento de pixels/tokens por imagem (ver foltz_imaging)
+OUTPUT_FORMAT = FORMAT_AUTO  # menor entre JPEG/WebP; FORMAT_SOURCE mantém o formato original
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
+IMAGES_PER_BATCH = 10
+RUN_NAME = "analise_completa"  # manifesto gravado por run_complete_analysis.py
+
+# Função de codificação enviada aos workers do pool
+ENCODE_IMAGE = partial(encode_image_block, mode=RESIZE_MODE, task=IMAGE_TASK, output_format=OUTPUT_FORMAT)
 
 def log(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
     print(f"[{timestamp}] {message}")
 
-def resize_and_encode_image(image_path, max_dimension=MAX_DIMENSION):
-    with Image.open(image_path) as img:
-        width, height = img.size
-        if width > max_dimension or height > max_dimension:
-            if width > height:
-                new_width = max_dimension
-                new_height = int((max_dimension / width) * height)
-            else:
-                new_height = max_dimension
-                new_width = int((max_dimension / height) * width)
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        buffer = io.BytesIO()
-        img.save(buffer, format=img.format or 'JPEG', quality=90)
-        return base64.b64encode(buffer.getvalue()).decode('utf-8')
-
-def get_media_type(file_path):
-    ext = file_path.suffix.lower()
-    return {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
-            '.gif': 'image/gif', '.webp': 'image/webp'}.get(ext, 'image/jpeg')
-
-def collect_images(start_index, count):
-    """Coleta imagens específicas"""
-    all_images = []
-    for folder in IMAGE_FOLDERS:
-        folder_path = Path(folder)
-        if folder_path.exists():
-            for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp']:
-                all_images.extend(sorted(folder_path.glob(ext)))
-
-    # Pega apenas as imagens solicitadas
-    selected = all_images[start_index:start_index + count]
-
+def collect_images(paths, manifest):
+    """Codifica as imagens de um lote; as que falham ficam marcadas no manifesto"""
     images = []
     image_names = []
+    encoded_paths = []
 
-    log(f"\nProcessando {len(selected)} imagens (índices {start_index}-{start_index+len(selected)-1})...")
+    log(f"\nProcessando {len(paths)} imagens...")
 
-    for img_path in selected:
-        try:
+    for img_path, block, error in PREPROCESSOR.map(ENCODE_IMAGE, paths):
+        if error:
             log(f"  {img_path.name}")
-            image_base64 = resize_and_encode_image(img_path)
-            images.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": get_media_type(img_path),
-                    "data": image_base64
-                }
-            })
-            image_names.append(img_path.name)
-        except Exception as e:
-            log(f"  ERRO: {e}")
-
-    return images, image_names
+            log(f"  ERRO: {error}")
+            manifest.fail_image(img_path, error)
+            continue
+        log(f"  {PAYLOAD_STATS.add(img_path, block)}")
+        images.append(block)
+        image_names.append(img_path.name)
+        encoded_paths.append(img_path)
+
+    return images, image_names, encoded_paths
 
 def analyze_batch(images, image_names, batch_number):
     """Analisa um lote com configuração corrigida"""
@@ -89,7 +72,7 @@ def analyze_batch(images, image_names, batch_number):
         log("ERRO: API Key não encontrada")
         return None
 
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    client = get_client(ANTHROPIC_API_KEY)
 
     prompt = f"""Analise estas {len(images)} imagens de jerseys de futebol para e-commerce.
 
@@ -121,17 +104,31 @@ Seja detalhado e específico."""
     content = [{"type": "text", "text": prompt}] + images
 
     log(f"\nEnviando lote {batch_number} para Claude...")
+    log(f"  Tokens de imagem estimados: ~{estimate_batch_tokens(images)}")
+    log(f"  {PAYLOAD_STATS.end_batch()}")
+
+    fingerprint = request_fingerprint(prompt, images)
+    cached = RESPONSE_CACHE.get("claude-3-haiku-20240307", fingerprint, 4000)
+    if cached is not None:
+        log("  ♻️  Resposta em cache")
+        return cached
 
     try:
         # Apenas Haiku com limite correto
         log("  Usando: claude-3-haiku-20240307")
+        started = time.perf_counter()
         message = client.messages.create(
             model="claude-3-haiku-20240307",
             max_tokens=4000,  # ✓ CORRIGIDO: limite do Haiku
             messages=[{"role": "user", "content": content}]
         )
+        USAGE_LEDGER.record(message, images=len(images), latency=time.perf_counter() - started)
         log("  ✓ Sucesso!")
-        return message.content[0].text
+        log(f"  {USAGE_LEDGER.last()}")
+        log(f"  {API_STATS.last()}")
+        text = message.content[0].text
+        RESPONSE_CACHE.put("claude-3-haiku-20240307", fingerprint, 4000, text)
+        return text
     except Exception as e:
         log(f"  ✗ Erro: {e}")
         return None
@@ -157,53 +154,62 @@ def save_results(result, batch_number):
         f.write(result)
 
     log(f"  Adicionado ao consolidado")
+    return filename
 
 def main():
     print("="*80)
     print(" REPROCESSAR LOTES FALHADOS ".center(80, "="))
     print("="*80)
 
+    manifest = RunManifest(RUN_NAME, resume=True)
+    if not manifest.resumed:
+        log(f"✗ Manifesto não encontrado: {manifest.path}")
+        log("  Rode primeiro: python run_complete_analysis.py")
+        return
+
+    todo = manifest.pending()
+    total_batches = (len(todo) + IMAGES_PER_BATCH - 1) // IMAGES_PER_BATCH
+
     log("Configuração:")
-    log("  ├─ Lotes a processar: 4 e 5")
-    log("  ├─ Imagens por lote: 10")
+    log(f"  ├─ Imagens a reprocessar: {len(todo)}")
+    log(f"  ├─ Lotes: {total_batches} de até {IMAGES_PER_BATCH} imagens")
     log("  └─ Modelo: Haiku (max_tokens=4000)")
 
-    # Lote 4: imagens 30-39
-    log("\n" + "="*80)
-    log("LOTE 4 (imagens 30-39)")
-    log("="*80)
-
-    images_4, names_4 = collect_images(30, 10)
-    if images_4:
-        result_4 = analyze_batch(images_4, names_4, 4)
-        if result_4:
-            save_results(result_4, 4)
-            log("✓ Lote 4 concluído!")
-        else:
-            log("✗ Lote 4 falhou")
-
-    import time
-    time.sleep(2)
-
-    # Lote 5: imagens 40-49
-    log("\n" + "="*80)
-    log("LOTE 5 (imagens 40-49)")
-    log("="*80)
-
-    images_5, names_5 = collect_images(40, 10)
-    if images_5:
-        result_5 = analyze_batch(images_5, names_5, 5)
-        if result_5:
-            save_results(result_5, 5)
-            log("✓ Lote 5 concluído!")
+    if not todo:
+        log("\n✓ Nada a reprocessar: todas as imagens já foram analisadas")
+        log(manifest.report())
+        return
+
+    for index, start_idx in enumerate(range(0, len(todo), IMAGES_PER_BATCH), 1):
+        batch_num = manifest.next_batch()
+        log("\n" + "="*80)
+        log(f"LOTE {batch_num} ({index}/{total_batches})")
+        log("="*80)
+
+        images, names, encoded_paths = collect_images(todo[start_idx:start_idx + IMAGES_PER_BATCH], manifest)
+        if not images:
+            continue
+
+        manifest.assign(batch_num, encoded_paths)
+        result = analyze_batch(images, names, batch_num)
+        if result:
+            manifest.complete(batch_num, save_results(result, batch_num))
+            log(f"✓ Lote {batch_num} concluído!")
         else:
-            log("✗ Lote 5 falhou")
+            manifest.fail(batch_num, "sem resposta da API")
+            log(f"✗ Lote {batch_num} falhou")
 
     print("\n" + "="*80)
     print(" REPROCESSAMENTO CONCLUÍDO ".center(80, "="))
     print("="*80)
-    log("\nAgora você tem a análise completa de 50 imagens!")
+    log(manifest.report())
     log("Verifique: analise_produtos_completa.txt")
+    log(IMAGE_CACHE.report())
+    log(PAYLOAD_STATS.report())
+    log(PREPROCESSOR.report())
+    log(RESPONSE_CACHE.report())
+    log(API_STATS.report())
+    log(USAGE_LEDGER.report())
     print("="*80)
 
 if __name__ == "__main__":
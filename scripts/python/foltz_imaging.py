@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FUNÇÕES DE IMAGEM COMPARTILHADAS
+Preparação das imagens para a API do Claude, usada por todos os scripts
+
+- Lista as imagens das pastas (list_images)
+- Redimensiona para caber em MAX_DIMENSION e no orçamento de pixels da
+  tarefa (análise, SEO, identificação), em dois modos:
+  - "quality": decodifica a imagem inteira e aplica LANCZOS
+  - "fast": usa a decodificação reduzida do JPEG (Image.draft, escala DCT
+    1/2..1/8) e reducing_gap, que reduz por média de blocos antes do LANCZOS.
+    Só faz diferença com redução de 2x ou mais (ex.: a miniatura do
+    extract_colors, orçamentos de pixels de fotos grandes); abaixo disso a
+    saída e o tempo são os mesmos do "quality"
+- Arquivos que já cumprem os limites passam direto, sem decodificar: o
+  formato e o tamanho vêm só do cabeçalho e o base64 sai de um mmap do
+  arquivo (os bytes do arquivo não são copiados para a memória do Python)
+- Limite real de memória por imagem no bloco da API (data precisa ser str):
+  o bloco guarda 1x o base64 (~1,33x o arquivo); enquanto é gerado, o base64
+  existe duas vezes (bytes ASCII + str), ~2,7x o arquivo. Depois, o SDK
+  ainda serializa o corpo inteiro da requisição (str + bytes)
+- Formato de saída: "source" mantém o de origem (PNG continua PNG); "auto"
+  escolhe o menor entre JPEG e WebP na mesma qualidade (só WebP se houver
+  transparência de verdade) e fica com o original se ele for menor
+- Garante o limite de bytes por imagem da API
+- Resultado em cache no disco (image_cache)
+"""
+
+import io
+import os
+import math
+import mmap
+import binascii
+from pathlib import Path
+from PIL import Image
+
+from image_cache import IMAGE_CACHE
+from image_manifest import read_image_header, read_stream_header
+
+MAX_DIMENSION = 2000  # Limite da API para many-image requests
+JPEG_QUALITY = 90
+IMAGE_FOLDERS = ["seedream", "id_visual"]
+IMAGE_EXTENSIONS = ['*.jpg', '*.jpeg', '*.png', '*.webp']
+
+# A API recusa imagens com mais de 5 MB (medido no base64)
+MAX_IMAGE_BASE64_BYTES = 5 * 1024 * 1024
+MIN_GUARD_QUALITY = 50
+
+RESIZE_QUALITY = "quality"
+RESIZE_FAST = "fast"
+RESIZE_MODES = (RESIZE_QUALITY, RESIZE_FAST)
+
+# reducing_gap=2.0 mantém a diferença visual desprezível (recomendação do Pillow)
+FAST_REDUCING_GAP = 2.0
+
+# Formato de saída das imagens processadas
+FORMAT_SOURCE = "source"
+FORMAT_AUTO = "auto"
+OUTPUT_FORMATS = (FORMAT_SOURCE, FORMAT_AUTO)
+LOSSY_FORMATS = ('JPEG', 'WEBP')
+
+# Pedaço lido do mmap por vez no base64 (múltiplo de 3: sem padding no meio)
+BASE64_CHUNK_BYTES = 3 * 256 * 1024
+# Começo do base64 decodificado para achar as dimensões de um bloco
+# (múltiplo de 4); cresce 4x se o cabeçalho vier depois (ex.: EXIF/ICC grande)
+HEADER_BASE64_PREFIX = 4 * 16 * 1024
+
+# Custo aproximado de uma imagem na API: largura * altura / 750 tokens.
+# Acima de ~1,15 MP a própria API reduz a imagem, então pixels além disso só
+# aumentam o upload. Cada tarefa tem um orçamento de pixels por imagem:
+TOKENS_PER_PIXEL = 1 / 750
+TASK_ANALYSIS = "analysis"
+TASK_SEO = "seo"
+TASK_IDENTIFICATION = "identification"
+TASK_PIXEL_BUDGETS = {
+    TASK_ANALYSIS: 1_150_000,       # ~1530 tokens: detalhes de patrocínio, gola, escudo
+    TASK_SEO: 750_000,              # ~1000 tokens: texto de vitrine
+    TASK_IDENTIFICATION: 400_000,   # ~530 tokens: só time/tipo/temporada
+}
+
+MEDIA_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp'
+}
+
+# Formatos aceitos pela API -> media type
+API_FORMATS = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp'
+}
+
+
+def list_images(folders=IMAGE_FOLDERS, extensions=IMAGE_EXTENSIONS, sort=True):
+    """Lista as imagens das pastas, na ordem pasta -> extensão -> nome"""
+    paths = []
+    for folder in folders:
+        folder_path = Path(folder)
+        if not folder_path.exists():
+            continue
+        for ext in extensions:
+            found = folder_path.glob(ext)
+            paths.extend(sorted(found) if sort else found)
+    return paths
+
+
+def get_media_type(file_path):
+    """Retorna o media type baseado na extensão"""
+    return MEDIA_TYPES.get(Path(file_path).suffix.lower(), 'image/jpeg')
+
+
+def sniff_media_type(data):
+    """Media type pelos primeiros bytes (usado para os dados vindos do cache)"""
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:4] == b'GIF8':
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+
+def base64_size(num_bytes):
+    """Tamanho do base64 de num_bytes bytes"""
+    return (num_bytes + 2) // 3 * 4
+
+
+def iter_file_base64(image_path, chunk_size=BASE64_CHUNK_BYTES):
+    """Base64 do arquivo em pedaços (bytes ASCII), lendo via mmap"""
+    if chunk_size % 3:
+        raise ValueError("chunk_size precisa ser múltiplo de 3")
+
+    with open(image_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for start in range(0, len(mm), chunk_size):
+                    yield binascii.b2a_base64(view[start:start + chunk_size], newline=False)
+            finally:
+                view.release()
+
+
+def base64_str(data):
+    """
+    Base64 de um buffer (bytes, mmap, memoryview) como str: codifica direto
+    do buffer, sem cópia dos bytes de entrada; pico de 2x o base64 (bytes
+    ASCII + str), o mínimo para chegar numa str
+    """
+    return binascii.b2a_base64(data, newline=False).decode('ascii')
+
+
+def file_base64(image_path):
+    """Base64 do arquivo como str, codificado direto do mmap (ver base64_str)"""
+    with open(image_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return base64_str(mm)
+
+
+def fit_within(width, height, max_dimension, max_pixels=None):
+    """
+    Dimensões que cabem em max_dimension (e em max_pixels, se informado)
+    mantendo a proporção; None se a imagem já cabe
+    """
+    fits_dimension = width <= max_dimension and height <= max_dimension
+    fits_pixels = max_pixels is None or width * height <= max_pixels
+    if fits_dimension and fits_pixels:
+        return None
+
+    if fits_dimension:
+        new_width, new_height = width, height
+    elif width > height:
+        new_width = max_dimension
+        new_height = int((max_dimension / width) * height)
+    else:
+        new_height = max_dimension
+        new_width = int((max_dimension / height) * width)
+
+    if max_pixels is not None and new_width * new_height > max_pixels:
+        scale = (max_pixels / (new_width * new_height)) ** 0.5
+        new_width = max(1, int(new_width * scale))
+        new_height = max(1, int(new_height * scale))
+
+    return new_width, new_height
+
+
+def estimate_image_tokens(width, height):
+    """Tokens de entrada estimados para uma imagem desse tamanho"""
+    return math.ceil(width * height * TOKENS_PER_PIXEL)
+
+
+def task_pixel_budget(task):
+    """Orçamento de pixels da tarefa (None = só o limite de MAX_DIMENSION)"""
+    if task is None:
+        return None
+    if task not in TASK_PIXEL_BUDGETS:
+        raise ValueError(f"Tarefa desconhecida: {task}")
+    return TASK_PIXEL_BUDGETS[task]
+
+
+def apply_draft(img, size, mode=RESIZE_QUALITY):
+    """
+    No modo rápido, pede ao decodificador JPEG uma escala reduzida que ainda
+    seja >= size. Precisa ser chamado antes de qualquer acesso aos pixels.
+    Não faz nada em outros formatos, no modo de qualidade ou quando a
+    redução é menor que 2x (a menor escala do draft é 1/2).
+    """
+    if mode == RESIZE_FAST and img.format == 'JPEG':
+        img.draft(img.mode, size)
+    return img
+
+
+def downscale(img, size, mode=RESIZE_QUALITY):
+    """
+    Redimensiona para size com LANCZOS; no modo rápido reduz por blocos antes
+    (só quando a redução passa de FAST_REDUCING_GAP; abaixo disso é igual)
+    """
+    if mode not in RESIZE_MODES:
+        raise ValueError(f"Modo de redimensionamento inválido: {mode}")
+
+    if mode == RESIZE_FAST:
+        return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=FAST_REDUCING_GAP)
+    return img.resize(size, Image.Resampling.LANCZOS)
+
+
+def fit_image(img, max_dimension, mode=RESIZE_QUALITY, max_pixels=None):
+    """
+    Redimensiona uma imagem recém-aberta para caber em max_dimension/max_pixels
+    Retorna (imagem, tamanho_original, novo_tamanho ou None)
+    """
+    original_size = img.size
+    new_size = fit_within(*original_size, max_dimension, max_pixels)
+    if new_size is None:
+        return img, original_size, None
+
+    apply_draft(img, new_size, mode)
+    return downscale(img, new_size, mode), original_size, new_size
+
+
+def is_pass_through(image_path, max_dimension=MAX_DIMENSION, max_pixels=None,
+                    max_base64_bytes=MAX_IMAGE_BASE64_BYTES, output_format=FORMAT_SOURCE):
+    """
+    Media type se o arquivo pode ir para a API como está (formato aceito,
+    dentro dos limites); None se precisa ser processado. Só lê o cabeçalho.
+    No formato "auto" só JPEG/WebP passam direto: PNG/GIF tentam recodificar.
+    """
+    width, height, img_format = read_image_header(image_path)
+    if output_format == FORMAT_AUTO and img_format not in LOSSY_FORMATS:
+        return None
+    if (img_format in API_FORMATS
+            and fit_within(width, height, max_dimension, max_pixels) is None
+            and base64_size(os.path.getsize(image_path)) <= max_base64_bytes):
+        return API_FORMATS[img_format]
+    return None
+
+
+def _save(img, img_format, quality):
+    """Salva no formato indicado, convertendo o modo de cor quando o formato exige"""
+    if img_format == 'JPEG' and img.mode not in ('RGB', 'L', 'CMYK'):
+        img = img.convert('RGB')
+    elif img_format == 'GIF':
+        # GIF animado/paleta vira PNG estático, que a API também aceita
+        img_format = 'PNG'
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=img_format, quality=quality)
+    return buffer.getvalue()
+
+
+def has_alpha(img):
+    """True se a imagem tem algum pixel transparente (não só um canal alfa)"""
+    if img.mode == 'P' and 'transparency' in img.info:
+        img = img.convert('RGBA')
+    if img.mode not in ('RGBA', 'LA', 'PA'):
+        return False
+    return img.getchannel('A').getextrema()[0] < 255
+
+
+def _smallest_encoding(img, quality):
+    """(formato, bytes) do menor entre JPEG e WebP; com transparência, só WebP"""
+    if has_alpha(img):
+        candidates, img = ('WEBP',), img.convert('RGBA')
+    else:
+        candidates = ('JPEG', 'WEBP')
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+    encodings = [(img_format, _save(img, img_format, quality)) for img_format in candidates]
+    return min(encodings, key=lambda encoding: len(encoding[1]))
+
+
+def _encode_image_bytes(image_path, max_dimension, quality, mode, max_base64_bytes, max_pixels=None,
+                        output_format=FORMAT_SOURCE):
+    """Sem cache: passa direto ou redimensiona, no formato de origem ou no menor aceito"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Formato de saída inválido: {output_format}")
+
+    with Image.open(image_path) as img:
+        source_format = img.format
+        img_format = source_format if source_format in API_FORMATS else 'JPEG'
+        file_size = Path(image_path).stat().st_size
+        fits = (source_format in API_FORMATS
+                and fit_within(*img.size, max_dimension, max_pixels) is None
+                and base64_size(file_size) <= max_base64_bytes)
+
+        # Caminho rápido: já cabe nos limites e o formato é aceito -> bytes originais
+        if fits and (output_format == FORMAT_SOURCE or source_format in LOSSY_FORMATS):
+            return Path(image_path).read_bytes()
+
+        img, _, _ = fit_image(img, max_dimension, mode, max_pixels)
+        if output_format == FORMAT_AUTO:
+            img_format, data = _smallest_encoding(img, quality)
+            # PNG pequeno (ex.: arte chapada) pode ganhar do JPEG/WebP
+            if fits and file_size <= len(data):
+                return Path(image_path).read_bytes()
+        else:
+            data = _save(img, img_format, quality)
+
+        # Guarda de tamanho: baixa a qualidade e, se preciso, a resolução
+        while base64_size(len(data)) > max_base64_bytes:
+            if img_format in ('JPEG', 'WEBP') and quality > MIN_GUARD_QUALITY:
+                quality -= 10
+            else:
+                new_size = (max(1, int(img.width * 0.75)), max(1, int(img.height * 0.75)))
+                if new_size == img.size:
+                    raise ValueError(f"Não foi possível reduzir {Path(image_path).name} abaixo do limite da API")
+                img = downscale(img, new_size, mode)
+            data = _save(img, img_format, quality)
+
+        return data
+
+
+def encode_image_bytes(image_path, max_dimension=MAX_DIMENSION, quality=JPEG_QUALITY,
+                       mode=RESIZE_QUALITY, max_base64_bytes=MAX_IMAGE_BASE64_BYTES, task=None,
+                       output_format=FORMAT_SOURCE):
+    """
+    Bytes da imagem pronta para a API (com cache em disco)
+    task escolhe o orçamento de pixels (TASK_PIXEL_BUDGETS)
+    """
+    max_pixels = task_pixel_budget(task)
+    return IMAGE_CACHE.get_or_create(
+        image_path, max_dimension, quality, output_format,
+        lambda: _encode_image_bytes(image_path, max_dimension, quality, mode, max_base64_bytes, max_pixels,
+                                    output_format),
+        variant=f"{mode}|{max_base64_bytes}|{max_pixels}"
+    )
+
+
+def resize_and_encode_image(image_path, max_dimension=MAX_DIMENSION, quality=JPEG_QUALITY,
+                            mode=RESIZE_QUALITY, task=None, output_format=FORMAT_SOURCE):
+    """Redimensiona se necessário e converte para base64"""
+    if is_pass_through(image_path, max_dimension, task_pixel_budget(task), output_format=output_format):
+        return file_base64(image_path)
+    image_bytes = encode_image_bytes(image_path, max_dimension, quality, mode, task=task,
+                                     output_format=output_format)
+    return base64_str(image_bytes)
+
+
+def image_block(media_type, image_base64):
+    """Bloco de imagem no formato da API"""
+    return {
+        "type": "image",
+        "source": {
+            "type": "base64",
+            "media_type": media_type,
+            "data": image_base64
+        }
+    }
+
+
+def encode_image_block(image_path, max_dimension=MAX_DIMENSION, quality=JPEG_QUALITY,
+                       mode=RESIZE_QUALITY, task=None, output_format=FORMAT_SOURCE):
+    """Bloco de imagem pronto para a API; o media type segue o formato real dos bytes"""
+    # Passa direto: base64 via mmap, sem cópia do arquivo nem entrada no cache
+    media_type = is_pass_through(image_path, max_dimension, task_pixel_budget(task), output_format=output_format)
+    if media_type:
+        return image_block(media_type, file_base64(image_path))
+
+    image_bytes = encode_image_bytes(image_path, max_dimension, quality, mode, task=task,
+                                     output_format=output_format)
+    return image_block(sniff_media_type(image_bytes), base64_str(image_bytes))
+
+
+def block_size(block):
+    """Tamanho em bytes do base64 de um bloco de imagem"""
+    return len(block["source"]["data"])
+
+
+def block_dimensions(block):
+    """
+    Largura e altura de um bloco de imagem: decodifica só o começo do base64
+    (HEADER_BASE64_PREFIX, crescendo até achar o cabeçalho); a imagem
+    inteira só é decodificada se nem o arquivo completo tiver um cabeçalho
+    conhecido (aí o Pillow decide)
+    """
+    data = block["source"]["data"]
+    prefix = HEADER_BASE64_PREFIX
+    while True:
+        header = read_stream_header(io.BytesIO(binascii.a2b_base64(data[:prefix])))
+        if header is not None:
+            return header[0], header[1]
+        if prefix >= len(data):
+            break
+        prefix *= 4
+    with Image.open(io.BytesIO(binascii.a2b_base64(data))) as img:
+        return img.size
+
+
+def estimate_batch_tokens(blocks):
+    """Tokens de entrada estimados para as imagens de um lote"""
+    return sum(estimate_image_tokens(*block_dimensions(block)) for block in blocks)
+
+
+class PayloadStats:
+    """
+    Bytes enviados vs bytes do arquivo original (ambos em base64)
+    add() devolve a linha da imagem; end_batch() fecha o lote atual
+    """
+
+    def __init__(self):
+        self.images = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self._batch_before = 0
+        self._batch_after = 0
+
+    def add(self, image_path, block):
+        before = base64_size(os.path.getsize(image_path))
+        after = block_size(block)
+        self.images += 1
+        self.bytes_before += before
+        self.bytes_after += after
+        self._batch_before += before
+        self._batch_after += after
+        fmt = block["source"]["media_type"].split('/')[1]
+        return f"{Path(image_path).name}: {before / 1024:.0f} KB -> {after / 1024:.0f} KB ({fmt})"
+
+    @staticmethod
+    def _summary(before, after):
+        saved = (1 - after / before) * 100 if before else 0.0
+        return f"{before / 1024 / 1024:.1f} MB -> {after / 1024 / 1024:.1f} MB ({saved:.0f}% menor)"
+
+    def end_batch(self):
+        line = f"Payload do lote: {self._summary(self._batch_before, self._batch_after)}"
+        self._batch_before = self._batch_after = 0
+        return line
+
+    def report(self):
+        return f"Payload: {self.images} imagens, {self._summary(self.bytes_before, self.bytes_after)}"
+
+
+# Instância compartilhada pelos scripts de análise
+PAYLOAD_STATS = PayloadStats()
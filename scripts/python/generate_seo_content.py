@@ -3,15 +3,28 @@
 """
 GERADOR DE CONTEÚDO SEO
 Cria títulos, descrições e meta tags otimizadas
+
+Uso: python generate_seo_content.py [--batch-api]
+  --batch-api: gera o SEO do catálogo inteiro como Message Batches
+               (assíncrono, metade do preço); rodar de novo retoma o job
 """
 
 import os
 import sys
-import base64
-from pathlib import Path
-from PIL import Image
-import io
-import anthropic
+import json
+from functools import partial
+from image_cache import IMAGE_CACHE
+from image_pool import PREPROCESSOR
+from claude_client import API_STATS, get_client
+from claude_executor import API_EXECUTOR
+from response_cache import RESPONSE_CACHE, request_fingerprint
+from prompt_cache import PROMPT_CACHE_STATS, cached_system
+from usage_ledger import USAGE_LEDGER
+from message_batches import run_batch_job
+from foltz_imaging import (
+    FORMAT_AUTO, PAYLOAD_STATS, RESIZE_QUALITY, TASK_SEO,
+    encode_image_block, estimate_batch_tokens, list_images
+)
 from datetime import datetime
 
 if sys.platform == 'win32':
@@ -20,46 +33,25 @@ if sys.platform == 'win32':
 from dotenv import load_dotenv
 load_dotenv()
 
-MAX_DIMENSION = 2000
+RESIZE_MODE = RESIZE_QUALITY  # RESIZE_FAST troca qualidade por velocidade
+IMAGE_TASK = TASK_SEO  # orçamento de pixels/tokens por imagem (ver foltz_imaging)
+OUTPUT_FORMAT = FORMAT_AUTO  # menor entre JPEG/WebP; FORMAT_SOURCE mantém o formato original
 IMAGE_FOLDERS = ["seedream", "id_visual"]
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 BATCH_SIZE = 5
 
-def resize_and_encode_image(image_path, max_dimension=MAX_DIMENSION):
-    """Redimensiona e codifica imagem"""
-    with Image.open(image_path) as img:
-        width, height = img.size
-
-        if width > max_dimension or height > max_dimension:
-            if width > height:
-                new_width = max_dimension
-                new_height = int((max_dimension / width) * height)
-            else:
-                new_height = max_dimension
-                new_width = int((max_dimension / height) * width)
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-        buffer = io.BytesIO()
-        img.save(buffer, format=img.format or 'JPEG', quality=90)
-        return base64.b64encode(buffer.getvalue()).decode('utf-8')
-
-def get_media_type(file_path):
-    """Retorna media type"""
-    ext = file_path.suffix.lower()
-    return {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
-            '.gif': 'image/gif', '.webp': 'image/webp'}.get(ext, 'image/jpeg')
-
-def generate_seo_content(images, image_names):
-    """Gera conteúdo SEO com Claude"""
-    if not ANTHROPIC_API_KEY:
-        print("ERRO: ANTHROPIC_API_KEY não encontrada")
-        return None
+# Modo --batch-api: catálogo inteiro, um modelo só (sem fallback)
+BATCH_API_JOB = "conteudo_seo"
+BATCH_API_MODEL = "claude-3-haiku-20240307"
+BATCH_API_MAX_TOKENS = 4000
 
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+# Função de codificação enviada aos workers do pool
+ENCODE_IMAGE = partial(encode_image_block, mode=RESIZE_MODE, task=IMAGE_TASK, output_format=OUTPUT_FORMAT)
 
-    prompt = f"""Você é um especialista em SEO para e-commerce de jerseys de futebol.
+# Instruções fixas: vão no system com cache_control (prompt_cache)
+SEO_SYSTEM_PROMPT = """Você é um especialista em SEO para e-commerce de jerseys de futebol.
 
-Analise estas {len(images)} imagens e gere conteúdo SEO OTIMIZADO para cada uma.
+Analise as imagens enviadas e gere conteúdo SEO OTIMIZADO para cada uma.
 
 Para CADA IMAGEM, forneça:
 
@@ -114,19 +106,19 @@ Para CADA IMAGEM, forneça:
 ### SCHEMA MARKUP (JSON-LD)
 
 ```json
-{{
+{
   "@context": "https://schema.org/",
   "@type": "Product",
   "name": "[Nome do Produto]",
   "image": "[URL da imagem]",
   "description": "[Descrição]",
   "brand": "Foltz Fanwear",
-  "offers": {{
+  "offers": {
     "@type": "Offer",
     "price": "[preço]",
     "priceCurrency": "ARS"
-  }}
-}}
+  }
+}
 ```
 
 ### ALT TEXT PARA IMAGENS
@@ -144,96 +136,239 @@ Para CADA IMAGEM, forneça:
 Use palavras-chave naturalmente. Foque em intenção de busca comercial.
 """
 
+def build_seo_prompt(num_images, image_names):
+    """Parte variável do prompt de SEO de um lote (vai depois do system em cache)"""
+    return f"{num_images} imagens, nesta ordem: {', '.join(image_names)}."
+
+def generate_seo_content(images, image_names):
+    """Gera conteúdo SEO com Claude"""
+    if not ANTHROPIC_API_KEY:
+        print("ERRO: ANTHROPIC_API_KEY não encontrada")
+        return None
+
+    client = get_client(ANTHROPIC_API_KEY)
+
+    prompt = build_seo_prompt(len(images), image_names)
     content = [{"type": "text", "text": prompt}] + images
 
     print(f"\nEnviando {len(images)} imagens para análise SEO...")
+    print(f"  Tokens de imagem estimados: ~{estimate_batch_tokens(images)}")
+    print(f"  {PAYLOAD_STATS.end_batch()}")
 
-    try:
-        models = ["claude-3-opus-20240229", "claude-3-sonnet-20240229", "claude-3-haiku-20240307"]
-
-        for model in models:
-            try:
-                print(f"  Tentando: {model}")
-                message = client.messages.create(
-                    model=model,
-                    max_tokens=8000,
-                    messages=[{"role": "user", "content": content}]
-                )
-                print(f"  ✓ Sucesso!")
-                return message.content[0].text
-            except Exception as e:
-                print(f"  X Falhou: {str(e)[:50]}")
-                continue
+    models = ["claude-3-opus-20240229", "claude-3-sonnet-20240229", "claude-3-haiku-20240307"]
 
-        return None
+    fingerprint = request_fingerprint(prompt, images, system=SEO_SYSTEM_PROMPT)
+    cached, model = RESPONSE_CACHE.get_any(models, fingerprint, 8000)
+    if cached is not None:
+        print(f"  ♻️  Resposta em cache ({model})")
+        return cached
+
+    try:
+        message, model = API_EXECUTOR.create(
+            client, models, 8000,
+            system=cached_system(SEO_SYSTEM_PROMPT, model=models[0]),
+            messages=[{"role": "user", "content": content}]
+        )
+        PROMPT_CACHE_STATS.add(message.usage)
+        print(f"  ✓ Sucesso com: {model}")
+        print(f"  {USAGE_LEDGER.last()}")
+        print(f"  {API_STATS.last()}")
+        text = message.content[0].text
+        RESPONSE_CACHE.put(model, fingerprint, 8000, text)
+        return text
 
     except Exception as e:
         print(f"\nERRO: {e}")
         return None
 
-def main():
-    print("="*70)
-    print("GERADOR DE CONTEÚDO SEO".center(70))
-    print("="*70)
-
-    # Coleta imagens
+def render_seo(records):
+    """
+    Markdown no formato do SEO_SYSTEM_PROMPT a partir de registros
+    estruturados com o bloco seo (modo --seo de analyze_products_complete)
+    """
+    sections = []
+    for record in records:
+        seo = record["seo"]
+        schema = {
+            "@context": "https://schema.org/",
+            "@type": "Product",
+            "name": record.get("product_name", ""),
+            "image": record.get("filename", ""),
+            "description": record.get("short_description", ""),
+            "brand": "Foltz Fanwear",
+            "offers": {"@type": "Offer", "price": str(record.get("price_ars", "")), "priceCurrency": "ARS"},
+        }
+        lines = [
+            "---",
+            f"**IMAGEM: {record.get('filename', '')}**",
+            "",
+            "### SEO METADATA",
+            "",
+            f"**Title Tag (máx 60 caracteres):**\n{seo.get('title_tag', '')}",
+            "",
+            f"**Meta Description (máx 155 caracteres):**\n{seo.get('meta_description', '')}",
+            "",
+            f"**URL Slug:**\n{seo.get('url_slug', '')}",
+            "",
+            f"**H1 (Título da Página):**\n{seo.get('h1', '')}",
+            "",
+            "**H2 Sugeridos (3-5):**",
+            *[f"{i}. {h2}" for i, h2 in enumerate(seo.get("h2", []), 1)],
+            "",
+            "### PALAVRAS-CHAVE",
+            "",
+            f"**Palavra-chave Principal:**\n{seo.get('primary_keyword', '')}",
+            "",
+            "**Palavras-chave Secundárias (5-10):**",
+            *[f"- {keyword}" for keyword in seo.get("secondary_keywords", [])],
+            "",
+            "**Long-tail Keywords (5-10):**",
+            *[f"- {keyword}" for keyword in seo.get("long_tail_keywords", [])],
+            "",
+            "### TEXTO SEO (300-500 palavras)",
+            "",
+            seo.get("seo_text", ""),
+            "",
+            "### SCHEMA MARKUP (JSON-LD)",
+            "",
+            "```json",
+            json.dumps(schema, ensure_ascii=False, indent=2),
+            "```",
+            "",
+            "### ALT TEXT PARA IMAGENS",
+            "",
+            f"**Alt Text Principal:**\n{seo.get('alt_text', '')}",
+            "",
+            "**Alt Text Variações (3):**",
+            *[f"{i}. {alt}" for i, alt in enumerate(seo.get("alt_text_variations", []), 1)],
+            "",
+        ]
+        sections.append("\n".join(lines))
+    return "\n".join(sections) + "---\n"
+
+def save_seo_content(result, batch_number=None):
+    """Salva o conteúdo gerado; no modo --batch-api, um arquivo por lote"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if batch_number is None:
+        output_file = f"conteudo_seo_{timestamp}.txt"
+    else:
+        output_file = f"conteudo_seo_lote_{batch_number}_{timestamp}.txt"
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write("CONTEÚDO SEO - FOLTZ FANWEAR\n")
+        f.write(f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
+        f.write("="*70 + "\n\n")
+        f.write(result)
+
+    return output_file
+
+def encode_paths(paths, limit=None):
+    """
+    Codifica em paralelo no pool de processos, preservando a ordem
+    limit: para quando limit imagens deram certo; as que falham são
+    repostas pelas seguintes da lista (só o que falta vai para o pool)
+    """
     images = []
     image_names = []
+    current_folder = None
+    paths = list(paths)
+    position = 0
+
+    while position < len(paths) and (limit is None or len(images) < limit):
+        end = len(paths) if limit is None else position + limit - len(images)
+        chunk = paths[position:end]
+        position = end
+        for img_path, block, error in PREPROCESSOR.map(ENCODE_IMAGE, chunk):
+            if img_path.parent != current_folder:
+                current_folder = img_path.parent
+                print(f"\nProcessando: {current_folder}")
+
+            if error:
+                print(f"  {img_path.name}")
+                print(f"  ERRO: {error}")
+                continue
 
-    for folder in IMAGE_FOLDERS:
-        folder_path = Path(folder)
-        if not folder_path.exists():
-            continue
+            print(f"  {PAYLOAD_STATS.add(img_path, block)}")
+            images.append(block)
+            image_names.append(img_path.name)
 
-        print(f"\nProcessando: {folder}")
+    return images, image_names
 
-        for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp']:
-            for img_path in sorted(folder_path.glob(ext)):
-                if len(images) >= BATCH_SIZE:
-                    break
+def run_batch_api():
+    """SEO do catálogo inteiro via Message Batches, um arquivo por lote"""
+    if not ANTHROPIC_API_KEY:
+        print("ERRO: ANTHROPIC_API_KEY não encontrada")
+        return
 
-                try:
-                    print(f"  {img_path.name}")
-                    image_base64 = resize_and_encode_image(img_path)
+    paths = list_images(IMAGE_FOLDERS)
+    chunks = [paths[i:i + BATCH_SIZE] for i in range(0, len(paths), BATCH_SIZE)]
+    print(f"{len(paths)} imagens em {len(chunks)} lotes de até {BATCH_SIZE}")
 
-                    images.append({
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": get_media_type(img_path),
-                            "data": image_base64
-                        }
-                    })
-                    image_names.append(img_path.name)
+    def requests_for(job):
+        # custom_id fixo por lote: é o que permite retomar sem reenviar
+        for batch_number, chunk in enumerate(chunks, 1):
+            custom_id = f"seo-{batch_number}"
+            if job.is_submitted(custom_id):
+                continue
+            images, image_names = encode_paths(chunk)
+            if not images:
+                continue
+            content = [{"type": "text", "text": build_seo_prompt(len(images), image_names)}] + images
+            yield custom_id, {
+                "model": BATCH_API_MODEL,
+                "max_tokens": BATCH_API_MAX_TOKENS,
+                "system": cached_system(SEO_SYSTEM_PROMPT, model=BATCH_API_MODEL),
+                "messages": [{"role": "user", "content": content}],
+            }
+
+    def on_result(custom_id, text, error):
+        batch_number = int(custom_id.split("-")[1])
+        if text:
+            print(f"  ✓ Lote {batch_number}: {save_seo_content(text, batch_number)}")
+        else:
+            print(f"  ✗ Lote {batch_number} falhou: {error}")
+
+    client = get_client(ANTHROPIC_API_KEY)
+    job = run_batch_job(client, BATCH_API_JOB, requests_for, on_result)
+    print(f"\n{job.report()}")
+    print(IMAGE_CACHE.report())
+    print(PAYLOAD_STATS.report())
+    print(API_STATS.report())
+    print(USAGE_LEDGER.report())
 
-                except Exception as e:
-                    print(f"  ERRO: {e}")
+def main():
+    if "--batch-api" in sys.argv:
+        print("="*70)
+        print("GERADOR DE CONTEÚDO SEO - MESSAGE BATCHES API".center(70))
+        print("="*70)
+        run_batch_api()
+        return
 
-            if len(images) >= BATCH_SIZE:
-                break
+    print("="*70)
+    print("GERADOR DE CONTEÚDO SEO".center(70))
+    print("="*70)
 
-        if len(images) >= BATCH_SIZE:
-            break
+    # Coleta imagens
+    paths = list_images(IMAGE_FOLDERS)
+
+    # Até BATCH_SIZE imagens boas: uma que falha é trocada pela próxima da lista
+    images, image_names = encode_paths(paths, limit=BATCH_SIZE)
 
     if not images:
         print("\nNenhuma imagem encontrada!")
         return
 
     print(f"\n{len(images)} imagens processadas")
+    print(IMAGE_CACHE.report())
+    print(PAYLOAD_STATS.report())
+    print(PREPROCESSOR.report())
 
     # Gera conteúdo SEO
     result = generate_seo_content(images, image_names)
 
     if result:
         # Salva resultado
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f"conteudo_seo_{timestamp}.txt"
-
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("CONTEÚDO SEO - FOLTZ FANWEAR\n")
-            f.write(f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
-            f.write("="*70 + "\n\n")
-            f.write(result)
+        output_file = save_seo_content(result)
 
         print("\n" + "="*70)
         print(f"✓ Conteúdo SEO gerado!")
@@ -242,5 +377,11 @@ def main():
     else:
         print("\nFalha ao gerar conteúdo")
 
+    print(RESPONSE_CACHE.report())
+    print(API_STATS.report())
+    print(API_EXECUTOR.report())
+    print(PROMPT_CACHE_STATS.report())
+    print(USAGE_LEDGER.report())
+
 if __name__ == "__main__":
     main()
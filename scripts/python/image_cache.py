@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CACHE DE IMAGENS PROCESSADAS
+Guarda em disco as imagens já redimensionadas/recodificadas para a API
+
+A chave é o hash SHA-256 do conteúdo do arquivo + dimensão máxima +
+qualidade + formato de saída. Rodar o pipeline de novo sobre um catálogo
+sem alterações não decodifica nenhuma imagem: só lê os bytes para o hash.
+"""
+
+import os
+import hashlib
+import threading
+from pathlib import Path
+
+IMAGE_CACHE_DIR = os.environ.get("FOLTZ_IMAGE_CACHE_DIR", ".cache_imagens")
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("FOLTZ_IMAGE_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+IMAGE_CACHE_ENABLED = os.environ.get("FOLTZ_IMAGE_CACHE", "1") != "0"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(image_path):
+    """Hash SHA-256 do conteúdo do arquivo (lido em blocos, sem decodificar)"""
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """
+    Cache em disco com despejo LRU limitado por tamanho
+
+    Cada entrada é um arquivo <dir>/<2 primeiros chars>/<chave>.bin.
+    O mtime do arquivo marca o último acesso, então o LRU sobrevive entre
+    execuções sem precisar de um índice separado.
+    """
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES, enabled=IMAGE_CACHE_ENABLED):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self._total_bytes = None
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, image_path, max_dimension, quality, output_format, variant=None):
+        """Monta a chave: hash do conteúdo + parâmetros de saída"""
+        stat = os.stat(image_path)
+        memo_key = (str(image_path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self._hashes.get(memo_key)
+        if content_hash is None:
+            content_hash = file_sha256(image_path)
+            self._hashes[memo_key] = content_hash
+
+        params = f"{content_hash}|{max_dimension}|{quality}|{output_format}|{variant}"
+        return hashlib.sha256(params.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.bin"
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        return list(self.cache_dir.glob("*/*.bin"))
+
+    def get(self, key):
+        """Retorna os bytes em cache ou None"""
+        entry = self._entry_path(key)
+        try:
+            data = entry.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        # Atualiza o "último acesso" para o LRU
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """Grava uma entrada de forma atômica e despeja as mais antigas se necessário"""
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = entry.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, entry)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(p.stat().st_size for p in self._entries())
+            else:
+                self._total_bytes += len(data)
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove as entradas menos usadas até caber no limite"""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        self._total_bytes = total
+
+    def get_or_create(self, image_path, max_dimension, quality, output_format, producer, variant=None):
+        """
+        Retorna os bytes processados da imagem
+        Só chama producer() (que decodifica/redimensiona) quando não há cache
+        variant distingue outras opções que mudam a saída (ex.: modo de redimensionamento)
+        """
+        if not self.enabled:
+            return producer()
+
+        key = self.make_key(image_path, max_dimension, quality, output_format, variant)
+        data = self.get(key)
+
+        if data is not None:
+            self.hits += 1
+            self.bytes_saved += len(data)
+            return data
+
+        self.misses += 1
+        data = producer()
+        self.put(key, data)
+        return data
+
+    def stats(self):
+        """Estatísticas da execução atual"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups * 100) if lookups else 0.0,
+            'evictions': self.evictions,
+            'bytes_saved': self.bytes_saved,
+        }
+
+    def report(self):
+        """Resumo legível das estatísticas"""
+        s = self.stats()
+        return (f"Cache de imagens: {s['hits']} hits, {s['misses']} misses "
+                f"({s['hit_rate']:.1f}%), {s['evictions']} despejadas, "
+                f"{s['bytes_saved'] / 1024 / 1024:.1f} MB servidos do cache")
+
+
+# Instância compartilhada pelos scripts de análise
+IMAGE_CACHE = ImageCache()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DEDUPLICAÇÃO PERCEPTUAL ANTES DO ENVIO
+seedream/ e id_visual/ têm muitas renderizações quase iguais (mesma
+jersey, outro recorte ou fundo); cada uma era cobrada como imagem à parte
+
+- Hashes perceptuais de 64 bits por imagem: dHash (gradiente horizontal
+  em 9x8) e pHash (sinal dos coeficientes de DCT 8x8 de baixa frequência
+  em 32x32), calculados no pool de processos e guardados em
+  .hashes_imagens.json (só recalcula se tamanho/mtime mudaram)
+- Os hashes só veem brilho (imagem 'L'): camisa titular e reserva do mesmo
+  molde podem cair dentro do limite. Por isso cada imagem também tem uma
+  assinatura de cor (histograma de COLOR_BINS faixas por canal RGB, em
+  32x32), guardada junto no cache
+- Duas imagens são duplicatas quando os DOIS hashes estão a no máximo
+  DEDUPE_THRESHOLD bits de distância (Hamming) E a distância de cor (maior
+  diferença entre os histogramas de um canal, de 0 a 1) não passa de
+  DEDUPE_COLOR_THRESHOLD
+- Grupos por líder: cada imagem entra no primeiro grupo cujo líder está
+  dentro do limite (sem encadear A~B~C); o representante enviado é a de
+  maior resolução do grupo
+- O script envia só os representantes e copia a resposta para as
+  duplicatas (fan-out)
+
+Desligada por padrão (a resposta copiada não é conferida): FOLTZ_DEDUPE=1
+liga; FOLTZ_DEDUPE_THRESHOLD e FOLTZ_DEDUPE_COLOR_THRESHOLD ajustam os limites.
+Comparação O(n²) entre líderes: folgado para alguns milhares de imagens.
+"""
+
+import os
+import json
+import math
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from image_pool import PREPROCESSOR
+
+DEDUPE_ENABLED = os.environ.get("FOLTZ_DEDUPE", "0") == "1"
+DEDUPE_THRESHOLD = int(os.environ.get("FOLTZ_DEDUPE_THRESHOLD", "8"))
+DEDUPE_COLOR_THRESHOLD = float(os.environ.get("FOLTZ_DEDUPE_COLOR_THRESHOLD", "0.15"))
+HASH_CACHE_PATH = os.environ.get("FOLTZ_HASH_CACHE", ".hashes_imagens.json")
+HASH_CACHE_VERSION = 2
+
+DHASH_SIZE = 8
+PHASH_SIZE = 32       # imagem reduzida para a DCT
+PHASH_LOW = 8         # coeficientes de baixa frequência usados
+COLOR_SIZE = 32       # imagem reduzida para o histograma de cor
+COLOR_BINS = 8        # faixas por canal
+
+# cos((2x + 1) u pi / 2N) para u < PHASH_LOW: só a parte da DCT que o hash usa
+_DCT_TABLE = [[math.cos((2 * x + 1) * u * math.pi / (2 * PHASH_SIZE)) for x in range(PHASH_SIZE)]
+              for u in range(PHASH_LOW)]
+
+
+def dhash(gray):
+    """64 bits: cada pixel é mais claro que o vizinho da direita? (imagem 'L')"""
+    small = gray.resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for y in range(DHASH_SIZE):
+        row = pixels[y * (DHASH_SIZE + 1):(y + 1) * (DHASH_SIZE + 1)]
+        for x in range(DHASH_SIZE):
+            bits = (bits << 1) | (row[x] > row[x + 1])
+    return bits
+
+
+def phash(gray):
+    """64 bits: coeficientes DCT 8x8 acima da mediana (sem o DC) (imagem 'L')"""
+    small = gray.resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    rows = [pixels[y * PHASH_SIZE:(y + 1) * PHASH_SIZE] for y in range(PHASH_SIZE)]
+
+    # DCT separável: linhas (só u < 8), depois colunas (só v < 8)
+    row_dct = [[sum(c * p for c, p in zip(cosines, row)) for cosines in _DCT_TABLE] for row in rows]
+    coefficients = [
+        sum(_DCT_TABLE[v][y] * row_dct[y][u] for y in range(PHASH_SIZE))
+        for v in range(PHASH_LOW) for u in range(PHASH_LOW)
+    ]
+    median = sorted(coefficients[1:])[len(coefficients[1:]) // 2]
+    bits = 0
+    for value in coefficients:
+        bits = (bits << 1) | (value > median)
+    return bits
+
+
+def color_signature(rgb):
+    """COLOR_BINS frações por canal R, G, B (cada canal soma 1) (imagem 'RGB')"""
+    small = rgb.resize((COLOR_SIZE, COLOR_SIZE), Image.Resampling.BILINEAR)
+    histogram = small.histogram()  # 256 contagens por canal
+    pixels = COLOR_SIZE * COLOR_SIZE
+    width = 256 // COLOR_BINS
+    return [round(sum(histogram[channel * 256 + b * width:channel * 256 + (b + 1) * width]) / pixels, 4)
+            for channel in range(3) for b in range(COLOR_BINS)]
+
+
+def perceptual_hashes(image_path):
+    """(dhash, phash, pixels, cor) de uma imagem; roda nos workers do pool"""
+    with Image.open(image_path) as img:
+        width, height = img.size
+        img.draft('RGB', (PHASH_SIZE * 2, PHASH_SIZE * 2))  # JPEG: decodifica já reduzido
+        rgb = img.convert('RGB')
+    gray = rgb.convert('L')
+    return dhash(gray), phash(gray), width * height, color_signature(rgb)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def color_distance(a, b):
+    """Maior distância entre os histogramas de um canal (0 = iguais, 1 = disjuntos)"""
+    return max(sum(abs(x - y) for x, y in zip(a[c:c + COLOR_BINS], b[c:c + COLOR_BINS])) / 2
+               for c in range(0, 3 * COLOR_BINS, COLOR_BINS))
+
+
+class ImageDeduper:
+    """
+    group(paths) -> (representantes, {representante: [duplicatas]})
+    Os representantes saem na ordem em que o grupo apareceu em paths.
+    """
+
+    def __init__(self, threshold=DEDUPE_THRESHOLD, cache_path=HASH_CACHE_PATH, enabled=DEDUPE_ENABLED,
+                 preprocessor=PREPROCESSOR, color_threshold=DEDUPE_COLOR_THRESHOLD):
+        self.threshold = threshold
+        self.color_threshold = color_threshold
+        self.cache_path = Path(cache_path)
+        self.enabled = enabled
+        self.preprocessor = preprocessor
+        self.cache = self._load()
+        self.hashed = 0
+        self.images = 0
+        self.groups = 0
+        self.duplicates = 0
+        self.color_rejected = 0
+        self.seconds = 0.0
+
+    def _load(self):
+        try:
+            cache = json.loads(self.cache_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return {}
+        return cache.get("files", {}) if cache.get("version") == HASH_CACHE_VERSION else {}
+
+    def _save(self):
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"version": HASH_CACHE_VERSION, "files": self.cache}), encoding='utf-8')
+        os.replace(tmp_path, self.cache_path)
+
+    def hashes(self, paths):
+        """{caminho: (dhash, phash, pixels, cor)}; imagens que não abrem ficam de fora"""
+        result = {}
+        missing = []
+        for image_path in paths:
+            try:
+                stat = os.stat(image_path)
+            except OSError:
+                continue
+            known = self.cache.get(str(image_path))
+            if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime_ns:
+                result[image_path] = (known["dhash"], known["phash"], known["pixels"], known["color"])
+            else:
+                missing.append((image_path, stat))
+
+        if missing:
+            outputs = self.preprocessor.map(perceptual_hashes, [image_path for image_path, _ in missing])
+            for (image_path, stat), (_, hashes, error) in zip(missing, outputs):
+                if error:
+                    continue  # quem codifica a imagem depois registra o erro
+                result[image_path] = hashes
+                self.cache[str(image_path)] = {"size": stat.st_size, "mtime": stat.st_mtime_ns,
+                                               "dhash": hashes[0], "phash": hashes[1], "pixels": hashes[2],
+                                               "color": hashes[3]}
+            self.hashed += len(missing)
+            self._save()
+        return result
+
+    def group(self, paths):
+        paths = list(paths)
+        if not self.enabled or len(paths) < 2:
+            return paths, {}
+
+        start = time.perf_counter()
+        hashes = self.hashes(paths)
+        groups = []   # [(hashes do líder, [caminhos])]
+        for image_path in paths:
+            image_hashes = hashes.get(image_path)
+            if image_hashes is None:
+                groups.append((None, [image_path]))  # sem hash: vai sozinha
+                continue
+            for leader, members in groups:
+                if (leader is not None and hamming(leader[0], image_hashes[0]) <= self.threshold
+                        and hamming(leader[1], image_hashes[1]) <= self.threshold):
+                    if color_distance(leader[3], image_hashes[3]) <= self.color_threshold:
+                        members.append(image_path)
+                        break
+                    self.color_rejected += 1  # mesmo desenho, outra cor (ex.: titular x reserva)
+            else:
+                groups.append((image_hashes, [image_path]))
+
+        representatives = []
+        duplicates = {}
+        for _, members in groups:
+            # Maior resolução representa o grupo (empate: a primeira)
+            representative = max(members, key=lambda p: hashes[p][2] if p in hashes else 0)
+            representatives.append(representative)
+            others = [p for p in members if p != representative]
+            if others:
+                duplicates[representative] = others
+
+        self.images += len(paths)
+        self.groups += len(groups)
+        self.duplicates += len(paths) - len(groups)
+        self.seconds += time.perf_counter() - start
+        return representatives, duplicates
+
+    def report(self):
+        if not self.enabled:
+            return "Deduplicação: desligada (FOLTZ_DEDUPE=1 liga)"
+        saved = self.duplicates / self.images * 100 if self.images else 0.0
+        return (f"Deduplicação: {self.images} imagens em {self.groups} grupos; "
+                f"{self.duplicates} imagens a menos na API ({saved:.1f}%), "
+                f"{self.color_rejected} pares separados pela cor, "
+                f"{self.hashed} hashes calculados em {self.seconds:.1f}s "
+                f"(limites {self.threshold} bits, cor {self.color_threshold:.2f})")
+
+
+# Instância compartilhada pelos scripts de análise
+DEDUPER = ImageDeduper()
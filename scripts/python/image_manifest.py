@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MANIFESTO DE DIMENSÕES DAS IMAGENS
+Lê só o cabeçalho de cada imagem (sem decodificar pixels) em paralelo e
+guarda caminho, tamanho, mtime, largura, altura e formato num JSON
+
+Nas execuções seguintes só são relidos os arquivos novos ou cujo mtime ou
+tamanho mudou; o resto vem do manifesto sem abrir o arquivo.
+"""
+
+import os
+import json
+import struct
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+MANIFEST_PATH = os.environ.get("FOLTZ_IMAGE_MANIFEST", ".manifesto_imagens.json")
+SCAN_FOLDERS = ["seedream", "id_visual", "Leagues"]
+SCAN_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+SCAN_WORKERS = int(os.environ.get("FOLTZ_SCAN_WORKERS", "0")) or min(32, (os.cpu_count() or 1) * 4)
+MANIFEST_VERSION = 1
+
+# Marcadores SOF do JPEG (C4, C8 e CC não são quadros)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f):
+    """Percorre os segmentos até o SOF; pula EXIF/ICC sem ler o conteúdo"""
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # marcadores sem comprimento
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if marker in JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and head[20:21] == b'\x2f':
+        bits = int.from_bytes(head[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        width = int.from_bytes(head[24:27], 'little') + 1
+        height = int.from_bytes(head[27:30], 'little') + 1
+        return width, height
+    return None
+
+
+def read_stream_header(f):
+    """
+    (largura, altura, formato) do cabeçalho de um arquivo binário aberto
+    (ou BytesIO com só o começo da imagem); None se o formato é desconhecido
+    ou o cabeçalho não está nos bytes disponíveis
+    """
+    head = f.read(32)
+    size = None
+    if head[:3] == b'\xff\xd8\xff':
+        img_format, size = 'JPEG', _jpeg_size(f)
+    elif head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+        img_format, size = 'PNG', struct.unpack('>II', head[16:24])
+    elif head[:6] in (b'GIF87a', b'GIF89a'):
+        img_format, size = 'GIF', struct.unpack('<HH', head[6:10])
+    elif head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        img_format, size = 'WEBP', _webp_size(head)
+    if size is None:
+        return None
+    return size[0], size[1], img_format
+
+
+def read_image_header(image_path):
+    """
+    (largura, altura, formato) lendo só o cabeçalho
+    Formatos desconhecidos caem no Image.open do Pillow, que também é lazy
+    """
+    with open(image_path, 'rb') as f:
+        header = read_stream_header(f)
+    if header is None:
+        with Image.open(image_path) as img:
+            return img.width, img.height, img.format
+    return header
+
+
+def find_images(folders=SCAN_FOLDERS, extensions=SCAN_EXTENSIONS):
+    """Imagens das pastas, incluindo subpastas (Leagues/<liga>/<time>/...)"""
+    paths = []
+    for folder in folders:
+        folder_path = Path(folder)
+        if folder_path.exists():
+            paths.extend(p for p in folder_path.rglob("*")
+                         if p.suffix.lower() in extensions and p.is_file())
+    return sorted(paths)
+
+
+def _scan_one(image_path):
+    """Executa na thread: stat + cabeçalho; devolve (caminho, entrada, erro)"""
+    try:
+        stat = os.stat(image_path)
+        width, height, img_format = read_image_header(image_path)
+        entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "width": width,
+            "height": height,
+            "format": img_format,
+        }
+        return image_path, entry, None
+    except Exception as e:
+        return image_path, None, str(e)
+
+
+class ImageManifest:
+    """
+    Manifesto {caminho: {size, mtime, width, height, format}} salvo em JSON
+
+    scan() revalida pelo stat (mtime em ns + tamanho) e só relê o cabeçalho
+    do que mudou; prune() tira os arquivos que sumiram do disco.
+    """
+
+    def __init__(self, manifest_path=MANIFEST_PATH, workers=SCAN_WORKERS):
+        self.manifest_path = Path(manifest_path)
+        self.workers = max(1, workers)
+        self.entries = self._load()
+        self.reused = 0
+        self.scanned = 0
+        self.errors = {}
+        self.seconds = 0.0
+
+    def _load(self):
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return {}
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def save(self):
+        """Grava o manifesto de forma atômica"""
+        tmp_path = self.manifest_path.with_suffix(self.manifest_path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps({"version": MANIFEST_VERSION, "entries": self.entries},
+                                       ensure_ascii=False, indent=1), encoding='utf-8')
+        os.replace(tmp_path, self.manifest_path)
+
+    def _is_fresh(self, key, image_path):
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return False
+        return entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns
+
+    def scan(self, image_paths):
+        """
+        Atualiza o manifesto para image_paths e devolve [(caminho, entrada)]
+        na ordem de entrada; arquivos com erro ficam em self.errors
+        """
+        start = time.perf_counter()
+        image_paths = [Path(p) for p in image_paths]
+        keys = [str(p) for p in image_paths]
+
+        stale = [p for p, key in zip(image_paths, keys) if not self._is_fresh(key, p)]
+        self.reused += len(image_paths) - len(stale)
+        self.scanned += len(stale)
+
+        if len(stale) > 1 and self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(_scan_one, stale))
+        else:
+            results = [_scan_one(p) for p in stale]
+
+        for image_path, entry, error in results:
+            key = str(image_path)
+            if error:
+                self.errors[key] = error
+                self.entries.pop(key, None)
+            else:
+                self.entries[key] = entry
+
+        self.seconds += time.perf_counter() - start
+        return [(p, self.entries[key]) for p, key in zip(image_paths, keys) if key in self.entries]
+
+    def prune(self):
+        """Remove do manifesto os arquivos que não existem mais"""
+        missing = [key for key in self.entries if not os.path.exists(key)]
+        for key in missing:
+            del self.entries[key]
+        return len(missing)
+
+    def report(self):
+        return (f"Manifesto: {self.scanned} cabeçalhos lidos, {self.reused} reaproveitados, "
+                f"{len(self.errors)} erros em {self.seconds:.2f}s")
+
+
+def scan_images(folders=SCAN_FOLDERS, manifest_path=MANIFEST_PATH, workers=SCAN_WORKERS):
+    """Varre as pastas, atualiza e salva o manifesto; devolve o ImageManifest"""
+    manifest = ImageManifest(manifest_path, workers)
+    manifest.scan(find_images(folders))
+    manifest.prune()
+    manifest.save()
+    return manifest
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PRÉ-PROCESSAMENTO PARALELO DE IMAGENS
+Decodifica/redimensiona/codifica em um pool de processos, mantendo a ordem
+"""
+
+import os
+import time
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+
+from image_cache import IMAGE_CACHE
+
+# 0 ou vazio = um worker por núcleo; 1 = serial no próprio processo
+IMAGE_WORKERS = int(os.environ.get("FOLTZ_IMAGE_WORKERS", "0")) or (os.cpu_count() or 1)
+
+
+def _prepare_one(encode_fn, image_path):
+    """
+    Executa no worker: codifica uma imagem e devolve as estatísticas de cache
+    geradas neste processo para serem somadas no processo principal
+    """
+    before = (IMAGE_CACHE.hits, IMAGE_CACHE.misses, IMAGE_CACHE.bytes_saved)
+    try:
+        data, error = encode_fn(image_path), None
+    except Exception as e:
+        data, error = None, str(e)
+    after = (IMAGE_CACHE.hits, IMAGE_CACHE.misses, IMAGE_CACHE.bytes_saved)
+    cache_delta = tuple(a - b for a, b in zip(after, before))
+    return image_path, data, error, cache_delta
+
+
+class ImagePreprocessor:
+    """
+    Pool de processos reaproveitado entre lotes
+
+    map() devolve [(caminho, dados, erro)] na mesma ordem da entrada;
+    dados é o retorno de encode_fn (ou None se deu erro).
+    """
+
+    def __init__(self, workers=IMAGE_WORKERS):
+        self.workers = max(1, workers)
+        self.images = 0
+        self.seconds = 0.0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def map(self, encode_fn, image_paths):
+        image_paths = list(image_paths)
+        parallel = self.workers > 1 and len(image_paths) > 1
+        start = time.perf_counter()
+
+        if not parallel:
+            outputs = [_prepare_one(encode_fn, p) for p in image_paths]
+        else:
+            outputs = self._get_executor().map(
+                _prepare_one,
+                [encode_fn] * len(image_paths),
+                image_paths,
+            )
+
+        results = []
+        for image_path, data, error, (hits, misses, bytes_saved) in outputs:
+            if parallel:
+                # Só o processo principal imprime o relatório do cache
+                IMAGE_CACHE.hits += hits
+                IMAGE_CACHE.misses += misses
+                IMAGE_CACHE.bytes_saved += bytes_saved
+            results.append((image_path, data, error))
+
+        self.images += len(image_paths)
+        self.seconds += time.perf_counter() - start
+        return results
+
+    def throughput(self):
+        """Imagens por segundo acumuladas nesta execução"""
+        return self.images / self.seconds if self.seconds else 0.0
+
+    def report(self):
+        return (f"Pré-processamento: {self.images} imagens em {self.seconds:.1f}s "
+                f"({self.throughput():.1f} imagens/s, {self.workers} workers)")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+# Instância compartilhada pelos scripts de análise
+PREPROCESSOR = ImagePreprocessor()
+atexit.register(PREPROCESSOR.close)
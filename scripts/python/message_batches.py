@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MODO MESSAGE BATCHES (análise do catálogo inteiro, assíncrona)
+Envia todos os lotes como Message Batches (metade do preço, processados
+em até 24h), acompanha com backoff e devolve os resultados
+
+O estado fica em disco (.batch_jobs/<nome>.json): IDs dos Message Batches
+criados, custom_ids já enviados e quais resultados já foram gravados. Se o
+script for interrompido, rodar de novo com --batch-api retoma do ponto em
+que parou sem reenviar nada.
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+from usage_ledger import USAGE_LEDGER, count_images
+
+BATCH_JOBS_DIR = os.environ.get("FOLTZ_BATCH_JOBS_DIR", ".batch_jobs")
+
+# Limites da API: 100.000 requisições ou 256 MB por Message Batch
+BATCH_MAX_REQUESTS = 100_000
+BATCH_MAX_BYTES = 200 * 1024 * 1024
+
+POLL_INITIAL_DELAY = float(os.environ.get("FOLTZ_BATCH_POLL_DELAY", "30"))
+POLL_MAX_DELAY = 600
+POLL_BACKOFF = 1.5
+
+
+class BatchJob:
+    """
+    Um job = um ou mais Message Batches com o mesmo nome
+
+    submit() envia as requisições ainda não enviadas, wait() espera todos
+    terminarem e collect() entrega (custom_id, texto, erro) de cada
+    Message Batch ainda não gravado, na ordem em que foram enviados.
+    """
+
+    def __init__(self, name, jobs_dir=BATCH_JOBS_DIR):
+        self.name = name
+        self.path = Path(jobs_dir) / f"{name}.json"
+        self.state = self._load()
+        # is_submitted é chamado para cada requisição: busca num set, não nas listas
+        self.submitted = {custom_id for batch in self.state["batches"] for custom_id in batch["custom_ids"]}
+
+    def _load(self):
+        try:
+            state = json.loads(self.path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            state = None
+        if state is None or state.get("completed"):
+            state = {"name": self.name, "created_at": datetime.now().isoformat(),
+                     "completed": False, "batches": []}
+        return state
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.state, ensure_ascii=False, indent=1), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+    @property
+    def resumed(self):
+        return bool(self.state["batches"])
+
+    def is_submitted(self, custom_id):
+        return custom_id in self.submitted
+
+    def _create(self, client, requests):
+        batch = client.messages.batches.create(requests=requests)
+        self.state["batches"].append({
+            "id": batch.id,
+            "custom_ids": [request["custom_id"] for request in requests],
+            "images": {request["custom_id"]: count_images(request["params"]) for request in requests},
+            "ended": False,
+            "collected": False,
+            "saved": [],
+        })
+        self.submitted.update(request["custom_id"] for request in requests)
+        self._save()
+        return batch.id
+
+    def submit(self, client, requests, log=print):
+        """
+        requests: iterável de (custom_id, params) — só o que ainda não foi
+        enviado (use is_submitted para não montar de novo)
+        Fecha um Message Batch a cada BATCH_MAX_REQUESTS/BATCH_MAX_BYTES
+        """
+        pending = []
+        pending_bytes = 0
+        for custom_id, params in requests:
+            size = len(json.dumps(params))
+            if pending and (len(pending) >= BATCH_MAX_REQUESTS or pending_bytes + size > BATCH_MAX_BYTES):
+                log(f"  ├─ Message Batch criado: {self._create(client, pending)} ({len(pending)} requisições)")
+                pending, pending_bytes = [], 0
+            pending.append({"custom_id": custom_id, "params": params})
+            pending_bytes += size
+
+        if pending:
+            log(f"  ├─ Message Batch criado: {self._create(client, pending)} ({len(pending)} requisições)")
+
+    def wait(self, client, initial_delay=POLL_INITIAL_DELAY, max_delay=POLL_MAX_DELAY, log=print):
+        """Consulta cada Message Batch até terminar, com backoff exponencial"""
+        for batch in self.state["batches"]:
+            delay = initial_delay
+            while not batch["ended"]:
+                status = client.messages.batches.retrieve(batch["id"])
+                counts = status.request_counts
+                if status.processing_status == "ended":
+                    batch["ended"] = True
+                    self._save()
+                    log(f"  ├─ {batch['id']}: concluído ({counts.succeeded} ok, {counts.errored} erros, "
+                        f"{counts.expired} expirados)")
+                    break
+                log(f"  ├─ {batch['id']}: {counts.processing} em processamento; "
+                    f"nova consulta em {delay:.0f}s")
+                time.sleep(delay)
+                delay = min(max_delay, delay * POLL_BACKOFF)
+
+    def collect(self, client, on_result):
+        """
+        Chama on_result(custom_id, texto ou None, erro ou None) na ordem de
+        envio e marca o resultado como gravado assim que on_result volta;
+        uma interrupção no meio não grava nada duas vezes
+        """
+        for batch in self.state["batches"]:
+            if batch["collected"]:
+                continue
+
+            # A API não garante a ordem; reordena pelos custom_ids enviados
+            results = {}
+            for entry in client.messages.batches.results(batch["id"]):
+                result = entry.result
+                if result.type == "succeeded":
+                    results[entry.custom_id] = (result.message.content[0].text, None, result.message)
+                elif result.type == "errored":
+                    results[entry.custom_id] = (None, f"{result.error.error.type}: {result.error.error.message}", None)
+                else:
+                    results[entry.custom_id] = (None, result.type, None)
+
+            saved = set(batch["saved"])
+            for custom_id in batch["custom_ids"]:
+                if custom_id in saved:
+                    continue
+                text, error, message = results.get(custom_id, (None, "sem resultado", None))
+                if message is not None:
+                    USAGE_LEDGER.record(message, images=batch.get("images", {}).get(custom_id, 0), batch_api=True)
+                on_result(custom_id, text, error)
+                saved.add(custom_id)
+                batch["saved"].append(custom_id)
+                self._save()
+
+            batch["collected"] = True
+            self._save()
+
+        self.state["completed"] = True
+        self._save()
+
+    def report(self):
+        requests = sum(len(batch["custom_ids"]) for batch in self.state["batches"])
+        return f"Message Batches: {len(self.state['batches'])} jobs, {requests} requisições ({self.path})"
+
+
+def run_batch_job(client, name, requests_for, on_result, log=print, poll_delay=POLL_INITIAL_DELAY):
+    """
+    Fluxo completo: envia o que falta, espera e entrega os resultados
+
+    requests_for(job) devolve o iterável de (custom_id, params) a enviar,
+    pulando o que job.is_submitted já registra; on_result(custom_id, texto, erro)
+    """
+    job = BatchJob(name)
+    if job.resumed:
+        log(f"\n♻️  Retomando job '{name}' ({len(job.state['batches'])} Message Batches já criados)")
+
+    log("\n📤 Enviando requisições pendentes...")
+    job.submit(client, requests_for(job), log)
+
+    log("\n⏳ Aguardando processamento...")
+    job.wait(client, initial_delay=poll_delay, log=log)
+
+    log("\n📥 Gravando resultados...")
+    job.collect(client, on_result)
+
+    return job
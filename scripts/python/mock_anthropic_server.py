@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SERVIDOR LOCAL QUE IMITA A API DO CLAUDE (para benchmarks offline)
+Responde POST /v1/messages com uma mensagem no formato da API depois de
+uma latência simulada (sorteada + proporcional ao tamanho do corpo)
+
+Latência: latency é a média; latency_distribution escolhe como sortear
+("fixed", "uniform" em ±latency_spread, "exponential", ou "lognormal" com
+sigma latency_spread: cauda longa como a da API de verdade). seed fixa a
+sequência para comparar execuções.
+
+Também imita a Message Batches API (criar, consultar, resultados em JSONL):
+o lote fica "in_progress" por batch_seconds e depois "ended".
+
+Para testar o tratamento de erros: server.faults (fila de (status,
+retry_after) devolvidos pelas próximas requisições), unavailable_models
+(404), max_output_tokens (400 se max_tokens passar do limite do modelo) e
+max_request_bytes (413). fault_rates ({status: probabilidade}) sorteia
+429/529 em qualquer requisição; faults_injected conta os devolvidos.
+
+Streaming ("stream": true): a mesma mensagem em eventos SSE, em pedaços
+de STREAM_CHUNK_CHARS caracteres a cada stream_chunk_delay segundos.
+server.stream_cutoffs (fila de frações, ex.: 0.5) corta a conexão no meio
+da resposta das próximas requisições em streaming.
+
+Com nomes de arquivo de imagem no texto do usuário, a resposta em texto
+tem uma seção **IMAGEM lote-n (arquivo)** por imagem (section_tokens
+aumenta cada seção). Resposta maior que o max_tokens da requisição é
+cortada, com stop_reason "max_tokens", como na API.
+
+Saída estruturada: com tool_choice {"type": "tool"} a resposta é um bloco
+tool_use com um produto por arquivo de imagem citado no texto do usuário
+(com o bloco seo se o schema da ferramenta tiver esse campo).
+
+Prompt caching: com cache_control no system, o prefixo (tools + system)
+conta como escrita no cache na primeira vez e como leitura nas seguintes,
+desde que tenha o mínimo de tokens do modelo (1024; 2048 no Haiku), como
+na API; abaixo disso não há cache.
+
+Uso nos scripts: ANTHROPIC_BASE_URL=http://127.0.0.1:8765
+Uso direto: python mock_anthropic_server.py [porta] [latencia_s] [distribuicao] [taxa_falhas]
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_PORT = 8765
+DEFAULT_LATENCY = 0.5          # segundos por requisição (média)
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+DEFAULT_LATENCY_SPREAD = 0.5   # uniform: ±50% da média; lognormal: sigma
+DEFAULT_SECONDS_PER_MB = 0.05  # upload + processamento das imagens
+DEFAULT_BATCH_SECONDS = 3.0    # tempo até um Message Batch terminar
+CHARS_PER_TOKEN = 4
+# Menor prefixo que a API põe em cache (como a API, independente do prompt_cache)
+CACHE_MIN_TOKENS = 1024
+CACHE_MIN_TOKENS_HAIKU = 2048
+DEFAULT_STREAM_CHUNK_DELAY = 0.002
+STREAM_CHUNK_CHARS = 40
+BATCH_NUMBER_PATTERN = re.compile(r"Lote (\d+)")
+IMAGE_NAME_PATTERN = re.compile(r"[\w.-]+\.(?:jpe?g|png|webp)", re.IGNORECASE)
+
+ERROR_TYPES = {
+    400: "invalid_request_error",
+    404: "not_found_error",
+    413: "request_too_large",
+    429: "rate_limit_error",
+    500: "api_error",
+    529: "overloaded_error",
+}
+
+
+def _fake_message(request, size, cache_read=0, cache_write=0, section_tokens=0):
+    """Mensagem no formato da API para um corpo de /v1/messages"""
+    content = request["messages"][-1]["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    images = sum(1 for block in content if block.get("type") == "image")
+    text = f"Resposta simulada: {images} imagens analisadas."
+    prompt = " ".join(block.get("text", "") for block in content if block.get("type") == "text")
+    names = IMAGE_NAME_PATTERN.findall(prompt)
+    if names:
+        batch = BATCH_NUMBER_PATTERN.search(prompt)
+        batch = batch.group(1) if batch else "1"
+        text += "\n\n" + "".join(
+            f"**IMAGEM {batch}-{i} ({name})**\n\n**1. IDENTIFICAÇÃO:**\n- Time/Seleção: Time Simulado\n"
+            f"- Tipo: Home\n\n**4. NOME DO PRODUTO:**\nJersey Simulada {name}\n\n"
+            f"{'Descrição simulada. ' * (section_tokens * CHARS_PER_TOKEN // 20)}\n\n---\n\n"
+            for i, name in enumerate(names, 1))
+    max_chars = request.get("max_tokens", 0) * CHARS_PER_TOKEN
+    truncated = max_chars and len(text) > max_chars
+    if truncated:
+        text = text[:max_chars]
+    blocks = [{"type": "text", "text": text}]
+    stop_reason = "max_tokens" if truncated else "end_turn"
+    tool_choice = request.get("tool_choice") or {}
+    if tool_choice.get("type") == "tool":
+        description = "Descrição simulada. " * max(1, section_tokens * CHARS_PER_TOKEN // 20)
+        products = [{"filename": name, "team": "Time Simulado", "kit_type": "home",
+                     "primary_colors": ["branco"], "product_name": f"Jersey Simulada {name}",
+                     "short_description": "Jersey simulada.", "description": description,
+                     "category": "Jerseys Clubes", "tags": ["simulada"], "price_ars": 50000}
+                    for name in names]
+        tool = next((t for t in request.get("tools", []) if t.get("name") == tool_choice["name"]), {})
+        item = tool.get("input_schema", {}).get("properties", {}).get("products", {}).get("items", {})
+        if "seo" in item.get("properties", {}):
+            for product in products:
+                product["seo"] = {"title_tag": f"Jersey Simulada {product['filename']}",
+                                  "meta_description": "Descrição simulada.", "url_slug": "jersey-simulada",
+                                  "h1": "Jersey Simulada", "primary_keyword": "jersey simulada",
+                                  "secondary_keywords": ["jersey"], "seo_text": description,
+                                  "alt_text": "Jersey simulada"}
+        stop_reason = "tool_use"
+        # Cortada: só os produtos que couberam inteiros
+        while max_chars and products and len(json.dumps({"products": products})) > max_chars:
+            products.pop()
+            stop_reason = "max_tokens"
+        blocks = [{"type": "tool_use", "id": f"toolu_mock_{uuid.uuid4().hex[:16]}",
+                   "name": tool_choice["name"], "input": {"products": products}}]
+        text = json.dumps(blocks[0]["input"])
+    return {
+        "id": f"msg_mock_{uuid.uuid4().hex[:16]}",
+        "type": "message",
+        "role": "assistant",
+        "model": request.get("model", "mock"),
+        "content": blocks,
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": size // CHARS_PER_TOKEN // 100,
+            "output_tokens": len(text) // CHARS_PER_TOKEN,
+            "cache_creation_input_tokens": cache_write,
+            "cache_read_input_tokens": cache_read,
+        },
+    }
+
+
+def _stream_events(message):
+    """Eventos SSE (tipo, dados) de uma mensagem, com o conteúdo em pedaços"""
+    usage = message["usage"]
+    yield "message_start", {"type": "message_start", "message": {
+        **message, "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 1}}}
+    for index, block in enumerate(message["content"]):
+        if block["type"] == "tool_use":
+            text = json.dumps(block["input"])
+            start = {**block, "input": {}}
+            delta_of = lambda chunk: {"type": "input_json_delta", "partial_json": chunk}
+        else:
+            text = block["text"]
+            start = {"type": "text", "text": ""}
+            delta_of = lambda chunk: {"type": "text_delta", "text": chunk}
+        yield "content_block_start", {"type": "content_block_start", "index": index, "content_block": start}
+        for i in range(0, len(text), STREAM_CHUNK_CHARS):
+            yield "content_block_delta", {"type": "content_block_delta", "index": index,
+                                          "delta": delta_of(text[i:i + STREAM_CHUNK_CHARS])}
+        yield "content_block_stop", {"type": "content_block_stop", "index": index}
+    yield "message_delta", {"type": "message_delta",
+                            "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                            "usage": {"output_tokens": usage["output_tokens"]}}
+    yield "message_stop", {"type": "message_stop"}
+
+
+def _summary(request):
+    """Só o que _fake_message usa (sem o base64), para não guardar as imagens"""
+    content = request["messages"][-1]["content"]
+    if isinstance(content, list):
+        content = [{"type": block.get("type"), "text": block.get("text", "")} for block in content]
+    return {"model": request.get("model"), "max_tokens": request.get("max_tokens"),
+            "tool_choice": request.get("tool_choice"),
+            "messages": [{"role": "user", "content": content}]}
+
+
+def _iso(moment):
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # silencioso; o benchmark imprime o que interessa
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("request-id", f"req_mock_{uuid.uuid4().hex[:12]}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, retry_after=None):
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else None
+        self._send_json(status, {"type": "error", "error": {
+            "type": ERROR_TYPES.get(status, "api_error"), "message": message}}, headers)
+
+    def _send_stream(self, message, cutoff=None, chunk_delay=0.0):
+        """SSE em chunked encoding; cutoff (fração) fecha a conexão no meio, sem o chunk final"""
+        events = list(_stream_events(message))
+        stop_at = int(len(events) * cutoff) if cutoff is not None else None
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("request-id", f"req_mock_{uuid.uuid4().hex[:12]}")
+        self.end_headers()
+        for i, (event, data) in enumerate(events):
+            if i == stop_at:
+                self.close_connection = True
+                return
+            chunk = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.flush()
+            if event == "content_block_delta":
+                time.sleep(chunk_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        return json.loads(raw or b"{}"), len(raw)
+
+    def _not_found(self):
+        self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+    def do_POST(self):
+        server = self.server
+        path = self.path.split("?")[0]
+        if path == "/v1/messages/batches":
+            request, _ = self._read_json()
+            self._send_json(200, server.create_batch(request["requests"]))
+            return
+        if path != "/v1/messages":
+            self._not_found()
+            return
+
+        request, size = self._read_json()
+        server.count_request()
+        error = server.check_request(request, size)
+        if error:
+            self._send_error(*error)
+            return
+        time.sleep(server.sample_latency() + size / 1024 / 1024 * server.seconds_per_mb)
+        message = _fake_message(request, size, *server.prompt_cache_usage(request),
+                                section_tokens=server.section_tokens)
+        if request.get("stream"):
+            self._send_stream(message, server.next_stream_cutoff(), server.stream_chunk_delay)
+        else:
+            self._send_json(200, message)
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        # v1/messages/batches/<id>[/results]
+        if parts[:3] != ["v1", "messages", "batches"] or len(parts) not in (4, 5):
+            self._not_found()
+            return
+
+        batch = self.server.batch_status(parts[3])
+        if batch is None:
+            self._not_found()
+        elif len(parts) == 4:
+            self._send_json(200, batch)
+        elif batch["processing_status"] != "ended":
+            self._send_json(400, {"type": "error", "error": {
+                "type": "invalid_request_error", "message": "Batch ainda em processamento"}})
+        else:
+            body = self.server.batch_results(parts[3])
+            self.send_response(200)
+            self.send_header("Content-Type", "application/binary")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+class MockAnthropicServer(ThreadingHTTPServer):
+    """Servidor numa thread própria; url vai em ANTHROPIC_BASE_URL/base_url"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=DEFAULT_LATENCY, seconds_per_mb=DEFAULT_SECONDS_PER_MB,
+                 batch_seconds=DEFAULT_BATCH_SECONDS, stream_chunk_delay=DEFAULT_STREAM_CHUNK_DELAY,
+                 latency_distribution="fixed", latency_spread=DEFAULT_LATENCY_SPREAD, seed=None):
+        super().__init__(("127.0.0.1", port), _Handler)
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Distribuição desconhecida: {latency_distribution} (use {', '.join(LATENCY_DISTRIBUTIONS)})")
+        self.latency = latency
+        self.latency_distribution = latency_distribution
+        self.latency_spread = latency_spread
+        self.random = random.Random(seed)
+        self.seconds_per_mb = seconds_per_mb
+        self.batch_seconds = batch_seconds
+        self.stream_chunk_delay = stream_chunk_delay
+        self.stream_cutoffs = []
+        self.section_tokens = 0
+        self.requests = 0
+        self.batches = {}
+        self.faults = []
+        self.fault_rates = {}
+        self.fault_retry_after = 0
+        self.faults_injected = {}
+        self.unavailable_models = set()
+        self.max_output_tokens = {}
+        self.max_request_bytes = None
+        self.cached_prefixes = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def check_request(self, request, size):
+        """(status, mensagem, retry_after) do erro simulado, ou None"""
+        model = request.get("model")
+        with self._lock:
+            if self.faults:
+                status, retry_after = self.faults.pop(0)
+                return status, "Erro simulado", retry_after
+            for status, rate in self.fault_rates.items():
+                if self.random.random() < rate:
+                    self.faults_injected[status] = self.faults_injected.get(status, 0) + 1
+                    return status, "Erro simulado", self.fault_retry_after
+        if self.max_request_bytes and size > self.max_request_bytes:
+            return 413, f"Request exceeds the maximum size ({size} bytes)", None
+        if model in self.unavailable_models:
+            return 404, f"model: {model}", None
+        limit = self.max_output_tokens.get(model)
+        if limit and request.get("max_tokens", 0) > limit:
+            return (400, f"max_tokens: {request['max_tokens']} > {limit}, which is the maximum "
+                         f"allowed number of output tokens for {model}", None)
+        return None
+
+    def sample_latency(self):
+        """Latência de uma requisição, com média self.latency"""
+        mean, spread = self.latency, self.latency_spread
+        with self._lock:
+            if mean <= 0 or self.latency_distribution == "fixed":
+                return max(mean, 0.0)
+            if self.latency_distribution == "uniform":
+                return self.random.uniform(mean * max(0.0, 1 - spread), mean * (1 + spread))
+            if self.latency_distribution == "exponential":
+                return self.random.expovariate(1 / mean)
+            # lognormal com a mesma média: mu = ln(média) - sigma²/2
+            return self.random.lognormvariate(math.log(mean) - spread ** 2 / 2, spread)
+
+    def next_stream_cutoff(self):
+        with self._lock:
+            return self.stream_cutoffs.pop(0) if self.stream_cutoffs else None
+
+    def prompt_cache_usage(self, request):
+        """(tokens lidos, tokens gravados) do system com cache_control"""
+        system = request.get("system")
+        if not isinstance(system, list) or not any(block.get("cache_control") for block in system):
+            return 0, 0
+        prefix = json.dumps([request.get("tools"), system], sort_keys=True)
+        tokens = len(prefix) // CHARS_PER_TOKEN
+        minimum = CACHE_MIN_TOKENS_HAIKU if "haiku" in request.get("model", "") else CACHE_MIN_TOKENS
+        if tokens < minimum:
+            return 0, 0
+        with self._lock:
+            if prefix in self.cached_prefixes:
+                return tokens, 0
+            self.cached_prefixes.add(prefix)
+        return 0, tokens
+
+    def create_batch(self, requests):
+        """Guarda o lote; as respostas são geradas quando o lote termina"""
+        batch_id = f"msgbatch_mock_{uuid.uuid4().hex[:16]}"
+        with self._lock:
+            self.batches[batch_id] = {
+                "created_at": datetime.now(timezone.utc),
+                "requests": [(r["custom_id"], _summary(r["params"]), len(json.dumps(r["params"]))) for r in requests],
+                "results": None,
+            }
+        return self.batch_status(batch_id)
+
+    def batch_status(self, batch_id):
+        """Objeto MessageBatch no formato da API"""
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        created = batch["created_at"]
+        ended = datetime.now(timezone.utc) >= created + timedelta(seconds=self.batch_seconds)
+        total = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else total,
+                "succeeded": total if ended else 0,
+                "errored": 0, "canceled": 0, "expired": 0,
+            },
+            "created_at": _iso(created),
+            "expires_at": _iso(created + timedelta(hours=24)),
+            "ended_at": _iso(created + timedelta(seconds=self.batch_seconds)) if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def batch_results(self, batch_id):
+        """Resultados em JSONL, em ordem inversa (a API não garante a ordem)"""
+        batch = self.batches[batch_id]
+        with self._lock:
+            if batch["results"] is None:
+                lines = [json.dumps({"custom_id": custom_id, "result": {
+                    "type": "succeeded",
+                    "message": _fake_message(params, size, section_tokens=self.section_tokens)}})
+                    for custom_id, params, size in reversed(batch["requests"])]
+                batch["results"] = ("\n".join(lines) + "\n").encode('utf-8')
+                self.requests += len(lines)
+        return batch["results"]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LATENCY
+    distribution = sys.argv[3] if len(sys.argv) > 3 else "fixed"
+    fault_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+    server = MockAnthropicServer(port, latency, latency_distribution=distribution)
+    if fault_rate:
+        server.fault_rates = {429: fault_rate / 2, 529: fault_rate / 2}
+    server.start()
+    print(f"API simulada em {server.url} (latência {latency}s {distribution}, "
+          f"{fault_rate:.0%} de 429/529). Ctrl+C para sair.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
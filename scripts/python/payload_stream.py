@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MONTAGEM DE LOTES COM MEMÓRIA LIMITADA
+Codifica as imagens sob demanda e fecha o lote quando atinge o número de
+imagens, o orçamento de bytes em base64 ou o orçamento de tokens do
+empacotador (token_packer), o que vier primeiro
+
+Num laço simples (monta, envia, monta o próximo) só o lote atual e um
+pedaço pequeno já codificado pelo pool ficam vivos: o pico de memória é
+~ orçamento + as cópias transitórias da imagem sendo recebida do pool, e
+não o catálogo inteiro. No batch_pipeline vários lotes ficam vivos ao
+mesmo tempo (fila + em voo); lá cada lote recebe uma fatia do orçamento
+(BatchPipeline.batch_byte_budget) para o total continuar limitado.
+O bloco chega do worker por
+pickle: durante a transferência o base64 existe duas vezes no processo
+principal (bytes do pickle + str), depois uma só (~1,33x o arquivo).
+Medição: benchmark_payload.py (laço simples e pipeline) e
+benchmark_zero_copy.py (tracemalloc).
+
+write_message_body escreve o JSON da requisição direto num arquivo/socket
+(imagens que passam direto vão do mmap para a saída em pedaços de base64,
+~0,75x o arquivo). As chamadas pelo SDK não usam esse caminho: o SDK recebe
+os blocos como dict e serializa o corpo inteiro; serve para corpos
+gravados em disco ou enviados por HTTP cru.
+"""
+
+import os
+import json
+import base64
+
+from image_pool import PREPROCESSOR
+from foltz_imaging import (
+    MAX_DIMENSION, block_size, encode_image_bytes, is_pass_through,
+    iter_file_base64, sniff_media_type, task_pixel_budget
+)
+
+# Orçamento de base64 por requisição (a API aceita até ~32 MB por request)
+PAYLOAD_BYTE_BUDGET = int(os.environ.get("FOLTZ_PAYLOAD_BYTE_BUDGET", 20 * 1024 * 1024))
+
+
+def iter_payload_batches(paths, encode_fn, batch_size, byte_budget=PAYLOAD_BYTE_BUDGET,
+                         preprocessor=PREPROCESSOR, on_result=None, size_fn=block_size, packer=None):
+    """
+    Gera listas [(caminho, bloco)] respeitando batch_size e byte_budget
+    (encode_fn devolve o bloco de imagem; size_fn mede o base64 dele)
+
+    - Os caminhos são codificados em pedaços do tamanho do pool, à medida
+      que o consumidor pede o próximo lote
+    - Uma imagem que sozinha passa do orçamento vai num lote só dela
+    - on_result(caminho, bloco, erro) é chamado para cada imagem (para log)
+    - packer (TokenPacker): também fecha o lote pelo orçamento de tokens;
+      consultado a cada imagem, acompanha a estimativa que ele for ajustando
+    """
+    paths = list(paths)
+    chunk_size = max(1, min(batch_size, preprocessor.workers))
+
+    batch = []
+    batch_bytes = 0
+    batch_tokens = 0
+
+    for start in range(0, len(paths), chunk_size):
+        chunk = preprocessor.map(encode_fn, paths[start:start + chunk_size])
+
+        for img_path, block, error in chunk:
+            if on_result:
+                on_result(img_path, block, error)
+            if error:
+                continue
+
+            size = size_fn(block)
+            tokens = packer.image_tokens(block) if packer else 0
+            if batch and (len(batch) >= batch_size or batch_bytes + size > byte_budget
+                          or (packer and packer.full(len(batch), batch_tokens, tokens))):
+                yield batch
+                batch = []
+                batch_bytes = 0
+                batch_tokens = 0
+
+            batch.append((img_path, block))
+            batch_bytes += size
+            batch_tokens += tokens
+
+        # Solta o pedaço antes de codificar o próximo
+        del chunk
+
+    if batch:
+        yield batch
+
+
+def write_message_body(fp, model, max_tokens, prompt, image_paths, max_dimension=MAX_DIMENSION, task=None):
+    """
+    Escreve em fp (binário) o corpo JSON de uma requisição da Messages API
+    com o prompt seguido das imagens; devolve o número de bytes escritos
+
+    Imagens que cumprem os limites nunca ficam inteiras na memória: o base64
+    sai do mmap em pedaços. As demais são processadas (encode_image_bytes)
+    e escritas de uma vez.
+    """
+    header = json.dumps({"model": model, "max_tokens": max_tokens})[:-1]
+    text_block = json.dumps({"type": "text", "text": prompt}, ensure_ascii=False)
+    written = fp.write(f'{header}, "messages": [{{"role": "user", "content": [{text_block}'.encode('utf-8'))
+
+    max_pixels = task_pixel_budget(task)
+    for image_path in image_paths:
+        media_type = is_pass_through(image_path, max_dimension, max_pixels)
+        if media_type:
+            chunks = iter_file_base64(image_path)
+        else:
+            data = encode_image_bytes(image_path, max_dimension, task=task)
+            media_type = sniff_media_type(data)
+            chunks = [base64.b64encode(data)]
+
+        written += fp.write(f', {{"type": "image", "source": {{"type": "base64", '
+                            f'"media_type": "{media_type}", "data": "'.encode('ascii'))
+        for chunk in chunks:
+            written += fp.write(chunk)
+        written += fp.write(b'"}}')
+
+    written += fp.write(b']}]}')
+    return written
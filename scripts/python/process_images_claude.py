@@ -3,16 +3,23 @@
 """
 Script para processar imagens e enviá-las à API do Claude
 Redimensiona automaticamente imagens que excedem 2000px em qualquer dimensão
+ou o orçamento de pixels da tarefa (descrição detalhada: TASK_ANALYSIS)
 """
 
 import os
 import sys
-import base64
-import json
+import time
+from functools import partial
 from pathlib import Path
-from PIL import Image
-import io
-import anthropic
+from image_cache import IMAGE_CACHE
+from image_pool import PREPROCESSOR
+from claude_client import API_STATS, get_client
+from image_manifest import ImageManifest
+from usage_ledger import USAGE_LEDGER
+from foltz_imaging import (
+    MAX_DIMENSION, FORMAT_AUTO, PAYLOAD_STATS, RESIZE_QUALITY, TASK_ANALYSIS,
+    encode_image_block, estimate_batch_tokens, fit_within, list_images, task_pixel_budget
+)
 
 # Configurar encoding UTF-8 no Windows
 if sys.platform == 'win32':
@@ -23,66 +30,18 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Configurações
-MAX_DIMENSION = 2000  # Limite da API para many-image requests
+RESIZE_MODE = RESIZE_QUALITY  # RESIZE_FAST troca qualidade por velocidade
+IMAGE_TASK = TASK_ANALYSIS  # descrição detalhada: orçamento de pixels/tokens por imagem (ver foltz_imaging)
+OUTPUT_FORMAT = FORMAT_AUTO  # menor entre JPEG/WebP; FORMAT_SOURCE mantém o formato original
 IMAGE_FOLDERS = ["seedream", "id_visual"]
+IMAGE_EXTENSIONS = ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp']
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 
-def get_image_dimensions(image_path):
-    """Retorna as dimensões da imagem"""
-    with Image.open(image_path) as img:
-        return img.size
-
-def resize_image_if_needed(image_path, max_dimension=MAX_DIMENSION):
-    """
-    Redimensiona a imagem se exceder max_dimension em qualquer dimensão
-    Mantém a proporção original
-    Retorna bytes da imagem processada
-    """
-    with Image.open(image_path) as img:
-        width, height = img.size
-
-        # Verifica se precisa redimensionar
-        if width <= max_dimension and height <= max_dimension:
-            # Não precisa redimensionar, retorna a imagem original
-            with open(image_path, 'rb') as f:
-                return f.read()
-
-        # Calcula novas dimensões mantendo proporção
-        if width > height:
-            new_width = max_dimension
-            new_height = int((max_dimension / width) * height)
-        else:
-            new_height = max_dimension
-            new_width = int((max_dimension / height) * width)
-
-        # Redimensiona
-        img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-        # Converte para bytes
-        buffer = io.BytesIO()
-        # Salva no formato original se possível
-        img_format = img.format or 'JPEG'
-        img_resized.save(buffer, format=img_format, quality=90)
-
-        print(f"  ✓ Redimensionada de {width}x{height} para {new_width}x{new_height}")
-
-        return buffer.getvalue()
-
-def image_to_base64(image_bytes):
-    """Converte bytes da imagem para base64"""
-    return base64.b64encode(image_bytes).decode('utf-8')
-
-def get_media_type(file_path):
-    """Retorna o media type baseado na extensão"""
-    ext = file_path.suffix.lower()
-    media_types = {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp'
-    }
-    return media_types.get(ext, 'image/jpeg')
+# Dimensões lidas só do cabeçalho e guardadas entre execuções
+IMAGE_MANIFEST = ImageManifest()
+
+# Função de codificação enviada aos workers do pool (passa direto quem já cumpre os limites)
+ENCODE_IMAGE = partial(encode_image_block, mode=RESIZE_MODE, task=IMAGE_TASK, output_format=OUTPUT_FORMAT)
 
 def collect_images(folders, limit=None):
     """Coleta todas as imagens das pastas especificadas"""
@@ -96,30 +55,33 @@ def collect_images(folders, limit=None):
 
         print(f"\n📁 Processando pasta: {folder}")
 
-        # Busca imagens nas extensões suportadas
-        for ext in ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp']:
-            for img_path in folder_path.glob(ext):
-                if limit and len(images) >= limit:
-                    break
+        # Dimensões vêm do manifesto; só relê o cabeçalho do que mudou
+        image_paths = list_images([folder], IMAGE_EXTENSIONS, sort=False)
+        for img_path, entry in IMAGE_MANIFEST.scan(image_paths):
+            if limit and len(images) >= limit:
+                break
 
-                try:
-                    width, height = get_image_dimensions(img_path)
-                    needs_resize = width > MAX_DIMENSION or height > MAX_DIMENSION
+            width, height = entry["width"], entry["height"]
+            # Mesmo critério do encode: MAX_DIMENSION e o orçamento de pixels da tarefa
+            new_size = fit_within(width, height, MAX_DIMENSION, task_pixel_budget(IMAGE_TASK))
 
-                    print(f"  {img_path.name} ({width}x{height})", end="")
-                    if needs_resize:
-                        print(" → Precisa redimensionar")
-                    else:
-                        print(" → OK")
+            print(f"  {img_path.name} ({width}x{height})", end="")
+            if new_size:
+                print(f" → Precisa redimensionar para {new_size[0]}x{new_size[1]}")
+            else:
+                print(" → OK")
 
-                    images.append(img_path)
+            images.append(img_path)
 
-                except Exception as e:
-                    print(f"  ✗ Erro ao processar {img_path.name}: {e}")
+        for img_path in image_paths:
+            if str(img_path) in IMAGE_MANIFEST.errors:
+                print(f"  ✗ Erro ao processar {img_path.name}: {IMAGE_MANIFEST.errors[str(img_path)]}")
 
         if limit and len(images) >= limit:
             break
 
+    IMAGE_MANIFEST.save()
+    print(f"\n{IMAGE_MANIFEST.report()}")
     return images
 
 def process_images_for_api(image_paths):
@@ -128,28 +90,19 @@ def process_images_for_api(image_paths):
 
     print(f"\n🔄 Processando {len(image_paths)} imagens para a API...")
 
-    for img_path in image_paths:
-        try:
-            # Redimensiona se necessário
-            image_bytes = resize_image_if_needed(img_path)
-
-            # Converte para base64
-            image_base64 = image_to_base64(image_bytes)
-
-            # Prepara objeto para a API
-            processed_images.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": get_media_type(img_path),
-                    "data": image_base64
-                }
-            })
+    # Redimensiona (se necessário) em paralelo, preservando a ordem
+    for img_path, block, error in PREPROCESSOR.map(ENCODE_IMAGE, image_paths):
+        if error:
+            print(f"  ✗ Erro ao processar {img_path.name}: {error}")
+            continue
 
-        except Exception as e:
-            print(f"  ✗ Erro ao processar {img_path.name}: {e}")
+        print(f"  ✓ {PAYLOAD_STATS.add(img_path, block)}")
+        processed_images.append(block)
 
     print(f"✓ {len(processed_images)} imagens processadas com sucesso")
+    print(f"  {IMAGE_CACHE.report()}")
+    print(f"  {PAYLOAD_STATS.report()}")
+    print(f"  {PREPROCESSOR.report()}")
     return processed_images
 
 def analyze_images_with_claude(processed_images, prompt="Descreva estas imagens de produtos de forma detalhada."):
@@ -160,14 +113,17 @@ def analyze_images_with_claude(processed_images, prompt="Descreva estas imagens
         print("   Configure com: export ANTHROPIC_API_KEY='sua-chave'")
         return None
 
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    client = get_client(ANTHROPIC_API_KEY)
 
     # Constrói a mensagem com o prompt seguido das imagens
     content = [{"type": "text", "text": prompt}] + processed_images
 
     print(f"\n🤖 Enviando {len(processed_images)} imagens para Claude...")
+    print(f"   Tokens de imagem estimados: ~{estimate_batch_tokens(processed_images)}")
+    print(f"   {PAYLOAD_STATS.end_batch()}")
 
     try:
+        started = time.perf_counter()
         message = client.messages.create(
             model="claude-3-5-sonnet-20241022",
             max_tokens=4096,
@@ -179,7 +135,10 @@ def analyze_images_with_claude(processed_images, prompt="Descreva estas imagens
             ]
         )
 
+        USAGE_LEDGER.record(message, images=len(processed_images), latency=time.perf_counter() - started)
         print("✓ Resposta recebida com sucesso!")
+        print(f"   {USAGE_LEDGER.last()}")
+        print(f"   {API_STATS.last()}")
         return message.content[0].text
 
     except Exception as e:
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SAÍDA ESTRUTURADA DA ANÁLISE DE PRODUTOS (modo --json)
+O modelo responde chamando a ferramenta ANALYSIS_TOOL, cujo input_schema
+define um registro por imagem; nada de extrair campos do markdown depois
+
+Os registros vão para um JSONL só de acréscimo (.produtos/analises.jsonl)
+com um índice ao lado (analises.index.jsonl), também só de acréscimo: uma
+linha [caminho, posição, tamanho] por registro. Ao abrir, o índice é
+reaplicado na memória:
+- por arquivo (caminho ou só o nome): posição e tamanho da linha, para ler
+  um produto com um seek
+- por pasta: os arquivos de cada pasta de produto
+
+Reanalisar uma imagem acrescenta uma linha nova; a última linha do índice
+para o mesmo caminho vence. Sem índice (ou com um índice que não bate com
+o JSONL), ele é refeito lendo o JSONL uma vez.
+
+Registros cujo filename não bate com nenhuma imagem do lote são
+descartados (e logados), não atribuídos por ordem: as imagens sem registro
+ficam de fora e podem ser reanalisadas.
+
+Modo --seo (passo único): COMBINED_TOOL pede, no mesmo registro, o bloco
+"seo" que generate_seo_content gera numa chamada à parte; split_seo separa
+os dois antes de gravar.
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+PRODUCT_STORE_PATH = os.environ.get("FOLTZ_PRODUCT_STORE", ".produtos/analises.jsonl")
+
+ANALYSIS_TOOL_NAME = "registrar_analises"
+
+PRODUCT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "filename": {"type": "string", "description": "Nome do arquivo da imagem, exatamente como informado"},
+        "team": {"type": "string", "description": "Time ou seleção (nome completo)"},
+        "league": {"type": "string", "description": "País ou liga"},
+        "kit_type": {"type": "string", "enum": ["home", "away", "third", "special", "goalkeeper", "unknown"]},
+        "season": {"type": "string", "description": "Ano ou período estimado"},
+        "primary_colors": {"type": "array", "items": {"type": "string"}},
+        "secondary_colors": {"type": "array", "items": {"type": "string"}},
+        "design": {"type": "string", "description": "Padrão, gola, mangas e elementos únicos"},
+        "sponsors": {"type": "array", "items": {"type": "string"}},
+        "product_name": {"type": "string", "description": "Nome do produto, máx 70 caracteres"},
+        "short_description": {"type": "string", "description": "1 frase de 100-150 caracteres"},
+        "description": {"type": "string", "description": "150-250 palavras para a página do produto"},
+        "category": {"type": "string", "description": "Ex: Jerseys Seleções / Jerseys Clubes"},
+        "subcategory": {"type": "string", "description": "Ex: Europa / América do Sul"},
+        "tags": {"type": "array", "items": {"type": "string"}, "description": "15-20 tags de SEO"},
+        "price_ars": {"type": "number", "description": "Preço sugerido em pesos argentinos"},
+        "price_rationale": {"type": "string"},
+        "related_products": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["filename", "team", "kit_type", "primary_colors", "product_name",
+                 "short_description", "description", "category", "tags", "price_ars"],
+}
+
+ANALYSIS_TOOL = {
+    "name": ANALYSIS_TOOL_NAME,
+    "description": "Registra a análise de e-commerce de cada imagem do lote, um item por imagem.",
+    "input_schema": {
+        "type": "object",
+        "properties": {"products": {"type": "array", "items": PRODUCT_SCHEMA}},
+        "required": ["products"],
+    },
+}
+
+# Força a resposta pela ferramenta (sem texto livre)
+ANALYSIS_TOOL_CHOICE = {"type": "tool", "name": ANALYSIS_TOOL_NAME}
+
+COMBINED_TOOL_NAME = "registrar_analises_seo"
+
+# Mesmas seções do SEO_SYSTEM_PROMPT de generate_seo_content
+SEO_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title_tag": {"type": "string", "description": "Máx 60 caracteres, com a palavra-chave principal"},
+        "meta_description": {"type": "string", "description": "Máx 155 caracteres, persuasiva"},
+        "url_slug": {"type": "string"},
+        "h1": {"type": "string"},
+        "h2": {"type": "array", "items": {"type": "string"}, "description": "3-5 subtítulos"},
+        "primary_keyword": {"type": "string"},
+        "secondary_keywords": {"type": "array", "items": {"type": "string"}, "description": "5-10"},
+        "long_tail_keywords": {"type": "array", "items": {"type": "string"}, "description": "5-10"},
+        "seo_text": {"type": "string", "description": "300-500 palavras, densidade de 2-3%, com call-to-action"},
+        "alt_text": {"type": "string"},
+        "alt_text_variations": {"type": "array", "items": {"type": "string"}, "description": "3 variações"},
+    },
+    "required": ["title_tag", "meta_description", "url_slug", "h1", "primary_keyword",
+                 "secondary_keywords", "seo_text", "alt_text"],
+}
+
+COMBINED_TOOL = {
+    "name": COMBINED_TOOL_NAME,
+    "description": "Registra a análise de e-commerce e o conteúdo SEO de cada imagem do lote, um item por imagem.",
+    "input_schema": {
+        "type": "object",
+        "properties": {"products": {"type": "array", "items": {
+            **PRODUCT_SCHEMA,
+            "properties": {**PRODUCT_SCHEMA["properties"], "seo": SEO_SCHEMA},
+            "required": PRODUCT_SCHEMA["required"] + ["seo"],
+        }}},
+        "required": ["products"],
+    },
+}
+
+COMBINED_TOOL_CHOICE = {"type": "tool", "name": COMBINED_TOOL_NAME}
+
+
+def tool_records(message):
+    """Lista de registros do bloco tool_use da resposta (vazia se não houver)"""
+    for block in message.content:
+        if block.type == "tool_use" and block.name in (ANALYSIS_TOOL_NAME, COMBINED_TOOL_NAME):
+            return list(block.input.get("products", []))
+    return []
+
+
+def split_seo(records):
+    """(registros sem o bloco seo, registros que trouxeram seo) de uma resposta de COMBINED_TOOL"""
+    analysis = [{key: value for key, value in record.items() if key != "seo"} for record in records]
+    return analysis, [record for record in records if record.get("seo")]
+
+
+def match_records(records, image_paths, log=print):
+    """
+    [(caminho, registro)] pelo nome do arquivo; registros com nome que não
+    bate com nenhuma imagem restante e imagens sem registro ficam de fora
+    (logados) — atribuir por ordem gravaria a análise de uma jersey em outra
+    """
+    by_name = {Path(p).name: Path(p) for p in image_paths}
+    matched = []
+    for record in records:
+        image_path = by_name.pop(record.get("filename", ""), None)
+        if image_path is None:
+            log(f"  ├─ ⚠️  Registro descartado: filename {record.get('filename')!r} não é uma imagem do lote")
+        else:
+            matched.append((image_path, record))
+    if by_name:
+        log(f"  ├─ ⚠️  {len(by_name)} imagens sem registro na resposta: {', '.join(sorted(by_name))}")
+    return matched
+
+
+class ProductStore:
+    """JSONL de registros + índice por arquivo e por pasta"""
+
+    def __init__(self, path=PRODUCT_STORE_PATH):
+        self.path = Path(path)
+        self.index_path = self.path.with_suffix(".index.jsonl")
+        self.index = {"by_file": {}, "by_name": {}, "by_folder": {}}
+        self.written = 0
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _index_entry(self, key, offset, length):
+        image_path = Path(key)
+        self.index["by_file"][key] = [offset, length]
+        self.index["by_name"][image_path.name] = key
+        files = self.index["by_folder"].setdefault(str(image_path.parent), [])
+        if key not in files:
+            files.append(key)
+
+    def _load_index(self):
+        """Reaplica o índice; refaz a partir do JSONL se faltar ou não bater com ele"""
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            self.index_path.unlink(missing_ok=True)  # índice de um JSONL que não existe mais
+            return
+        entries = []
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                for line in f:
+                    entries.append(json.loads(line))
+        except FileNotFoundError:
+            entries = None
+        except ValueError:
+            entries = None  # linha cortada por uma interrupção
+        # O índice tem que cobrir o JSONL até o fim (uma interrupção entre as
+        # duas escritas deixa registros sem índice)
+        end = max((offset + length for _, offset, length in entries), default=0) if entries is not None else -1
+        if end != size:
+            self._rebuild_index()
+            return
+        for key, offset, length in entries:
+            self._index_entry(key, offset, length)
+
+    def _rebuild_index(self):
+        entries = []
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    key = json.loads(line)["path"]
+                except (ValueError, KeyError):
+                    key = None  # linha cortada no fim do arquivo
+                if key is not None and line.endswith(b"\n"):
+                    entries.append([key, offset, len(line)])
+                    self._index_entry(key, offset, len(line))
+                offset += len(line)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries),
+                            encoding='utf-8')
+        os.replace(tmp_path, self.index_path)
+
+    def add(self, records, image_paths, batch_number=None, log=print):
+        """Acrescenta os registros de um lote e o índice; devolve os caminhos gravados"""
+        matched = match_records(records, image_paths, log)
+        if not matched:
+            return []
+
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            index_lines = []
+            with open(self.path, 'ab') as f:
+                for image_path, record in matched:
+                    folder = str(image_path.parent)
+                    line = json.dumps({
+                        **record,
+                        "folder": folder,
+                        "path": str(image_path),
+                        "batch": batch_number,
+                        "analyzed_at": datetime.now().isoformat(timespec='seconds'),
+                    }, ensure_ascii=False).encode('utf-8') + b"\n"
+                    offset = f.tell()
+                    f.write(line)
+
+                    key = str(image_path)
+                    self._index_entry(key, offset, len(line))
+                    index_lines.append(json.dumps([key, offset, len(line)], ensure_ascii=False) + "\n")
+            # Depois do JSONL: o índice nunca aponta para uma linha que não existe
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write("".join(index_lines))
+            self.written += len(matched)
+        return [image_path for image_path, _ in matched]
+
+    def get(self, image_path):
+        """Registro mais recente da imagem (caminho ou nome), ou None — um seek, sem varrer o arquivo"""
+        key = str(image_path)
+        location = self.index["by_file"].get(key) or self.index["by_file"].get(self.index["by_name"].get(key))
+        if location is None:
+            return None
+        offset, length = location
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def folder(self, folder):
+        """Registros de uma pasta de produto"""
+        return [self.get(key) for key in self.index["by_folder"].get(str(folder), [])]
+
+    def report(self):
+        return (f"Registros estruturados: {self.written} gravados nesta execução, "
+                f"{len(self.index['by_file'])} imagens e {len(self.index['by_folder'])} pastas no índice "
+                f"({self.path})")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PROMPT CACHING DAS INSTRUÇÕES FIXAS
+As instruções longas (formato da análise, do conteúdo SEO) vão num bloco
+de system com cache_control; só o que muda por lote (número do lote,
+nomes dos arquivos) e as imagens vão na mensagem do usuário
+
+A primeira requisição grava o prefixo no cache (tokens de escrita custam
+25% a mais); as seguintes, dentro de ~5 minutos, leem o prefixo por 10% do
+preço. PROMPT_CACHE_STATS soma os tokens de leitura/escrita reportados
+pela API para confirmar a economia.
+
+O prefixo em cache é tools + system. A API ignora cache_control em
+prefixos abaixo do mínimo do modelo (1024 tokens; 2048 no Haiku), então
+cached_system estima o prefixo e, abaixo do mínimo, manda o system sem
+cache_control e loga uma vez por prompt (o resumo conta essas requisições).
+"""
+
+import json
+import threading
+
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_MIN_TOKENS_HAIKU = 2048
+CHARS_PER_TOKEN = 4  # mesma estimativa do claude_dispatcher
+
+
+def min_cache_tokens(model=None):
+    """Menor prefixo que o modelo põe em cache"""
+    return PROMPT_CACHE_MIN_TOKENS_HAIKU if model and "haiku" in model else PROMPT_CACHE_MIN_TOKENS
+
+
+def prefix_tokens(text, tools=None):
+    """Tokens estimados do prefixo em cache (tools + system)"""
+    chars = len(text) + (len(json.dumps(tools, ensure_ascii=False)) if tools else 0)
+    return chars // CHARS_PER_TOKEN
+
+
+def cached_system(text, tools=None, model=None, log=print):
+    """
+    Bloco de system marcado para o prompt caching; sem cache_control se
+    tools + system ficam abaixo do mínimo de model (o primeiro modelo a
+    tentar; sem model, o mínimo de 1024)
+    """
+    tokens = prefix_tokens(text, tools)
+    minimum = min_cache_tokens(model)
+    if tokens < minimum:
+        PROMPT_CACHE_STATS.skip(text, tokens, minimum, log)
+        return [{"type": "text", "text": text}]
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+class PromptCacheStats:
+    """Tokens de entrada por tipo (normal, escrita no cache, leitura do cache)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.input_tokens = 0
+        self.cache_write_tokens = 0
+        self.cache_read_tokens = 0
+        self.skipped = 0          # requisições sem cache_control (prefixo curto)
+        self._skipped_prompts = set()
+        self._lock = threading.Lock()
+
+    def skip(self, text, tokens, minimum, log=print):
+        """Conta uma requisição sem cache_control; loga na primeira vez de cada prompt"""
+        with self._lock:
+            self.skipped += 1
+            first = text not in self._skipped_prompts
+            self._skipped_prompts.add(text)
+        if first:
+            log(f"Prompt caching desligado: prefixo de ~{tokens} tokens abaixo do mínimo de {minimum} "
+                f"(cache_control omitido)")
+
+    def add(self, usage):
+        """usage da resposta da API (message.usage)"""
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += usage.input_tokens or 0
+            self.cache_write_tokens += getattr(usage, "cache_creation_input_tokens", None) or 0
+            self.cache_read_tokens += getattr(usage, "cache_read_input_tokens", None) or 0
+
+    def report(self):
+        if not self.requests:
+            return "Prompt caching: nenhuma requisição"
+        if self.skipped and not (self.cache_read_tokens or self.cache_write_tokens):
+            return (f"Prompt caching: não usado em {self.skipped} requisições "
+                    f"(prefixo abaixo do mínimo de {PROMPT_CACHE_MIN_TOKENS} tokens)")
+        total = self.input_tokens + self.cache_write_tokens + self.cache_read_tokens
+        read_share = self.cache_read_tokens / total * 100 if total else 0.0
+        text = (f"Prompt caching: {self.cache_read_tokens} tokens lidos do cache ({read_share:.1f}% da entrada), "
+                f"{self.cache_write_tokens} gravados, {self.input_tokens} sem cache "
+                f"em {self.requests} requisições")
+        if not (self.cache_read_tokens or self.cache_write_tokens):
+            text += (f" [nada em cache: o system pode estar abaixo do mínimo de "
+                     f"{PROMPT_CACHE_MIN_TOKENS} tokens ({PROMPT_CACHE_MIN_TOKENS_HAIKU} no Haiku)]")
+        return text
+
+
+PROMPT_CACHE_STATS = PromptCacheStats()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CACHE DE RESPOSTAS DA API
+Guarda em disco a resposta de cada requisição para não pagar de novo por
+uma resposta idêntica ao rodar os scripts outra vez
+
+A chave é modelo + hash do prompt + hashes das imagens (na ordem) +
+max_tokens. Entradas vencem depois de RESPONSE_CACHE_TTL segundos e o
+total em disco é limitado (as menos usadas saem primeiro).
+
+O diretório é varrido uma vez, na primeira gravação (soma os tamanhos e
+apaga as vencidas); depois o total é mantido a cada gravação, como no
+image_cache. Só quando passa do limite há nova varredura, que despeja até
+EVICT_TARGET do limite para não varrer de novo na gravação seguinte.
+
+--refresh na linha de comando ignora o cache (as respostas novas são
+gravadas por cima).
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import hashlib
+import threading
+from pathlib import Path
+
+RESPONSE_CACHE_DIR = os.environ.get("FOLTZ_RESPONSE_CACHE_DIR", ".cache_respostas")
+RESPONSE_CACHE_TTL = int(os.environ.get("FOLTZ_RESPONSE_CACHE_TTL", 30 * 24 * 3600))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("FOLTZ_RESPONSE_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+EVICT_TARGET = 0.9  # fração do limite que sobra depois de um despejo
+RESPONSE_CACHE_ENABLED = os.environ.get("FOLTZ_RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_REFRESH = "--refresh" in sys.argv
+
+# run_all_analysis.py define este arquivo para somar os hits de cada script
+RESPONSE_CACHE_STATS_FILE = os.environ.get("FOLTZ_RESPONSE_CACHE_STATS")
+
+
+def request_fingerprint(prompt, images, system=None):
+    """(hash do system + prompt, hashes das imagens na ordem) — calcule uma vez por lote"""
+    text = prompt if system is None else f"{system}\n\n{prompt}"
+    prompt_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    image_hashes = tuple(
+        hashlib.sha256(block["source"]["data"].encode('ascii')).hexdigest() for block in images
+    )
+    return prompt_hash, image_hashes
+
+
+class ResponseCache:
+    """
+    Cache em disco: <dir>/<2 primeiros chars>/<chave>.json
+
+    Cada entrada guarda o texto, o modelo e quando foi criada (para o TTL);
+    o mtime do arquivo marca o último acesso (para o despejo LRU).
+    Contadores e total em disco ficam atrás de um lock (get/put podem vir
+    de várias threads, ex.: batch_pipeline).
+    """
+
+    def __init__(self, cache_dir=RESPONSE_CACHE_DIR, ttl=RESPONSE_CACHE_TTL,
+                 max_bytes=RESPONSE_CACHE_MAX_BYTES, enabled=RESPONSE_CACHE_ENABLED,
+                 refresh=RESPONSE_CACHE_REFRESH):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._total_bytes = None  # conhecido depois da primeira varredura
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model, fingerprint, max_tokens):
+        prompt_hash, image_hashes = fingerprint
+        params = f"{model}|{prompt_hash}|{','.join(image_hashes)}|{max_tokens}"
+        return hashlib.sha256(params.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _lookup(self, model, fingerprint, max_tokens):
+        """Texto em cache ou None, sem contar hit/miss (apaga a entrada vencida)"""
+        entry = self._entry_path(self.make_key(model, fingerprint, max_tokens))
+        try:
+            raw = entry.read_bytes()
+            data = json.loads(raw)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if time.time() - data["created_at"] > self.ttl:
+            entry.unlink(missing_ok=True)
+            with self._lock:
+                self.expired += 1
+                if self._total_bytes is not None:
+                    self._total_bytes -= len(raw)
+            return None
+
+        os.utime(entry)
+        return data["text"]
+
+    def _count(self, found):
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, model, fingerprint, max_tokens):
+        """Texto da resposta em cache ou None (conta hit/miss)"""
+        if not self.enabled or self.refresh:
+            return None
+        text = self._lookup(model, fingerprint, max_tokens)
+        self._count(text is not None)
+        return text
+
+    def get_any(self, models, fingerprint, max_tokens):
+        """
+        (texto, modelo) da primeira resposta em cache entre os modelos de
+        fallback, ou (None, None). Conta um hit ou um miss por consulta, não
+        um por modelo. max_tokens pode ser um número ou uma função modelo -> número
+        """
+        if not self.enabled or self.refresh:
+            return None, None
+        for model in models:
+            tokens = max_tokens(model) if callable(max_tokens) else max_tokens
+            text = self._lookup(model, fingerprint, tokens)
+            if text is not None:
+                self._count(True)
+                return text, model
+        self._count(False)
+        return None, None
+
+    def put(self, model, fingerprint, max_tokens, text):
+        """Grava a resposta (atômico) e despeja as menos usadas se passar do limite"""
+        if not self.enabled or not text:
+            return
+
+        entry = self._entry_path(self.make_key(model, fingerprint, max_tokens))
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"model": model, "max_tokens": max_tokens, "created_at": time.time(), "text": text}
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+        tmp_path = entry.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        with self._lock:
+            try:
+                replaced = entry.stat().st_size  # --refresh grava por cima
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, entry)
+
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += len(data) - replaced
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        """[(mtime, tamanho, caminho)] das entradas válidas; apaga as vencidas (com o lock)"""
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            # Sem ler o JSON: o mtime nunca é anterior à criação
+            if now - stat.st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                self.expired += 1  # vencida, não despejada
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        """Remove vencidas e as menos usadas até EVICT_TARGET do limite (com o lock)"""
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET
+        for _, size, path in entries:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            self.evictions += 1
+            total -= size
+        self._total_bytes = total
+
+    def stats(self):
+        with self._lock:
+            hits, misses, expired, evictions = self.hits, self.misses, self.expired, self.evictions
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': (hits / lookups * 100) if lookups else 0.0,
+            'expired': expired,
+            'evictions': evictions,
+        }
+
+    def report(self):
+        s = self.stats()
+        suffix = " [--refresh: cache ignorado]" if self.refresh else ""
+        return (f"Cache de respostas: {s['hits']} hits, {s['misses']} misses "
+                f"({s['hit_rate']:.1f}%), {s['expired']} vencidas, {s['evictions']} despejadas{suffix}")
+
+    def append_stats(self, stats_file):
+        """Acrescenta as estatísticas desta execução (uma linha JSON)"""
+        if self.hits or self.misses:
+            with open(stats_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"script": Path(sys.argv[0]).name, **self.stats()}) + "\n")
+
+
+def read_stats(stats_file):
+    """Soma as linhas gravadas por append_stats: (hits, misses, taxa %)"""
+    hits = misses = 0
+    try:
+        with open(stats_file, encoding='utf-8') as f:
+            for line in f:
+                data = json.loads(line)
+                hits += data["hits"]
+                misses += data["misses"]
+    except FileNotFoundError:
+        pass
+    lookups = hits + misses
+    return hits, misses, (hits / lookups * 100) if lookups else 0.0
+
+
+# Instância compartilhada pelos scripts de análise
+RESPONSE_CACHE = ResponseCache()
+if RESPONSE_CACHE_STATS_FILE:
+    atexit.register(RESPONSE_CACHE.append_stats, RESPONSE_CACHE_STATS_FILE)
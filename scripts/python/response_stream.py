@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RESPOSTAS EM STREAMING COM GRAVAÇÃO INCREMENTAL (modo --stream)
+Em vez de esperar a resposta inteira (até 8000 tokens) para gravar tudo de
+uma vez, o texto vai para o arquivo do lote linha a linha, à medida que chega
+
+- Cada seção de imagem (**IMAGEM lote-n (arquivo)**) é confirmada quando o
+  cabeçalho da seção seguinte chega (a última, no fim da resposta): um corte
+  no token 7900 perde só a seção em andamento, não o lote
+- Se o executor repetir a requisição, o arquivo é reescrito com as seções já
+  confirmadas e as repetidas pelo modelo são descartadas
+- Por lote: tempo até o primeiro token (TTFT) e tokens/s da geração
+
+Corte da conexão no meio do stream vira APIConnectionError, para o
+executor tratar como retentável (e não como erro fatal).
+"""
+
+import re
+import sys
+import time
+import threading
+from pathlib import Path
+
+import anthropic
+
+SECTION_HEADER = re.compile(r"^\*\*IMAGEM \d+-\d+ \((?P<name>[^)\n]+)\)\*\*", re.MULTILINE)
+
+# Erros de transporte do httpx usado pelo SDK (leitura do stream não é embrulhada pelo SDK)
+_httpx = sys.modules[type(anthropic.DEFAULT_CONNECTION_LIMITS).__module__.split(".")[0]]
+
+
+class SectionWriter:
+    """
+    Grava o texto do lote em path à medida que chega e chama
+    on_section(nome do arquivo) quando a seção de uma imagem fica completa
+    """
+
+    def __init__(self, path, header="", on_section=None):
+        self.path = Path(path)
+        self.header = header
+        self.on_section = on_section
+        self.committed = {}   # nome do arquivo -> texto da seção, na ordem em que chegaram
+        self.file = None
+
+    def begin(self):
+        """Nova tentativa: recomeça o arquivo com o cabeçalho e as seções já confirmadas"""
+        self.close()
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.file.write(self.header)
+        for section in self.committed.values():
+            self.file.write(section)
+        self.file.flush()
+        self.pending = ""          # linha ainda incompleta
+        self.section_name = None
+        self.section_lines = []
+        self.skip = bool(self.committed)  # preâmbulo repetido numa nova tentativa
+
+    def write(self, text):
+        self.pending += text
+        *lines, self.pending = self.pending.split("\n")
+        for line in lines:
+            self._line(line + "\n")
+        if lines:
+            self.file.flush()
+
+    def _line(self, line):
+        match = SECTION_HEADER.match(line)
+        if match:
+            self._commit()
+            self.section_name = match.group("name")
+            self.section_lines = []
+            self.skip = self.section_name in self.committed
+        if not self.skip:
+            self.file.write(line)
+        self.section_lines.append(line)
+
+    def _commit(self):
+        name = self.section_name
+        if name is None or name in self.committed:
+            return
+        self.committed[name] = "".join(self.section_lines)
+        if self.on_section:
+            self.on_section(name)
+
+    def finish(self):
+        """Fim da resposta: grava o resto e confirma a última seção"""
+        if self.pending:
+            self._line(self.pending)
+            self.pending = ""
+        self._commit()
+        self.close()
+
+    def abort(self):
+        """Resposta cortada: deixa no arquivo o que chegou, sem confirmar a seção em andamento"""
+        if self.file and self.pending and not self.skip:
+            self.file.write(self.pending)
+        self.close()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class StreamTimer:
+    """Tempos de uma resposta em streaming"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.finished = None
+        self.output_tokens = 0
+
+    def token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+
+    def finish(self, usage):
+        self.finished = time.perf_counter()
+        self.output_tokens = usage.output_tokens or 0
+
+    @property
+    def ttft(self):
+        return (self.first_token or self.finished or time.perf_counter()) - self.started
+
+    @property
+    def tokens_per_second(self):
+        generating = self.finished - (self.first_token or self.finished)
+        return self.output_tokens / generating if generating > 0 else 0.0
+
+    def describe(self):
+        return (f"TTFT {self.ttft:.2f}s, {self.output_tokens} tokens a "
+                f"{self.tokens_per_second:.1f} tokens/s")
+
+
+class StreamStats:
+    """TTFT e tokens/s por lote"""
+
+    def __init__(self):
+        self.batches = []   # (lote, modelo, StreamTimer)
+        self._lock = threading.Lock()
+
+    def add(self, batch_number, model, timer):
+        with self._lock:
+            self.batches.append((batch_number, model, timer))
+
+    def report(self):
+        if not self.batches:
+            return "Streaming: nenhuma resposta"
+        ttfts = sorted(timer.ttft for _, _, timer in self.batches)
+        tokens = sum(timer.output_tokens for _, _, timer in self.batches)
+        generating = sum(timer.finished - timer.first_token for _, _, timer in self.batches if timer.first_token)
+        rate = tokens / generating if generating > 0 else 0.0
+        return (f"Streaming: {len(self.batches)} respostas, TTFT médio {sum(ttfts) / len(ttfts):.2f}s "
+                f"(máx {ttfts[-1]:.2f}s), {tokens} tokens a {rate:.1f} tokens/s")
+
+
+STREAM_STATS = StreamStats()
+
+
+def stream_sender(writer=None):
+    """
+    send para RequestExecutor.create: abre um stream, repassa o texto ao
+    writer e devolve a mensagem final; o StreamTimer da última tentativa
+    fica em send.timer
+    """
+    def send(client, **params):
+        send.timer = timer = StreamTimer()
+        if writer:
+            writer.begin()
+        try:
+            with client.messages.stream(**params) as stream:
+                try:
+                    for event in stream:
+                        if event.type == "content_block_delta":
+                            timer.token()
+                            if writer and event.delta.type == "text_delta":
+                                writer.write(event.delta.text)
+                    message = stream.get_final_message()
+                except _httpx.TransportError as e:
+                    raise anthropic.APIConnectionError(
+                        message=f"stream interrompido: {e}", request=stream.response.request) from e
+        except BaseException:
+            if writer:
+                writer.abort()
+            raise
+        timer.finish(message.usage)
+        if writer:
+            # Cortada em max_tokens: a última seção está incompleta e não é confirmada
+            if message.stop_reason == "max_tokens":
+                writer.abort()
+            else:
+                writer.finish()
+        return message
+
+    send.timer = None
+    return send
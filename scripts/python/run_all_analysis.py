@@ -3,17 +3,32 @@
 """
 SCRIPT MASTER - EXECUTA TODAS AS ANÁLISES
 Roda todos os scripts de análise de produtos automaticamente
+
+No fim, resume o uso da API da execução (usage_ledger): total, por etapa
+e por modelo, com alerta de alta nos tokens por imagem
+
+--seo: análise e SEO num passo único (analyze_products_complete --seo), no
+lugar de generate_seo_content + analyze_products_complete
 """
 
 import os
 import sys
+import tempfile
 import subprocess
 from datetime import datetime
 
+from response_cache import read_stats
+from usage_ledger import run_report
+
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
-def run_script(script_name, description):
+# Repassado aos scripts: --refresh ignora o cache de respostas,
+# --resume continua a última execução (run_manifest)
+FORWARDED_ARGS = [arg for arg in sys.argv[1:] if arg in ("--refresh", "--resume")]
+COMBINED_SEO = "--seo" in sys.argv
+
+def run_script(script_name, description, args=()):
     """Executa um script Python e retorna sucesso/falha"""
     print("\n" + "="*80)
     print(f" {description} ".center(80, "="))
@@ -21,7 +36,7 @@ def run_script(script_name, description):
 
     try:
         result = subprocess.run(
-            [sys.executable, script_name],
+            [sys.executable, script_name, *FORWARDED_ARGS, *args],
             capture_output=False,
             text=True,
             check=True
@@ -48,17 +63,32 @@ def main():
 
     results = {}
 
+    # Cada script acrescenta aqui os hits/misses do cache de respostas
+    stats_fd, stats_file = tempfile.mkstemp(prefix="cache_respostas_", suffix=".jsonl")
+    os.close(stats_fd)
+    os.environ["FOLTZ_RESPONSE_CACHE_STATS"] = stats_file
+
+    # Todas as etapas registram o uso da API sob a mesma execução
+    run_id = start_time.strftime("%Y%m%d_%H%M%S")
+    os.environ["FOLTZ_USAGE_RUN_ID"] = run_id
+
     # Lista de scripts para executar
-    scripts = [
-        ("extract_colors.py", "1/3 - EXTRAÇÃO DE CORES DOMINANTES"),
-        ("generate_seo_content.py", "2/3 - GERAÇÃO DE CONTEÚDO SEO"),
-        ("analyze_products_complete.py", "3/3 - ANÁLISE COMPLETA DE PRODUTOS")
-    ]
+    if COMBINED_SEO:
+        scripts = [
+            ("extract_colors.py", "1/2 - EXTRAÇÃO DE CORES DOMINANTES", ()),
+            ("analyze_products_complete.py", "2/2 - ANÁLISE + CONTEÚDO SEO (PASSO ÚNICO)", ("--seo",))
+        ]
+    else:
+        scripts = [
+            ("extract_colors.py", "1/3 - EXTRAÇÃO DE CORES DOMINANTES", ()),
+            ("generate_seo_content.py", "2/3 - GERAÇÃO DE CONTEÚDO SEO", ()),
+            ("analyze_products_complete.py", "3/3 - ANÁLISE COMPLETA DE PRODUTOS", ())
+        ]
 
     # Executa cada script
-    for script, description in scripts:
+    for script, description, args in scripts:
         if os.path.exists(script):
-            results[script] = run_script(script, description)
+            results[script] = run_script(script, description, args)
         else:
             print(f"\n✗ Script não encontrado: {script}")
             results[script] = False
@@ -85,13 +115,28 @@ def main():
 
     print(f"\n{successful}/{total} scripts executados com sucesso")
 
+    hits, misses, hit_rate = read_stats(stats_file)
+    os.remove(stats_file)
+    print(f"Cache de respostas: {hits} hits, {misses} misses ({hit_rate:.1f}%)")
+
+    print()
+    for line in run_report(run_id):
+        print(line)
+
     print("\nArquivos gerados:")
-    output_files = [
-        "cores_dominantes.json",
-        "conteudo_seo_*.txt",
-        "analise_lote_*.txt",
-        "analise_produtos_completa.txt"
-    ]
+    if COMBINED_SEO:
+        output_files = [
+            "cores_dominantes.json",
+            "conteudo_seo_lote_*.txt",
+            ".produtos/analises.jsonl"
+        ]
+    else:
+        output_files = [
+            "cores_dominantes.json",
+            "conteudo_seo_*.txt",
+            "analise_lote_*.txt",
+            "analise_produtos_completa.txt"
+        ]
 
     for pattern in output_files:
         print(f"  • {pattern}")
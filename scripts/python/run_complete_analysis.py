@@ -3,17 +3,30 @@
 """
 ANÁLISE COMPLETA - TODOS OS 5 LOTES
 Processa as 50 imagens em 5 lotes de 10
+Os lotes são enviados em paralelo (claude_dispatcher), dentro dos limites
+de requisições/tokens por minuto, e salvos na ordem
+
+O andamento fica no manifesto da execução (run_manifest); --resume reenvia
+só as imagens que ainda não foram concluídas.
 """
 
 import os
 import sys
-import base64
-from pathlib import Path
-from PIL import Image
-import io
-import anthropic
-from datetime import datetime
 import time
+import asyncio
+from functools import partial
+from claude_dispatcher import API_CONCURRENCY, BatchDispatcher, estimate_request_tokens
+from image_cache import IMAGE_CACHE
+from image_pool import PREPROCESSOR
+from claude_client import API_STATS, close_async_client, get_async_client
+from response_cache import RESPONSE_CACHE, request_fingerprint
+from run_manifest import RunManifest
+from usage_ledger import USAGE_LEDGER
+from foltz_imaging import (
+    FORMAT_AUTO, PAYLOAD_STATS, RESIZE_QUALITY, TASK_ANALYSIS,
+    encode_image_block, estimate_batch_tokens, list_images
+)
+from datetime import datetime
 
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -21,76 +34,45 @@ if sys.platform == 'win32':
 from dotenv import load_dotenv
 load_dotenv()
 
-MAX_DIMENSION = 2000
+RESIZE_MODE = RESIZE_QUALITY  # RESIZE_FAST troca qualidade por velocidade
+IMAGE_TASK = TASK_ANALYSIS  # orçamento de pixels/tokens por imagem (ver foltz_imaging)
+OUTPUT_FORMAT = FORMAT_AUTO  # menor entre JPEG/WebP; FORMAT_SOURCE mantém o formato original
 IMAGE_FOLDERS = ["seedream", "id_visual"]
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
+
+# Função de codificação enviada aos workers do pool
+ENCODE_IMAGE = partial(encode_image_block, mode=RESIZE_MODE, task=IMAGE_TASK, output_format=OUTPUT_FORMAT)
 IMAGES_PER_BATCH = 10
 TOTAL_BATCHES = 5
+MODEL = "claude-3-haiku-20240307"
+MAX_TOKENS = 4000
+RUN_NAME = "analise_completa"  # .execucoes/analise_completa.json
 
 def log(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
     print(f"[{timestamp}] {message}")
 
-def resize_and_encode_image(image_path, max_dimension=MAX_DIMENSION):
-    with Image.open(image_path) as img:
-        width, height = img.size
-        if width > max_dimension or height > max_dimension:
-            if width > height:
-                new_width = max_dimension
-                new_height = int((max_dimension / width) * height)
-            else:
-                new_height = max_dimension
-                new_width = int((max_dimension / height) * width)
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        buffer = io.BytesIO()
-        img.save(buffer, format=img.format or 'JPEG', quality=90)
-        return base64.b64encode(buffer.getvalue()).decode('utf-8')
-
-def get_media_type(file_path):
-    ext = file_path.suffix.lower()
-    return {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
-            '.gif': 'image/gif', '.webp': 'image/webp'}.get(ext, 'image/jpeg')
-
-def collect_images(start_index, count):
-    """Coleta imagens específicas"""
-    all_images = []
-    for folder in IMAGE_FOLDERS:
-        folder_path = Path(folder)
-        if folder_path.exists():
-            for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp']:
-                all_images.extend(sorted(folder_path.glob(ext)))
-
-    selected = all_images[start_index:start_index + count]
+def collect_images(paths, manifest):
+    """Codifica as imagens de um lote; as que falham ficam marcadas no manifesto"""
     images = []
-    image_names = []
+    encoded_paths = []
 
-    log(f"  Processando {len(selected)} imagens (índices {start_index}-{start_index+len(selected)-1})...")
+    log(f"  Processando {len(paths)} imagens...")
 
-    for img_path in selected:
-        try:
-            image_base64 = resize_and_encode_image(img_path)
-            images.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": get_media_type(img_path),
-                    "data": image_base64
-                }
-            })
-            image_names.append(img_path.name)
-        except Exception as e:
-            log(f"    ERRO: {e}")
-
-    return images, image_names
-
-def analyze_batch(images, image_names, batch_number):
-    """Analisa um lote"""
-    if not ANTHROPIC_API_KEY:
-        return None
+    for img_path, block, error in PREPROCESSOR.map(ENCODE_IMAGE, paths):
+        if error:
+            log(f"    ERRO: {error}")
+            manifest.fail_image(img_path, error)
+            continue
+        log(f"    {PAYLOAD_STATS.add(img_path, block)}")
+        images.append(block)
+        encoded_paths.append(img_path)
 
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    return images, encoded_paths
 
-    prompt = f"""Analise estas {len(images)} imagens de jerseys de futebol para e-commerce.
+def build_prompt(num_images, batch_number):
+    """Prompt de análise de um lote"""
+    return f"""Analise estas {num_images} imagens de jerseys de futebol para e-commerce.
 
 Para CADA IMAGEM, forneça:
 
@@ -117,18 +99,26 @@ Para CADA IMAGEM, forneça:
 
 Seja detalhado e específico."""
 
-    content = [{"type": "text", "text": prompt}] + images
-
-    try:
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=4000,
-            messages=[{"role": "user", "content": content}]
-        )
-        return message.content[0].text
-    except Exception as e:
-        log(f"  ✗ Erro: {e}")
-        return None
+def content_fingerprint(content):
+    """Chave do cache de respostas para content = prompt + imagens"""
+    return request_fingerprint(content[0]["text"], content[1:])
+
+def cached_analysis(content):
+    """Análise já feita antes para o mesmo prompt e imagens, ou None"""
+    return RESPONSE_CACHE.get(MODEL, content_fingerprint(content), MAX_TOKENS)
+
+async def analyze_batch(client, content):
+    """Analisa um lote (content = prompt + imagens)"""
+    started = time.perf_counter()
+    message = await client.messages.create(
+        model=MODEL,
+        max_tokens=MAX_TOKENS,
+        messages=[{"role": "user", "content": content}]
+    )
+    USAGE_LEDGER.record(message, images=len(content) - 1, latency=time.perf_counter() - started)
+    text = message.content[0].text
+    RESPONSE_CACHE.put(MODEL, content_fingerprint(content), MAX_TOKENS, text)
+    return text
 
 def save_results(result, batch_number):
     """Salva resultados"""
@@ -160,65 +150,104 @@ def main():
     log(f"  ├─ Total de lotes: {TOTAL_BATCHES}")
     log(f"  ├─ Imagens por lote: {IMAGES_PER_BATCH}")
     log(f"  ├─ Total de imagens: {TOTAL_BATCHES * IMAGES_PER_BATCH}")
-    log(f"  └─ Modelo: Haiku (4000 tokens)")
-
-    # Limpa o arquivo consolidado anterior
-    with open("analise_produtos_completa.txt", 'w', encoding='utf-8') as f:
-        f.write("ANÁLISE COMPLETA DE PRODUTOS - FOLTZ FANWEAR\n")
-        f.write(f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
-        f.write("="*80 + "\n")
-
-    successful_batches = 0
-    failed_batches = []
+    log(f"  ├─ Lotes em paralelo: {API_CONCURRENCY}")
+    log(f"  └─ Modelo: Haiku ({MAX_TOKENS} tokens)")
 
-    for batch_num in range(1, TOTAL_BATCHES + 1):
-        log("\n" + "="*80)
-        log(f"LOTE {batch_num}/{TOTAL_BATCHES}")
-        log("="*80)
-
-        start_idx = (batch_num - 1) * IMAGES_PER_BATCH
-
-        images, names = collect_images(start_idx, IMAGES_PER_BATCH)
-
-        if not images:
-            log("  ✗ Sem imagens neste lote")
-            failed_batches.append(batch_num)
-            continue
+    if not ANTHROPIC_API_KEY:
+        log("✗ ANTHROPIC_API_KEY não encontrada")
+        return
 
-        log(f"\n  Enviando {len(images)} imagens para Claude...")
+    manifest = RunManifest(RUN_NAME)
+    paths = list_images(IMAGE_FOLDERS)[:TOTAL_BATCHES * IMAGES_PER_BATCH]
+    todo = manifest.pending(paths)
+    total_batches = (len(todo) + IMAGES_PER_BATCH - 1) // IMAGES_PER_BATCH
 
-        result = analyze_batch(images, names, batch_num)
+    if manifest.resumed:
+        log(f"\n♻️  Retomando: {len(paths) - len(todo)} imagens já concluídas, {len(todo)} a enviar")
+    else:
+        # Limpa o arquivo consolidado anterior
+        with open("analise_produtos_completa.txt", 'w', encoding='utf-8') as f:
+            f.write("ANÁLISE COMPLETA DE PRODUTOS - FOLTZ FANWEAR\n")
+            f.write(f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
+            f.write("="*80 + "\n")
 
+    successful_batches = 0
+    failed_batches = []
+    dispatcher = BatchDispatcher(API_CONCURRENCY, tokens_fn=estimate_request_tokens)
+
+    def iter_batch_jobs():
+        """Monta cada lote só quando o despachante tem vaga para ele"""
+        for index, start_idx in enumerate(range(0, len(todo), IMAGES_PER_BATCH), 1):
+            batch_num = manifest.next_batch()
+            log("\n" + "="*80)
+            log(f"LOTE {batch_num} ({index}/{total_batches})")
+            log("="*80)
+
+            images, encoded_paths = collect_images(todo[start_idx:start_idx + IMAGES_PER_BATCH], manifest)
+
+            if not images:
+                log("  ✗ Sem imagens neste lote")
+                failed_batches.append(batch_num)
+                continue
+
+            manifest.assign(batch_num, encoded_paths)
+            content = [{"type": "text", "text": build_prompt(len(images), batch_num)}] + images
+            log(f"\n  Enviando {len(images)} imagens para Claude...")
+            log(f"  Tokens de imagem estimados: ~{estimate_batch_tokens(images)}")
+            log(f"  {PAYLOAD_STATS.end_batch()}")
+            yield batch_num, content
+
+    def on_result(batch_num, result):
+        """Chamado na ordem dos lotes, mesmo que as respostas cheguem fora de ordem"""
+        nonlocal successful_batches
         if result:
             filename = save_results(result, batch_num)
-            log(f"  ✓ Sucesso!")
+            manifest.complete(batch_num, filename)
+            log(f"  ✓ Lote {batch_num}: sucesso!")
             log(f"  ✓ Salvo: {filename}")
             successful_batches += 1
         else:
-            log(f"  ✗ Falhou")
+            error = dispatcher.errors.get(batch_num, 'sem resposta')
+            manifest.fail(batch_num, error)
+            log(f"  ✗ Lote {batch_num} falhou: {error}")
             failed_batches.append(batch_num)
 
-        # Pausa entre lotes (exceto no último)
-        if batch_num < TOTAL_BATCHES:
-            log("  Aguardando 2s...")
-            time.sleep(2)
+    async def run_batches():
+        # Um cliente para todos os lotes: as conexões keep-alive são reaproveitadas
+        client = get_async_client(ANTHROPIC_API_KEY)
+        try:
+            # Lotes em cache não passam pelo limitador nem pela API
+            await dispatcher.run(partial(analyze_batch, client), iter_batch_jobs(), on_result,
+                                 lookup=cached_analysis)
+        finally:
+            await close_async_client()
+
+    asyncio.run(run_batches())
 
     # Resumo final
     print("\n" + "="*80)
     print(" RESUMO FINAL ".center(80, "="))
     print("="*80)
 
-    log(f"Lotes bem-sucedidos: {successful_batches}/{TOTAL_BATCHES}")
-    log(f"Imagens analisadas: {successful_batches * IMAGES_PER_BATCH}")
+    log(f"Lotes bem-sucedidos: {successful_batches}/{total_batches}")
+    log(manifest.report())
 
     if failed_batches:
         log(f"Lotes com falha: {failed_batches}")
+        log("Para reenviar só o que falhou: python run_complete_analysis.py --resume")
     else:
         log("✓ Todos os lotes processados com sucesso!")
 
     log(f"\nArquivos gerados:")
     log(f"  ├─ analise_produtos_completa.txt (consolidado)")
     log(f"  └─ analise_lote_*.txt ({successful_batches} arquivos)")
+    log(IMAGE_CACHE.report())
+    log(PAYLOAD_STATS.report())
+    log(dispatcher.report())
+    log(PREPROCESSOR.report())
+    log(RESPONSE_CACHE.report())
+    log(API_STATS.report())
+    log(USAGE_LEDGER.report())
 
     print("="*80)
 
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MANIFESTO DE EXECUÇÃO (retomada com --resume)
+Registra em disco, imagem por imagem, o que cada análise já fez
+
+- Cada imagem tem um ID estável (hash do conteúdo): renomear, mover ou
+  adicionar imagens ao catálogo não muda o ID das outras. O hash só é
+  calculado quando há retomada: numa execução nova o ID é provisório
+  (pelo caminho) e vira o hash do conteúdo ao retomar, se o arquivo não
+  mudou (um arquivo renomeado entre as duas execuções é reenviado)
+- Para cada ID: lote em que foi enviada, status (pendente, enviada,
+  concluída, falhou), arquivo de saída e erro
+- Cada mudança é uma linha acrescentada a <nome>.jsonl (diário); o JSON
+  completo só é regravado (compactação) a cada COMPACT_EVERY linhas, ao
+  retomar e no fim do processo. Uma interrupção perde no máximo os lotes
+  em voo: ao carregar, o diário é reaplicado sobre o JSON
+- Seguro entre threads (o despachante monta lotes numa thread e grava os
+  resultados em outra)
+
+Com --resume, o script reenvia só o que não está concluído.
+"""
+
+import os
+import sys
+import json
+import atexit
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from image_cache import file_sha256
+
+RUN_MANIFEST_DIR = os.environ.get("FOLTZ_RUN_MANIFEST_DIR", ".execucoes")
+RUN_MANIFEST_VERSION = 1
+RESUME = "--resume" in sys.argv
+# Linhas do diário antes de regravar o JSON completo
+COMPACT_EVERY = int(os.environ.get("FOLTZ_RUN_MANIFEST_COMPACT", "1000"))
+
+STATUS_PENDING = "pendente"
+STATUS_SENT = "enviada"
+STATUS_DONE = "concluída"
+STATUS_FAILED = "falhou"
+
+ID_LENGTH = 16
+PROVISIONAL_PREFIX = "p:"  # ID pelo caminho, até a primeira retomada
+
+
+class RunManifest:
+    """
+    .execucoes/<nome>.json com {"images": {id: entrada}, "files": {caminho: stat + id}}
+
+    Sem resume, começa um manifesto novo (o anterior é substituído); com
+    resume, continua o existente e numera os lotes novos depois dos antigos.
+    """
+
+    def __init__(self, name, resume=RESUME, manifest_dir=RUN_MANIFEST_DIR):
+        self.name = name
+        self.path = Path(manifest_dir) / f"{name}.json"
+        self.journal_path = self.path.with_suffix(".jsonl")
+        self.hashed = 0
+        self.journaled = 0     # linhas no diário desde a última compactação
+        self.compactions = 0
+        self._dirty = []       # mudanças ainda não escritas no diário
+        self._journal = None
+        self._lock = threading.RLock()
+        self.state = self._load() if resume else None
+        self.resumed = self.state is not None
+        self.content_ids = self.resumed
+        if self.state is None:
+            self.state = {"version": RUN_MANIFEST_VERSION, "name": name,
+                          "created_at": datetime.now().isoformat(), "last_batch": 0,
+                          "images": {}, "files": {}}
+            self.journal_path.unlink(missing_ok=True)  # diário de um manifesto substituído
+        else:
+            self._upgrade_provisional()
+            self.save()
+        self.batches = {}   # lote -> [ids] desta execução
+        atexit.register(self.close)
+
+    def _load(self):
+        try:
+            state = json.loads(self.path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return None
+        if state.get("version") != RUN_MANIFEST_VERSION:
+            return None
+        try:
+            with open(self.journal_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        change = json.loads(line)
+                    except ValueError:
+                        break  # última linha cortada por uma interrupção
+                    self._apply(state, change)
+        except FileNotFoundError:
+            pass
+        return state
+
+    @staticmethod
+    def _apply(state, change):
+        """Reaplica uma linha do diário (cada linha traz o valor inteiro: idempotente)"""
+        if "image" in change:
+            state["images"][change["image"]] = change["entry"]
+        elif "file" in change:
+            state["files"][change["file"]] = change["stat"]
+        if "last_batch" in change:
+            state["last_batch"] = max(state["last_batch"], change["last_batch"])
+
+    def _upgrade_provisional(self):
+        """Ao retomar: IDs provisórios viram hash do conteúdo (se o arquivo não mudou)"""
+        for key, known in list(self.state["files"].items()):
+            old_id = known["id"]
+            if not old_id.startswith(PROVISIONAL_PREFIX):
+                continue
+            try:
+                stat = os.stat(key)
+            except OSError:
+                continue  # sumiu ou foi renomeado: fica com o ID provisório
+            if known["size"] != stat.st_size or known["mtime"] != stat.st_mtime_ns:
+                continue  # mudou: image_id calcula o hash novo quando for usada
+            image_id = file_sha256(key)[:ID_LENGTH]
+            self.hashed += 1
+            known["id"] = image_id
+            entry = self.state["images"].pop(old_id, None)
+            if entry is not None:
+                current = self.state["images"].get(image_id)
+                # Mesmo conteúdo em dois caminhos: vale a entrada já concluída
+                if current is None or current["status"] != STATUS_DONE:
+                    self.state["images"][image_id] = entry
+
+    def _mark(self, change):
+        self._dirty.append(change)
+
+    def _mark_image(self, image_id):
+        self._mark({"image": image_id, "entry": dict(self.state["images"][image_id])})
+
+    def _commit(self):
+        """Acrescenta as mudanças pendentes ao diário; compacta a cada COMPACT_EVERY linhas"""
+        if not self._dirty:
+            return
+        if self._journal is None:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.write("".join(json.dumps(change, ensure_ascii=False) + "\n" for change in self._dirty))
+        self._journal.flush()
+        self.journaled += len(self._dirty)
+        self._dirty = []
+        if self.journaled >= COMPACT_EVERY:
+            self.save()
+
+    def save(self):
+        """Grava o JSON completo (atômico) e esvazia o diário"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.state["updated_at"] = datetime.now().isoformat()
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self.state, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, self.path)
+            # Só depois do JSON: se cair entre os dois, reaplicar o diário não muda nada
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self.journal_path.unlink(missing_ok=True)
+            self._dirty = []
+            self.journaled = 0
+            self.compactions += 1
+
+    def close(self):
+        """Compacta no fim do processo (JSON completo, sem diário)"""
+        with self._lock:
+            if self.journaled or self._dirty:
+                self.save()
+
+    def image_id(self, image_path):
+        """
+        ID pelo conteúdo (só recalcula o hash se tamanho/mtime mudaram); numa
+        execução nova, provisório pelo caminho, sem ler o arquivo
+        """
+        key = str(image_path)
+        stat = os.stat(image_path)
+        known = self.state["files"].get(key)
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime_ns:
+            return known["id"]
+        if self.content_ids:
+            image_id = file_sha256(image_path)[:ID_LENGTH]
+            self.hashed += 1
+        else:
+            image_id = PROVISIONAL_PREFIX + hashlib.sha256(key.encode('utf-8')).hexdigest()[:ID_LENGTH]
+        self.state["files"][key] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "id": image_id}
+        self._mark({"file": key, "stat": self.state["files"][key]})
+        return image_id
+
+    def _entry(self, image_path):
+        image_id = self.image_id(image_path)
+        entry = self.state["images"].setdefault(image_id, {
+            "path": str(image_path), "batch": None, "status": STATUS_PENDING, "output": None, "error": None,
+        })
+        entry["path"] = str(image_path)
+        return image_id, entry
+
+    def pending(self, image_paths=None):
+        """
+        Registra image_paths e devolve os que ainda não foram concluídos, na
+        ordem (uma vez por ID: cópias idênticas só se juntam ao retomar).
+        Sem image_paths: tudo o que o manifesto já conhece e não foi concluído
+        """
+        if image_paths is None:
+            image_paths = [Path(entry["path"]) for entry in self.state["images"].values()
+                           if entry["status"] != STATUS_DONE]
+
+        todo = []
+        seen = set()
+        with self._lock:
+            for image_path in image_paths:
+                try:
+                    image_id, entry = self._entry(image_path)
+                except OSError:
+                    continue  # sumiu do disco
+                if entry["status"] != STATUS_DONE and image_id not in seen:
+                    seen.add(image_id)
+                    todo.append(Path(image_path))
+            self.save()
+        return todo
+
+    def next_batch(self):
+        """Número do próximo lote (continua a numeração ao retomar)"""
+        with self._lock:
+            self.state["last_batch"] += 1
+            return self.state["last_batch"]
+
+    def assign(self, batch_number, image_paths):
+        """Marca as imagens como enviadas no lote batch_number"""
+        with self._lock:
+            self.state["last_batch"] = max(self.state["last_batch"], batch_number)
+            ids = []
+            for image_path in image_paths:
+                image_id, entry = self._entry(image_path)
+                entry.update(batch=batch_number, status=STATUS_SENT, error=None)
+                ids.append(image_id)
+                self._mark_image(image_id)
+            self.batches[batch_number] = ids
+            self._mark({"last_batch": self.state["last_batch"]})
+            self._commit()
+
+    def _finish(self, batch_number, status, output=None, error=None):
+        with self._lock:
+            for image_id in self.batches.pop(batch_number, []):
+                self.state["images"][image_id].update(status=status, output=output, error=error)
+                self._mark_image(image_id)
+            self._commit()
+
+    def complete(self, batch_number, output):
+        self._finish(batch_number, STATUS_DONE, output=output)
+
+    def complete_image(self, batch_number, image_path, output):
+        """Uma imagem do lote concluída antes do resto (seção recebida em streaming)"""
+        with self._lock:
+            image_id, entry = self._entry(image_path)
+            ids = self.batches.get(batch_number, [])
+            if image_id in ids:
+                ids.remove(image_id)
+            entry.update(status=STATUS_DONE, output=output, error=None)
+            self._mark_image(image_id)
+            self._commit()
+
+    def fail(self, batch_number, error):
+        self._finish(batch_number, STATUS_FAILED, error=str(error)[:500])
+
+    def fail_image(self, image_path, error):
+        """Erro antes do envio (ex.: imagem que não abre)"""
+        with self._lock:
+            try:
+                image_id, entry = self._entry(image_path)
+            except OSError:
+                return
+            entry.update(status=STATUS_FAILED, error=str(error)[:500])
+            self._mark_image(image_id)
+            self._commit()
+
+    def report(self):
+        counts = {}
+        for entry in self.state["images"].values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        total = len(self.state["images"])
+        return (f"Manifesto da execução: {counts.get(STATUS_DONE, 0)}/{total} imagens concluídas, "
+                f"{counts.get(STATUS_FAILED, 0)} com falha, "
+                f"{counts.get(STATUS_PENDING, 0) + counts.get(STATUS_SENT, 0)} pendentes, "
+                f"{self.hashed} hashes calculados ({self.path})")
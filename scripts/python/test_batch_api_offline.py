@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTE OFFLINE DO MODO --batch-api
+Roda analyze_products_complete e generate_seo_content no modo Message
+Batches contra a API simulada local (mock_anthropic_server), sem rede:
+
+1. Interrompe a gravação dos resultados no meio
+2. Roda de novo: deve retomar o mesmo job, sem criar Message Batches novos,
+   e gravar só os lotes que faltaram
+"""
+
+import io
+import os
+import sys
+import tempfile
+import contextlib
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from PIL import Image
+from mock_anthropic_server import MockAnthropicServer
+
+CATALOG_IMAGES = 23
+BATCH_SECONDS = 1.0
+
+
+class Interrupted(Exception):
+    pass
+
+
+def create_catalog(folder, count):
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        Image.effect_noise((600, 600), 20 + i).convert('RGB').save(folder / f"jersey_{i:03d}.jpg", quality=80)
+
+
+def run_interrupted(module, stop_after):
+    """Roda o modo batch e simula Ctrl+C depois de stop_after resultados"""
+    original = module.run_batch_job
+    seen = []
+
+    def run_batch_job(client, name, requests_for, on_result, **kwargs):
+        def interrupting(custom_id, text, error):
+            if len(seen) == stop_after:
+                raise Interrupted()
+            seen.append(custom_id)
+            on_result(custom_id, text, error)
+        return original(client, name, requests_for, interrupting, **kwargs)
+
+    module.run_batch_job = run_batch_job
+    try:
+        module.run_batch_api()
+    except Interrupted:
+        pass
+    finally:
+        module.run_batch_job = original
+    return seen
+
+
+def check(name, module, save_name, expected_batches, server, quiet):
+    """Interrompe, retoma e confere que cada lote foi gravado exatamente uma vez"""
+    saves = []
+    original_save = getattr(module, save_name)
+
+    def counting_save(result, batch_number, *args):
+        saves.append(batch_number)
+        return original_save(result, batch_number, *args)
+
+    setattr(module, save_name, counting_save)
+    before = len(server.batches)
+    try:
+        with quiet():
+            first = run_interrupted(module, stop_after=1)
+        created = len(server.batches) - before
+
+        with quiet():
+            module.run_batch_api()
+    finally:
+        setattr(module, save_name, original_save)
+
+    ok = (created >= 1 and len(server.batches) - before == created
+          and sorted(saves) == list(range(1, expected_batches + 1)))
+    print(f"  {'✓' if ok else '✗'} {name}: {created} Message Batch(es), {len(first)} lote(s) antes da "
+          f"interrupção, {len(saves)} gravações para {expected_batches} lotes depois de retomar")
+    return ok
+
+
+def main():
+    print("=" * 70)
+    print("TESTE OFFLINE - MODO --batch-api".center(70))
+    print("=" * 70)
+
+    server = MockAnthropicServer(batch_seconds=BATCH_SECONDS).start()
+    scripts_dir = Path(__file__).resolve().parent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.environ.update({
+            "ANTHROPIC_API_KEY": "mock",
+            "ANTHROPIC_BASE_URL": server.url,
+            "FOLTZ_BATCH_JOBS_DIR": str(Path(tmp) / "jobs"),
+            "FOLTZ_BATCH_POLL_DELAY": "0.5",
+            "FOLTZ_IMAGE_CACHE_DIR": str(Path(tmp) / "cache"),
+        })
+        sys.path.insert(0, str(scripts_dir))
+        create_catalog(Path("seedream"), CATALOG_IMAGES)
+
+        quiet = lambda: contextlib.redirect_stdout(io.StringIO())
+
+        import analyze_products_complete as apc
+        import generate_seo_content as seo
+
+        results = [
+            check("analyze_products_complete", apc, "save_results",
+                  -(-CATALOG_IMAGES // apc.BATCH_API_IMAGES_PER_REQUEST), server, quiet),
+            check("generate_seo_content", seo, "save_seo_content",
+                  -(-CATALOG_IMAGES // seo.BATCH_SIZE), server, quiet),
+        ]
+        os.chdir(scripts_dir)
+
+    server.stop()
+    print("\n" + ("✓ Modo --batch-api OK" if all(results) else "✗ Falhas no modo --batch-api"))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTE OFFLINE DA DEDUPLICAÇÃO PERCEPTUAL (image_dedupe)
+Roda analyze_products_complete contra a API simulada local num catálogo
+sintético com jerseys distintas e variações quase idênticas
+(recompressão, fundo, escala), mais uma camisa reserva com o mesmo desenho
+e o mesmo brilho da titular, só que de outra cor:
+
+1. A reserva cai dentro do limite dos hashes de brilho (o teste da cor é
+   o que a separa)
+2. Só os representantes (e a reserva) vão para a API
+3. O consolidado tem uma seção para cada imagem, inclusive as duplicatas
+4. Todas as imagens terminam concluídas no manifesto
+"""
+
+import os
+import re
+import sys
+import json
+import subprocess
+import tempfile
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from PIL import Image, ImageDraw
+from mock_anthropic_server import MockAnthropicServer
+from run_manifest import STATUS_DONE
+from image_dedupe import DEDUPE_THRESHOLD, hamming, perceptual_hashes
+
+DISTINCT = 6       # jerseys diferentes
+VARIANTS = 3       # variações quase idênticas de cada uma (além da original)
+COLORS = [(200, 30, 30), (30, 60, 180), (20, 140, 60), (240, 200, 20), (120, 40, 140), (30, 30, 30)]
+AWAY_COLOR = (0, 126, 60)   # mesmo brilho ('L') que COLORS[0], outra cor
+
+
+def draw_jersey(index, background=(245, 245, 245), size=(600, 600), color=None):
+    """Silhueta de camisa com faixas que mudam por jersey"""
+    img = Image.new('RGB', size, background)
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    body = [(0.30, 0.15), (0.42, 0.10), (0.58, 0.10), (0.70, 0.15), (0.90, 0.30), (0.80, 0.42),
+            (0.72, 0.36), (0.72, 0.90), (0.28, 0.90), (0.28, 0.36), (0.20, 0.42), (0.10, 0.30)]
+    draw.polygon([(x * w, y * h) for x, y in body], fill=color or COLORS[index])
+    stripes = 2 + index
+    for s in range(stripes):
+        if (s + index) % 2:
+            x0 = 0.28 + 0.44 * s / stripes
+            draw.rectangle([x0 * w, (0.20 + 0.05 * (index % 3)) * h,
+                            (x0 + 0.44 / stripes) * w, 0.90 * h], fill=(255, 255, 255))
+    draw.ellipse([(0.40 + 0.03 * index) * w, (0.45 - 0.02 * index) * h,
+                  (0.52 + 0.03 * index) * w, (0.57 - 0.02 * index) * h], fill=COLORS[-1 - index])
+    return img
+
+
+def create_catalog(folder):
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(DISTINCT):
+        original = draw_jersey(i)
+        original.save(folder / f"jersey_{i:02d}.jpg", quality=90)
+        original.save(folder / f"jersey_{i:02d}_recomprimida.jpg", quality=55)
+        draw_jersey(i, background=(230, 230, 235)).save(folder / f"jersey_{i:02d}_fundo.jpg", quality=85)
+        original.resize((400, 400)).save(folder / f"jersey_{i:02d}_menor.jpg", quality=80)
+    draw_jersey(0, color=AWAY_COLOR).save(folder / "jersey_00_reserva.jpg", quality=90)
+
+
+def report(name, ok, detail):
+    print(f"  {'✓' if ok else '✗'} {name}: {detail}")
+    return ok
+
+
+def main():
+    print("=" * 70)
+    print("TESTE OFFLINE - DEDUPLICAÇÃO PERCEPTUAL".center(70))
+    print("=" * 70)
+
+    server = MockAnthropicServer(latency=0.01).start()
+    results = []
+    total_images = DISTINCT * (VARIANTS + 1) + 1
+    expected_sent = DISTINCT + 1   # a reserva não pode herdar a análise da titular
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        env = dict(os.environ,
+                   ANTHROPIC_API_KEY="mock", ANTHROPIC_BASE_URL=server.url,
+                   FOLTZ_RUN_MANIFEST_DIR=str(tmp / "execucoes"),
+                   FOLTZ_IMAGE_CACHE_DIR=str(tmp / "cache"),
+                   FOLTZ_HASH_CACHE=str(tmp / "hashes.json"),
+                   FOLTZ_USAGE_LEDGER=str(tmp / "uso.jsonl"),
+                   FOLTZ_RESPONSE_CACHE="0", FOLTZ_DEDUPE="1")
+        os.chdir(tmp)
+        create_catalog(tmp / "seedream")
+
+        home = perceptual_hashes(tmp / "seedream" / "jersey_00.jpg")
+        away = perceptual_hashes(tmp / "seedream" / "jersey_00_reserva.jpg")
+        distances = (hamming(home[0], away[0]), hamming(home[1], away[1]))
+        results.append(report("reserva com o mesmo brilho", max(distances) <= DEDUPE_THRESHOLD,
+                              f"dHash {distances[0]} e pHash {distances[1]} bits "
+                              f"(limite {DEDUPE_THRESHOLD}): só a cor separa"))
+
+        script = Path(__file__).resolve().parent / "analyze_products_complete.py"
+        result = subprocess.run([sys.executable, str(script)], env=env,
+                                capture_output=True, text=True, encoding='utf-8')
+        output = result.stdout
+        if result.returncode != 0:
+            print(output[-2000:], result.stderr[-2000:])
+
+        sent = sum(json.loads(line)["images"] for line in (tmp / "uso.jsonl").read_text(encoding='utf-8').splitlines())
+        results.append(report("representantes + reserva", sent == expected_sent,
+                              f"{sent} de {total_images} imagens enviadas; "
+                              + next((line.split("─ ", 1)[1] for line in output.splitlines()
+                                      if "Deduplicação:" in line), "sem resumo")))
+
+        consolidated = (tmp / "analise_produtos_completa.txt").read_text(encoding='utf-8')
+        names = re.findall(r"^\*\*IMAGEM \d+-\d+ \(([^)]+)\)\*\*", consolidated, re.M)
+        copies = consolidated.count("imagem quase idêntica")
+        results.append(report("fan-out no consolidado",
+                              len(names) == len(set(names)) == total_images
+                              and copies == total_images - expected_sent
+                              and "jersey_00_reserva.jpg" in names,
+                              f"{len(names)} seções ({len(set(names))} distintas), {copies} copiadas"))
+
+        manifest = json.loads((tmp / "execucoes" / "analise_produtos.json").read_text(encoding='utf-8'))
+        done = sum(1 for entry in manifest["images"].values() if entry["status"] == STATUS_DONE)
+        results.append(report("manifesto", done == total_images, f"{done} de {total_images} concluídas"))
+
+        os.chdir(Path(__file__).resolve().parent)
+
+    server.stop()
+    print("\n" + ("✓ Deduplicação OK" if all(results) else "✗ Falhas na deduplicação"))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTE OFFLINE DO EXECUTOR DE REQUISIÇÕES (claude_executor)
+Provoca cada tipo de erro na API simulada local e confere a decisão:
+
+1. 429 com retry-after: espera o pedido e repete o mesmo modelo
+2. 529 até esgotar as tentativas: troca de modelo
+3. 404 (modelo indisponível): troca na hora e o modelo fica desligado
+4. max_tokens acima do limite do modelo: troca de modelo
+5. 413 (payload grande demais): desiste sem tentar outros modelos
+"""
+
+import sys
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+import anthropic
+from claude_executor import FATAL, RequestExecutor, RequestFailed
+from mock_anthropic_server import MockAnthropicServer
+
+MODELS = ["claude-3-opus-20240229", "claude-3-sonnet-20240229", "claude-3-haiku-20240307"]
+MESSAGES = [{"role": "user", "content": "Analise esta imagem."}]
+MAX_RETRIES = 2
+
+
+def quiet(message):
+    pass
+
+
+class Scenario:
+    """Executor novo + servidor limpo; guarda as esperas pedidas ao sleep"""
+
+    def __init__(self, server):
+        server.faults.clear()
+        server.unavailable_models.clear()
+        server.max_output_tokens.clear()
+        server.max_request_bytes = None
+        self.server = server
+        self.waits = []
+        self.executor = RequestExecutor(max_retries=MAX_RETRIES, base_delay=0.01, sleep=self.waits.append)
+        self.start = server.requests
+
+    @property
+    def requests(self):
+        return self.server.requests - self.start
+
+    def create(self, client, max_tokens=1000):
+        return self.executor.create(client, MODELS, max_tokens, log=quiet, messages=MESSAGES)
+
+
+def report(name, ok, detail):
+    print(f"  {'✓' if ok else '✗'} {name}: {detail}")
+    return ok
+
+
+def main():
+    print("=" * 70)
+    print("TESTE OFFLINE - EXECUTOR DE REQUISIÇÕES".center(70))
+    print("=" * 70)
+
+    server = MockAnthropicServer(latency=0.01).start()
+    client = anthropic.Anthropic(api_key="mock", base_url=server.url)
+    results = []
+
+    s = Scenario(server)
+    server.faults.append((429, 3))
+    _, model = s.create(client)
+    results.append(report("429 + retry-after", model == MODELS[0] and s.requests == 2 and 3 <= s.waits[0] < 3.6,
+                          f"{s.requests} requisições, espera de {s.waits[0]:.2f}s, respondeu {model}"))
+
+    s = Scenario(server)
+    server.faults.extend([(529, None)] * (MAX_RETRIES + 1))
+    _, model = s.create(client)
+    results.append(report("529 esgotado", model == MODELS[1] and s.executor.retries == MAX_RETRIES,
+                          f"{s.executor.retries} novas tentativas, depois {model}"))
+
+    s = Scenario(server)
+    server.unavailable_models.add(MODELS[0])
+    _, first = s.create(client)
+    before = s.requests
+    _, second = s.create(client)
+    results.append(report("404 + circuit breaker",
+                          first == second == MODELS[1] and s.requests - before == 1
+                          and s.executor.breaker.disabled() == [MODELS[0]],
+                          f"1ª chamada {before} requisições, 2ª {s.requests - before} "
+                          f"(desligados: {s.executor.breaker.disabled()})"))
+
+    s = Scenario(server)
+    server.max_output_tokens.update({MODELS[0]: 4096, MODELS[1]: 4096})
+    _, model = s.create(client, max_tokens=lambda m: 4000 if "haiku" in m else 8000)
+    results.append(report("max_tokens acima do limite", model == MODELS[2] and s.requests == 3,
+                          f"{s.requests} requisições, respondeu {model}"))
+
+    s = Scenario(server)
+    server.max_request_bytes = 10
+    try:
+        s.create(client)
+        ok, detail = False, "não falhou"
+    except RequestFailed as e:
+        ok = e.category == FATAL and s.requests == 1
+        detail = f"{s.requests} requisição, {e}"
+    results.append(report("413 fatal", ok, detail))
+
+    print(f"\n{s.executor.report()}")
+    server.stop()
+    print("\n" + ("✓ Executor OK" if all(results) else "✗ Falhas no executor"))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
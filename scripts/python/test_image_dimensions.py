@@ -6,14 +6,15 @@ Script de teste para verificar dimensões das imagens
 
 import sys
 from pathlib import Path
-from PIL import Image
+from foltz_imaging import fit_within
+from image_manifest import SCAN_FOLDERS, ImageManifest, find_images
 
 # Configurar encoding UTF-8 no Windows
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
 MAX_DIMENSION = 2000
-IMAGE_FOLDERS = ["seedream", "id_visual"]
+IMAGE_FOLDERS = SCAN_FOLDERS  # seedream, id_visual e Leagues
 
 def check_images():
     print("="*70)
@@ -23,6 +24,7 @@ def check_images():
 
     total_images = 0
     images_need_resize = 0
+    manifest = ImageManifest()
 
     for folder in IMAGE_FOLDERS:
         folder_path = Path(folder)
@@ -34,43 +36,41 @@ def check_images():
         print(f"[PASTA] {folder}")
         print("-" * 70)
 
-        for ext in ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp']:
-            for img_path in folder_path.glob(ext):
-                try:
-                    with Image.open(img_path) as img:
-                        width, height = img.size
-                        total_images += 1
-
-                        needs_resize = width > MAX_DIMENSION or height > MAX_DIMENSION
-
-                        if needs_resize:
-                            images_need_resize += 1
-                            # Calcula novas dimensões
-                            if width > height:
-                                new_width = MAX_DIMENSION
-                                new_height = int((MAX_DIMENSION / width) * height)
-                            else:
-                                new_height = MAX_DIMENSION
-                                new_width = int((MAX_DIMENSION / height) * width)
-
-                            print(f"[X] {img_path.name}")
-                            print(f"    Original: {width}x{height}px")
-                            print(f"    Redimensionada: {new_width}x{new_height}px")
-                            print()
-                        else:
-                            print(f"[OK] {img_path.name} ({width}x{height}px)")
-
-                except Exception as e:
-                    print(f"[!] Erro ao processar {img_path.name}: {e}")
+        # Só lê o cabeçalho do que mudou desde a última execução
+        image_paths = find_images([folder])
+        for img_path, entry in manifest.scan(image_paths):
+            width, height = entry["width"], entry["height"]
+            total_images += 1
+
+            new_size = fit_within(width, height, MAX_DIMENSION)
+
+            if new_size:
+                images_need_resize += 1
+                new_width, new_height = new_size
+
+                print(f"[X] {img_path.name}")
+                print(f"    Original: {width}x{height}px")
+                print(f"    Redimensionada: {new_width}x{new_height}px")
+                print()
+            else:
+                print(f"[OK] {img_path.name} ({width}x{height}px)")
+
+        for img_path in image_paths:
+            if str(img_path) in manifest.errors:
+                print(f"[!] Erro ao processar {img_path.name}: {manifest.errors[str(img_path)]}")
 
         print()
 
+    manifest.prune()
+    manifest.save()
+
     print("="*70)
     print(f"RESUMO")
     print("="*70)
     print(f"Total de imagens: {total_images}")
     print(f"Precisam redimensionamento: {images_need_resize} ({(images_need_resize/total_images*100) if total_images > 0 else 0:.1f}%)")
     print(f"Ja estao OK: {total_images - images_need_resize} ({((total_images-images_need_resize)/total_images*100) if total_images > 0 else 0:.1f}%)")
+    print(manifest.report())
     print("="*70)
 
     if images_need_resize > 0:
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTE OFFLINE DO --resume (manifesto de execução)
+Roda run_complete_analysis contra a API simulada local, num catálogo
+sintético, com falhas provocadas em alguns lotes:
+
+1. Primeira execução: lotes com erro ficam marcados como falha no manifesto
+2. Imagens novas entram no catálogo (mudando os índices das antigas)
+3. --resume: reenvia só as imagens que falharam, pelo hash do conteúdo
+4. fix_and_rerun: nada mais a reprocessar
+"""
+
+import os
+import sys
+import json
+import subprocess
+import tempfile
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from PIL import Image
+from mock_anthropic_server import MockAnthropicServer
+from run_manifest import STATUS_DONE, STATUS_FAILED
+
+CATALOG_IMAGES = 30
+NEW_IMAGES = 5
+FAILED_REQUESTS = 2   # lotes de 10 que a API simulada recusa na primeira execução
+
+
+def create_images(folder, names):
+    folder.mkdir(parents=True, exist_ok=True)
+    for i, name in enumerate(names):
+        Image.effect_noise((400, 400), 10 + len(name) + i).convert('RGB').save(folder / name, quality=80)
+
+
+def run(script, env, *args):
+    scripts_dir = Path(__file__).resolve().parent
+    result = subprocess.run([sys.executable, str(scripts_dir / script), *args],
+                            env=env, capture_output=True, text=True, encoding='utf-8')
+    if result.returncode != 0:
+        print(result.stdout[-2000:], result.stderr[-2000:])
+    return result.stdout
+
+
+def statuses(manifest_path):
+    images = json.loads(manifest_path.read_text(encoding='utf-8'))["images"]
+    counts = {}
+    for entry in images.values():
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    return counts
+
+
+def report(name, ok, detail):
+    print(f"  {'✓' if ok else '✗'} {name}: {detail}")
+    return ok
+
+
+def main():
+    print("=" * 70)
+    print("TESTE OFFLINE - MANIFESTO DE EXECUÇÃO E --resume".center(70))
+    print("=" * 70)
+
+    server = MockAnthropicServer(latency=0.01).start()
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        env = dict(os.environ,
+                   ANTHROPIC_API_KEY="mock", ANTHROPIC_BASE_URL=server.url,
+                   FOLTZ_RUN_MANIFEST_DIR=str(tmp / "execucoes"),
+                   FOLTZ_IMAGE_CACHE_DIR=str(tmp / "cache"),
+                   FOLTZ_RESPONSE_CACHE="0",
+                   FOLTZ_API_RPM="100000", FOLTZ_API_ITPM="100000000")
+        os.chdir(tmp)
+        create_images(tmp / "seedream", [f"jersey_{i:03d}.jpg" for i in range(CATALOG_IMAGES)])
+        manifest_path = tmp / "execucoes" / "analise_completa.json"
+
+        # 400 não é retentado pelo SDK: o lote falha de vez
+        server.faults.extend([(400, None)] * FAILED_REQUESTS)
+        run("run_complete_analysis.py", env)
+        counts = statuses(manifest_path)
+        results.append(report("primeira execução", counts.get(STATUS_FAILED) == FAILED_REQUESTS * 10,
+                              f"{counts}"))
+
+        # Nomes que ordenam antes dos antigos: os índices de todas mudam
+        create_images(tmp / "seedream", [f"aaa_nova_{i}.jpg" for i in range(NEW_IMAGES)])
+        before = server.requests
+        run("run_complete_analysis.py", env, "--resume")
+        sent = server.requests - before
+        counts = statuses(manifest_path)
+        # 20 que falharam + as 5 novas que agora entram nas 50 primeiras
+        results.append(report("--resume", sent == 3 and counts.get(STATUS_DONE) == CATALOG_IMAGES + NEW_IMAGES,
+                              f"{sent} requisições, {counts}"))
+
+        before = server.requests
+        output = run("fix_and_rerun.py", env)
+        results.append(report("fix_and_rerun", server.requests == before and "Nada a reprocessar" in output,
+                              f"{server.requests - before} requisições"))
+
+        os.chdir(Path(__file__).resolve().parent)
+
+    server.stop()
+    print("\n" + ("✓ Retomada OK" if all(results) else "✗ Falhas na retomada"))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
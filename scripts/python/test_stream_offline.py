@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTE OFFLINE DO --stream (gravação incremental por seção)
+Roda analyze_products_complete --stream contra a API simulada local, num
+catálogo sintético pequeno:
+
+1. Stream cortado uma vez e repetido: os arquivos dos lotes têm cada seção
+   uma única vez, e o resumo mostra TTFT e tokens/s
+2. Stream cortado em todos os modelos: as imagens cujas seções chegaram
+   ficam concluídas no manifesto, só as outras falham
+3. --resume: reenvia só as imagens que faltaram
+"""
+
+import os
+import re
+import sys
+import json
+import subprocess
+import tempfile
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from PIL import Image
+from mock_anthropic_server import MockAnthropicServer
+from run_manifest import STATUS_DONE, STATUS_FAILED
+
+CATALOG_IMAGES = 8
+MODELS = 3          # modelos tentados por analyze_products_complete
+CUTOFF = 0.5        # fração da resposta entregue antes do corte
+
+
+def create_images(folder, count):
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        Image.effect_noise((300, 300), 20 + i).convert('RGB').save(folder / f"jersey_{i:02d}.jpg", quality=80)
+
+
+def run(env, *args):
+    script = Path(__file__).resolve().parent / "analyze_products_complete.py"
+    result = subprocess.run([sys.executable, str(script), "--stream", *args],
+                            env=env, capture_output=True, text=True, encoding='utf-8')
+    if result.returncode != 0:
+        print(result.stdout[-2000:], result.stderr[-2000:])
+    return result.stdout
+
+
+def statuses(manifest_path):
+    counts = {}
+    for entry in json.loads(manifest_path.read_text(encoding='utf-8'))["images"].values():
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    return counts
+
+
+def section_counts(batch_files):
+    names = [name for batch_file in batch_files
+             for name in re.findall(r"^\*\*IMAGEM \d+-\d+ \(([^)]+)\)\*\*",
+                                    batch_file.read_text(encoding='utf-8'), re.M)]
+    return len(names), len(set(names))
+
+
+def report(name, ok, detail):
+    print(f"  {'✓' if ok else '✗'} {name}: {detail}")
+    return ok
+
+
+def main():
+    print("=" * 70)
+    print("TESTE OFFLINE - STREAMING COM GRAVAÇÃO INCREMENTAL".center(70))
+    print("=" * 70)
+
+    server = MockAnthropicServer(latency=0.05).start()
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        env = dict(os.environ,
+                   ANTHROPIC_API_KEY="mock", ANTHROPIC_BASE_URL=server.url,
+                   FOLTZ_RUN_MANIFEST_DIR=str(tmp / "execucoes"),
+                   FOLTZ_IMAGE_CACHE_DIR=str(tmp / "cache"),
+                   FOLTZ_RESPONSE_CACHE="0",
+                   FOLTZ_API_MAX_RETRIES="0",   # corte -> próximo modelo, sem esperar o backoff
+                   FOLTZ_API_CONCURRENCY="1")   # os cortes da fila valem para as tentativas de um mesmo lote
+        os.chdir(tmp)
+        create_images(tmp / "seedream", CATALOG_IMAGES)
+        manifest_path = tmp / "execucoes" / "analise_produtos.json"
+
+        server.stream_cutoffs.append(CUTOFF)
+        output = run(env)
+        batch_files = sorted(tmp.glob("analise_lote_*.txt"))
+        total, unique = section_counts(batch_files)
+        results.append(report("corte + nova tentativa",
+                              total == unique == CATALOG_IMAGES and "TTFT" in output,
+                              f"{total} seções, {unique} distintas; "
+                              + next((line.split("─ ", 1)[1] for line in output.splitlines()
+                                      if "Streaming:" in line and "TTFT médio" in line), "sem métricas")))
+
+        for f in batch_files:
+            f.unlink()
+        server.stream_cutoffs.extend([CUTOFF] * MODELS)
+        run(env)
+        counts = statuses(manifest_path)
+        done = counts.get(STATUS_DONE, 0)
+        results.append(report("corte em todos os modelos",
+                              0 < done < CATALOG_IMAGES and counts.get(STATUS_FAILED) == CATALOG_IMAGES - done,
+                              f"{counts}"))
+
+        before = server.requests
+        output = run(env, "--resume")
+        counts = statuses(manifest_path)
+        resumed = re.search(r"Processando: (\d+) imagens", output)
+        results.append(report("--resume", server.requests - before == 1
+                              and resumed and int(resumed.group(1)) == CATALOG_IMAGES - done
+                              and counts.get(STATUS_DONE) == CATALOG_IMAGES,
+                              f"{resumed.group(1) if resumed else '?'} imagens reenviadas, {counts}"))
+
+        os.chdir(Path(__file__).resolve().parent)
+
+    server.stop()
+    print("\n" + ("✓ Streaming OK" if all(results) else "✗ Falhas no streaming"))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
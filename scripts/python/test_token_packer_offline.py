@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTE OFFLINE DO EMPACOTADOR POR TOKENS (token_packer)
+Roda analyze_products_complete contra a API simulada local com respostas
+maiores que a estimativa inicial por imagem:
+
+1. O primeiro lote é cortado em max_tokens; as imagens sem resposta
+   completa são reenviadas em lotes menores
+2. A estimativa aprendida evita novos cortes nos lotes seguintes
+3. Cada imagem aparece uma única vez no consolidado e todas terminam
+   concluídas no manifesto
+4. Com --stream, o lote cortado é regravado no arquivo que o streaming
+   já abriu: um arquivo analise_lote_N por lote
+"""
+
+import os
+import re
+import sys
+import json
+import subprocess
+import tempfile
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+from PIL import Image
+from mock_anthropic_server import MockAnthropicServer
+from run_manifest import STATUS_DONE
+
+CATALOG_IMAGES = 30
+SECTION_TOKENS = 1000        # tokens de cada seção na resposta simulada
+INITIAL_ESTIMATE = 500       # estimativa inicial errada: lotes grandes demais
+
+
+def create_images(folder, count):
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        Image.effect_noise((300, 300), 30 + i).convert('RGB').save(folder / f"jersey_{i:02d}.jpg", quality=80)
+
+
+def report(name, ok, detail):
+    print(f"  {'✓' if ok else '✗'} {name}: {detail}")
+    return ok
+
+
+def run_catalog(server, tmp, label, args):
+    """Roda o catálogo em tmp (diretório atual) e devolve os resultados das verificações"""
+    results = []
+    env = dict(os.environ,
+               ANTHROPIC_API_KEY="mock", ANTHROPIC_BASE_URL=server.url,
+               FOLTZ_RUN_MANIFEST_DIR=str(tmp / "execucoes"),
+               FOLTZ_IMAGE_CACHE_DIR=str(tmp / "cache"),
+               FOLTZ_RESPONSE_CACHE="0",
+               FOLTZ_OUTPUT_TOKENS_PER_IMAGE=str(INITIAL_ESTIMATE),
+               FOLTZ_API_CONCURRENCY="1")   # lotes já em voo não aproveitam o que o corte ensinou
+    os.chdir(tmp)
+    create_images(tmp / "seedream", CATALOG_IMAGES)
+
+    script = Path(__file__).resolve().parent / "analyze_products_complete.py"
+    result = subprocess.run([sys.executable, str(script), *args], env=env,
+                            capture_output=True, text=True, encoding='utf-8')
+    output = result.stdout
+    if result.returncode != 0:
+        print(output[-2000:], result.stderr[-2000:])
+
+    cut = output.count("Resposta cortada em max_tokens")
+    sizes = [int(n) for n in re.findall(r"📊 (\d+) imagens processadas neste lote", output)]
+    results.append(report("corte e divisão" + label, cut >= 1 and "reenviadas em" in output,
+                          f"{cut} respostas cortadas, lotes de {sizes}"))
+
+    first_cut = output.index("Resposta cortada em max_tokens") if cut else len(output)
+    later_cuts = output[first_cut:].count("Resposta cortada em max_tokens") - 1
+    results.append(report("estimativa aprendida" + label, cut and later_cuts == 0,
+                          next((line.split("─ ", 1)[1] for line in output.splitlines()
+                                if "Empacotador:" in line), "sem resumo")))
+
+    consolidated = (tmp / "analise_produtos_completa.txt").read_text(encoding='utf-8')
+    names = re.findall(r"^\*\*IMAGEM \d+-\d+ \(([^)]+)\)\*\*", consolidated, re.M)
+    manifest = json.loads((tmp / "execucoes" / "analise_produtos.json").read_text(encoding='utf-8'))
+    done = sum(1 for entry in manifest["images"].values() if entry["status"] == STATUS_DONE)
+    results.append(report("sem perdas nem repetições" + label,
+                          len(names) == len(set(names)) == CATALOG_IMAGES and done == CATALOG_IMAGES,
+                          f"{len(names)} seções ({len(set(names))} distintas), {done} concluídas"))
+
+    batch_files = [path.name for path in tmp.glob("analise_lote_*.txt")]
+    numbers = [name.split("_")[2] for name in batch_files]
+    results.append(report("um arquivo por lote" + label, len(numbers) == len(set(numbers)),
+                          f"{len(batch_files)} arquivos para {len(set(numbers))} lotes"))
+    return results
+
+
+def main():
+    print("=" * 70)
+    print("TESTE OFFLINE - LOTES PELO ORÇAMENTO DE TOKENS".center(70))
+    print("=" * 70)
+
+    server = MockAnthropicServer(latency=0.01).start()
+    server.section_tokens = SECTION_TOKENS
+    results = []
+
+    for label, args in (("", []), (" (--stream)", ["--stream"])):
+        with tempfile.TemporaryDirectory() as tmp:
+            results += run_catalog(server, Path(tmp), label, args)
+            os.chdir(Path(__file__).resolve().parent)
+
+    server.stop()
+    print("\n" + ("✓ Empacotador OK" if all(results) else "✗ Falhas no empacotador"))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LOTES PELO ORÇAMENTO DE TOKENS
+Substitui o número fixo de imagens por lote: cada requisição recebe quantas
+imagens cabem no orçamento do modelo
+
+- Saída (o limite que de fato aperta): tokens de resposta esperados por
+  imagem x imagens <= OUTPUT_HEADROOM x max_tokens do modelo. A estimativa
+  por imagem começa em OUTPUT_TOKENS_PER_IMAGE e só sobe com o usage das
+  respostas: descer no meio da execução mudaria os lotes de uma execução
+  para a outra e o cache de respostas (chave = lote) deixaria de acertar.
+  A média observada sai no resumo, para ajustar FOLTZ_OUTPUT_TOKENS_PER_IMAGE
+- Entrada: tokens estimados das imagens (pelas dimensões, como a API
+  calcula) + prompt <= INPUT_TOKEN_BUDGET
+
+Resposta cortada em max_tokens (stop_reason == "max_tokens"): observe()
+sobe a estimativa por imagem e split() divide as imagens que ficaram sem
+resposta em lotes que cabem no orçamento novo.
+"""
+
+import os
+import math
+import threading
+
+from foltz_imaging import block_dimensions, estimate_image_tokens
+
+OUTPUT_TOKENS_PER_IMAGE = int(os.environ.get("FOLTZ_OUTPUT_TOKENS_PER_IMAGE", "900"))
+# Bloco seo a mais por imagem no passo único (analyze_products_complete --seo)
+SEO_OUTPUT_TOKENS_PER_IMAGE = int(os.environ.get("FOLTZ_SEO_OUTPUT_TOKENS_PER_IMAGE", "1000"))
+INPUT_TOKEN_BUDGET = int(os.environ.get("FOLTZ_INPUT_TOKEN_BUDGET", "150000"))
+OUTPUT_HEADROOM = 0.85   # fração do max_tokens planejada; o resto é folga para variação
+LEARNING_RATE = 0.3      # peso de cada resposta nova na média móvel
+
+
+class TokenPacker:
+    """
+    Decide onde fechar cada lote; max_images é um teto opcional
+    (ex.: o IMAGES_PER_BATCH de antes)
+    """
+
+    def __init__(self, max_output_tokens, output_per_image=OUTPUT_TOKENS_PER_IMAGE,
+                 input_budget=INPUT_TOKEN_BUDGET, prompt_tokens=0, max_images=None):
+        self.max_output_tokens = max_output_tokens
+        self.output_per_image = float(output_per_image)
+        self.input_budget = input_budget
+        self.prompt_tokens = prompt_tokens
+        self.max_images = max_images
+        self.responses = 0
+        self.truncated = 0
+        self.observed_images = 0
+        self.observed_tokens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        """Imagens por lote que cabem no max_tokens com a estimativa atual"""
+        fits = math.floor(self.max_output_tokens * OUTPUT_HEADROOM / self.output_per_image)
+        if self.max_images:
+            fits = min(fits, self.max_images)
+        return max(1, fits)
+
+    def image_tokens(self, block):
+        """Tokens de entrada estimados de um bloco de imagem"""
+        return estimate_image_tokens(*block_dimensions(block))
+
+    def full(self, count, input_tokens, next_tokens):
+        """O lote com count imagens (input_tokens) deve fechar antes de uma imagem de next_tokens?"""
+        return (count >= self.capacity
+                or self.prompt_tokens + input_tokens + next_tokens > self.input_budget)
+
+    def observe(self, images, output_tokens, completed=None):
+        """
+        Ajusta a estimativa pelo usage de uma resposta de images imagens;
+        completed: imagens respondidas por inteiro numa resposta truncada
+        """
+        with self._lock:
+            self.responses += 1
+            if completed is None:
+                self.observed_images += images
+                self.observed_tokens += output_tokens
+                per_image = output_tokens / max(images, 1)
+                if per_image > self.output_per_image:
+                    self.output_per_image += LEARNING_RATE * (per_image - self.output_per_image)
+            else:
+                # Cortou no meio da imagem completed + 1: cada uma custa pelo menos isto
+                self.truncated += 1
+                self.output_per_image = max(self.output_per_image, output_tokens / (completed + 0.5))
+
+    def split(self, items):
+        """items em lotes de capacity"""
+        size = self.capacity
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def report(self):
+        observed = (f", média observada {self.observed_tokens / self.observed_images:.0f}"
+                    if self.observed_images else "")
+        return (f"Empacotador: {self.capacity} imagens por lote com max_tokens {self.max_output_tokens} "
+                f"(~{self.output_per_image:.0f} tokens de saída por imagem{observed}), "
+                f"{self.truncated} de {self.responses} respostas truncadas e divididas")
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+REGISTRO DE USO E CUSTO DA API
+Cada chamada à API vira uma linha num JSONL só de acréscimo
+(.uso/chamadas.jsonl): execução, etapa (script), modelo, imagens, tokens
+de entrada/saída/cache, latência, novas tentativas e custo estimado
+
+- Execução: FOLTZ_USAGE_RUN_ID (run_all_analysis define um para todas as
+  etapas); sem ele, cada processo é uma execução
+- Etapa: FOLTZ_USAGE_STAGE ou o nome do script
+- Custo: tabela de preços por milhão de tokens; escrita no cache custa
+  1,25x a entrada, leitura 0,1x; Message Batches pela metade
+
+Uso direto: python usage_ledger.py [n]  (resumo das últimas n execuções)
+"""
+
+import os
+import sys
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+USAGE_LEDGER_PATH = os.environ.get("FOLTZ_USAGE_LEDGER", ".uso/chamadas.jsonl")
+USAGE_RUN_ID = os.environ.get("FOLTZ_USAGE_RUN_ID") or f"{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}"
+USAGE_STAGE = os.environ.get("FOLTZ_USAGE_STAGE") or Path(sys.argv[0]).stem or "interativo"
+
+# US$ por milhão de tokens (entrada, saída), pelo prefixo do nome do modelo
+MODEL_PRICES = {
+    "claude-3-opus": (15.00, 75.00),
+    "claude-3-sonnet": (3.00, 15.00),
+    "claude-3-haiku": (0.25, 1.25),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-3-7-sonnet": (3.00, 15.00),
+    "claude-sonnet-4": (3.00, 15.00),
+    "claude-opus-4": (15.00, 75.00),
+}
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.10
+BATCH_API_MULTIPLIER = 0.50
+
+# Alta de tokens por imagem (vs a execução anterior) que vira alerta no resumo
+REGRESSION_THRESHOLD = 0.20
+
+
+def model_prices(model):
+    """(entrada, saída) em US$/milhão de tokens, ou None se o modelo não está na tabela"""
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model and model.startswith(prefix):
+            return MODEL_PRICES[prefix]
+    return None
+
+
+def estimate_cost(model, input_tokens, output_tokens, cache_write_tokens=0, cache_read_tokens=0,
+                  batch_api=False):
+    """Custo estimado em US$, ou None para modelo sem preço"""
+    prices = model_prices(model)
+    if prices is None:
+        return None
+    input_price, output_price = prices
+    cost = (input_tokens * input_price
+            + cache_write_tokens * input_price * CACHE_WRITE_MULTIPLIER
+            + cache_read_tokens * input_price * CACHE_READ_MULTIPLIER
+            + output_tokens * output_price) / 1_000_000
+    return cost * BATCH_API_MULTIPLIER if batch_api else cost
+
+
+def count_images(params):
+    """Blocos de imagem nas mensagens de uma requisição"""
+    images = 0
+    for message in (params or {}).get("messages", []):
+        content = message.get("content")
+        if isinstance(content, list):
+            images += sum(1 for block in content if block.get("type") == "image")
+    return images
+
+
+def message_usage(message, batch_api=False):
+    """
+    Tokens e custo de uma resposta, tirados da própria message.usage: é o
+    que o log de cada lote usa com várias chamadas em paralelo (last() pode
+    ser de outra thread)
+    """
+    usage = message.usage
+    entry = {
+        "input_tokens": usage.input_tokens or 0,
+        "output_tokens": usage.output_tokens or 0,
+        "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "cache_read_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+    }
+    entry["cost_usd"] = estimate_cost(message.model, entry["input_tokens"], entry["output_tokens"],
+                                      entry["cache_write_tokens"], entry["cache_read_tokens"], batch_api)
+    return entry
+
+
+class UsageLedger:
+    """Acrescenta uma linha por chamada; guarda as desta execução para o resumo"""
+
+    def __init__(self, path=USAGE_LEDGER_PATH, run_id=USAGE_RUN_ID, stage=USAGE_STAGE):
+        self.path = Path(path)
+        self.run_id = run_id
+        self.stage = stage
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, message, params=None, images=None, latency=None, retries=0, batch_api=False):
+        """
+        Registra a resposta message (com .usage); images é contado em
+        params["messages"] se não for informado
+        """
+        usage = message_usage(message, batch_api)
+        cost = usage.pop("cost_usd")
+        entry = {
+            "ts": datetime.now().isoformat(timespec='seconds'),
+            "run": self.run_id,
+            "stage": self.stage,
+            "model": message.model,
+            "images": count_images(params) if images is None else images,
+            **usage,
+            "latency_s": round(latency, 3) if latency is not None else None,
+            "retries": retries,
+            "stop_reason": message.stop_reason,
+            "batch_api": batch_api,
+            "cost_usd": cost,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.records.append(entry)
+        return entry
+
+    def last(self):
+        """Tokens e custo da última chamada registrada (scripts sequenciais; ver message_usage)"""
+        if not self.records:
+            return "Uso: nenhuma chamada registrada"
+        return describe(self.records[-1])
+
+    def report(self):
+        if not self.records:
+            return "Uso da API: nenhuma chamada"
+        return "Uso da API: " + describe_totals(totals(self.records))
+
+
+def describe(entry):
+    cost = f"US$ {entry['cost_usd']:.4f}" if entry["cost_usd"] is not None else "custo desconhecido"
+    cache = entry["cache_write_tokens"] + entry["cache_read_tokens"]
+    return (f"Uso: {entry['input_tokens']} tokens de entrada (+{cache} de cache), "
+            f"{entry['output_tokens']} de saída, {cost}")
+
+
+def totals(records):
+    """Soma de um grupo de registros"""
+    total = {"calls": 0, "images": 0, "input_tokens": 0, "output_tokens": 0, "cache_write_tokens": 0,
+             "cache_read_tokens": 0, "retries": 0, "latency_s": 0.0, "cost_usd": 0.0, "unpriced": 0}
+    for entry in records:
+        total["calls"] += 1
+        for key in ("images", "input_tokens", "output_tokens", "cache_write_tokens", "cache_read_tokens",
+                    "retries"):
+            total[key] += entry.get(key) or 0
+        total["latency_s"] += entry.get("latency_s") or 0.0
+        if entry.get("cost_usd") is None:
+            total["unpriced"] += 1
+        else:
+            total["cost_usd"] += entry["cost_usd"]
+    return total
+
+
+def tokens_per_image(total):
+    if not total["images"]:
+        return None
+    tokens = (total["input_tokens"] + total["output_tokens"]
+              + total["cache_write_tokens"] + total["cache_read_tokens"])
+    return tokens / total["images"]
+
+
+def describe_totals(total):
+    per_image = tokens_per_image(total)
+    per_image_text = (f", {per_image:.0f} tokens e US$ {total['cost_usd'] / total['images']:.4f} por imagem"
+                      if per_image is not None else "")
+    unpriced = f" ({total['unpriced']} sem preço)" if total["unpriced"] else ""
+    return (f"{total['calls']} chamadas, {total['images']} imagens, "
+            f"{total['input_tokens']} tokens de entrada, {total['output_tokens']} de saída, "
+            f"{total['cache_write_tokens'] + total['cache_read_tokens']} de cache, "
+            f"{total['retries']} novas tentativas, US$ {total['cost_usd']:.4f}{unpriced}{per_image_text}")
+
+
+def read_ledger(path=USAGE_LEDGER_PATH):
+    """Todos os registros do arquivo (linhas corrompidas são ignoradas)"""
+    records = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def group_by(records, key):
+    """{valor da chave: [registros]}, na ordem em que aparecem"""
+    groups = {}
+    for entry in records:
+        groups.setdefault(entry.get(key), []).append(entry)
+    return groups
+
+
+def run_report(run_id, path=USAGE_LEDGER_PATH):
+    """
+    Linhas do resumo de uma execução: total, por etapa e por modelo, com
+    alerta quando os tokens por imagem de uma etapa sobem mais que
+    REGRESSION_THRESHOLD em relação à execução anterior
+    """
+    runs = group_by(read_ledger(path), "run")
+    records = runs.get(run_id)
+    if not records:
+        return [f"Uso da API: nenhuma chamada registrada na execução {run_id}"]
+
+    run_ids = list(runs)
+    previous = runs[run_ids[run_ids.index(run_id) - 1]] if run_ids.index(run_id) > 0 else []
+    previous_stages = {stage: tokens_per_image(totals(entries))
+                       for stage, entries in group_by(previous, "stage").items()}
+
+    lines = [f"Uso da API na execução {run_id}: {describe_totals(totals(records))}", "Por etapa:"]
+    for stage, entries in group_by(records, "stage").items():
+        total = totals(entries)
+        line = f"  • {stage}: {describe_totals(total)}"
+        current, before = tokens_per_image(total), previous_stages.get(stage)
+        if current is not None and before:
+            change = current / before - 1
+            flag = "⚠️ " if change > REGRESSION_THRESHOLD else ""
+            line += f" [{flag}{change:+.0%} tokens/imagem vs execução anterior]"
+        lines.append(line)
+    lines.append("Por modelo:")
+    for model, entries in group_by(records, "model").items():
+        lines.append(f"  • {model}: {describe_totals(totals(entries))}")
+    return lines
+
+
+def combined_savings(records, separate_stages, image_tokens=0, path=USAGE_LEDGER_PATH):
+    """
+    Linha do resumo de um passo único (records: chamadas que fizeram o
+    trabalho de separate_stages juntas): compara com tokens, custo e
+    latência por imagem da execução mais recente de cada etapa separada.
+    Sem histórico, só image_tokens (as imagens que não foram reenviadas)
+    """
+    combined = totals(records)
+    if not combined["images"]:
+        return "Passo único: nenhuma chamada"
+
+    history = [entry for entry in read_ledger(path)
+               if entry.get("stage") in separate_stages and not entry.get("batch_api")
+               and entry.get("run") != (records[0].get("run") if records else None)]
+    separate = {"tokens": 0.0, "cost_usd": 0.0, "latency_s": 0.0}
+    for stage in separate_stages:
+        runs = group_by([entry for entry in history if entry["stage"] == stage], "run")
+        total = totals(list(runs.values())[-1]) if runs else None
+        if not total or not total["images"]:
+            return (f"Passo único: {combined['images']} imagens enviadas uma vez; ~{image_tokens} tokens de "
+                    f"imagem não reenviados (sem histórico de {stage} para comparar)")
+        separate["tokens"] += tokens_per_image(total) * combined["images"]
+        separate["cost_usd"] += total["cost_usd"] / total["images"] * combined["images"]
+        separate["latency_s"] += total["latency_s"] / total["images"] * combined["images"]
+
+    tokens = (combined["input_tokens"] + combined["output_tokens"]
+              + combined["cache_write_tokens"] + combined["cache_read_tokens"])
+    saved_tokens = separate["tokens"] - tokens
+    share = saved_tokens / separate["tokens"] if separate["tokens"] else 0.0
+    return (f"Passo único: {combined['images']} imagens, {tokens} tokens, US$ {combined['cost_usd']:.4f}, "
+            f"{combined['latency_s']:.1f}s vs ~{separate['tokens']:.0f} tokens, US$ {separate['cost_usd']:.4f}, "
+            f"{separate['latency_s']:.1f}s em {' + '.join(separate_stages)} separados: economia de "
+            f"{saved_tokens:.0f} tokens ({share:.0%}), US$ {separate['cost_usd'] - combined['cost_usd']:.4f}, "
+            f"{separate['latency_s'] - combined['latency_s']:.1f}s")
+
+
+USAGE_LEDGER = UsageLedger()
+
+
+def main():
+    last = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    runs = group_by(read_ledger(), "run")
+    if not runs:
+        print(f"Nenhuma chamada registrada em {USAGE_LEDGER_PATH}")
+        return
+    for run_id in list(runs)[-last:]:
+        print(f"{run_id}: {describe_totals(totals(runs[run_id]))}")
+
+
+if __name__ == "__main__":
+    main()